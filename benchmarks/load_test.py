@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Load-test a running site server with concurrent keep-alive clients
+- Each client holds one connection and requests the given paths in turn
+- Report requests per second, throughput, status counts and latency percentiles
+"""
+
+from collections import Counter
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_URL = 'http://127.0.0.1:8000'
+DEFAULT_PATHS = ['/', '/projects.html', '/photoshoots.html', '/press.html', '/press-loans.html']
+
+async def fetch(reader, writer, host, path, encoding):
+    """Send one request on an open connection and read the whole response: (status, body bytes)"""
+    request = f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept-Encoding: {encoding}\r\n\r\n'
+    writer.write(request.encode('latin-1'))
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status, length
+
+async def run_client(host, port, paths, count, encoding, results):
+    """Make count requests over one connection, cycling through paths"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for index in range(count):
+            start = time.perf_counter()
+            status, length = await fetch(reader, writer, host, paths[index % len(paths)], encoding)
+            results.append((time.perf_counter() - start, status, length))
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+async def run_load(host, port, paths, clients=32, requests=2000, encoding='br, gzip'):
+    """Spread requests over concurrent clients; returns a summary of the run"""
+    results = []
+    per_client = [requests // clients + (1 if index < requests % clients else 0) for index in range(clients)]
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_client(host, port, paths[index % len(paths):] + paths[:index % len(paths)], count, encoding, results)
+        for index, count in enumerate(per_client) if count
+    ))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _, _ in results)
+    received = sum(length for _, _, length in results)
+    return {
+        'requests': len(results),
+        'wall': round(wall, 4),
+        'requests_per_second': round(len(results) / wall, 1),
+        'mb_per_second': round(received / wall / 1e6, 2),
+        'statuses': dict(Counter(status for _, status, _ in results)),
+        'latency_ms': {
+            'median': round(statistics.median(latencies) * 1000, 2),
+            'p90': round(latencies[int(len(latencies) * 0.9)] * 1000, 2),
+            'p99': round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+            'max': round(latencies[-1] * 1000, 2),
+        },
+    }
+
+def main():
+    """Load-test a server and print the summary"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS, help='paths to request (default: every page)')
+    parser.add_argument('--url', default=DEFAULT_URL, help='server to test (default: %(default)s)')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent connections (default: %(default)s)')
+    parser.add_argument('--requests', type=int, default=2000, help='total requests (default: %(default)s)')
+    parser.add_argument('--encoding', default='br, gzip', help='Accept-Encoding to send (default: %(default)s)')
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    summary = asyncio.run(run_load(url.hostname, url.port or 80, args.paths, args.clients, args.requests, args.encoding))
+    print(f"{summary['requests']} requests in {summary['wall']:.2f}s from {args.clients} clients")
+    print(f"  {summary['requests_per_second']:.1f} requests/s, {summary['mb_per_second']:.2f} MB/s")
+    print(f"  statuses: {', '.join(f'{status}: {count}' for status, count in sorted(summary['statuses'].items()))}")
+    latency = summary['latency_ms']
+    print(f"  latency: {latency['median']:.2f} ms median, {latency['p90']:.2f} ms p90, {latency['p99']:.2f} ms p99, {latency['max']:.2f} ms max")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Benchmark the build scripts on synthetic Squarespace exports
+- Write a synthetic export and site at each --scale (1 = the real 882 images)
+- Time each script's core function end-to-end (cold caches, best and median of --repeat runs)
+- Run build.py with --profile for a per-phase breakdown of the whole pipeline
+- Save everything to benchmarks/results/<commit>-<time>.json; --compare diffs two result files
+"""
+
+from contextlib import redirect_stdout
+import argparse
+import asyncio
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import build_profile  # noqa: E402
+import cleanup_squarespace  # noqa: E402
+import generate_clean_html  # noqa: E402
+import generate_pages  # noqa: E402
+import serve  # noqa: E402
+from build_manifest import BUILD_DIR, load_manifest, manifest_path  # noqa: E402
+from extract_text_content import extract_all_text  # noqa: E402
+from image_dimensions import get_dimensions, load_dimension_cache  # noqa: E402
+from image_index import build_image_index  # noqa: E402
+from image_pipeline import SECTIONS, list_section_images  # noqa: E402
+from image_placeholders import load_placeholder_index  # noqa: E402
+from load_test import run_load  # noqa: E402
+from purge_css import DEFAULT_SAFELIST, TARGET_STYLESHEETS, collect_usage, compile_safelist, merge_usage, purge_css  # noqa: E402
+from source_documents import extract_records, parse_html, records_path, source_digest, stream_records  # noqa: E402
+from synthetic_site import write_synthetic_site  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+DEFAULT_SCALES = [1, 10]
+
+# A ratio further than this from 1.0 is flagged by --compare
+NOISE = 0.1
+
+def git_commit():
+    """Current commit, with a -dirty suffix when the tree has uncommitted changes"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f'{commit}-dirty' if dirty else commit
+
+def source_pages(export_root):
+    """(section, path) of every page in an export"""
+    return [(section, os.path.join(export_root, section, 'index.html')) for section in SECTIONS]
+
+def clear_record_caches(export_root, site_roots):
+    """Remove cached records of the synthetic pages so extraction runs cold"""
+    for _, page in source_pages(export_root):
+        digest = source_digest(page)
+        for base_path in site_roots:
+            path = records_path(base_path, digest)
+            if os.path.exists(path):
+                os.remove(path)
+
+def clear_site_caches(site_root):
+    """Remove a site's build caches (manifest, dimensions, placeholders, records)"""
+    shutil.rmtree(os.path.join(site_root, BUILD_DIR), ignore_errors=True)
+
+def bench_stream_records(ctx):
+    """Stream the records of every page"""
+    for _, page in source_pages(ctx['export']):
+        stream_records(page)
+
+def bench_tree_records(ctx):
+    """Parse every page into a tree and extract its records"""
+    for _, page in source_pages(ctx['export']):
+        with open(page, 'r', encoding='utf-8') as f:
+            extract_records(parse_html(f.read()))
+
+def bench_extract_text(ctx):
+    """Extract the text of every section"""
+    clear_record_caches(ctx['export'], [str(REPO_ROOT)])
+    extract_all_text(ctx['export'], SECTIONS)
+
+def bench_extract_images(ctx):
+    """Extract the image list of every section"""
+    clear_record_caches(ctx['export'], [ctx['site']])
+    config = generate_clean_html.load_config(ctx['export'], ctx['site'])
+    for section, page in source_pages(ctx['export']):
+        generate_clean_html.extract_images_from_html(config, page, section)
+
+def bench_dimensions(ctx):
+    """Read the dimensions of every image"""
+    cache = {'path': None, 'entries': {}, 'dirty': False}
+    for section in SECTIONS:
+        section_dir = os.path.join(ctx['site'], 'images', section)
+        for file in list_section_images(section_dir):
+            get_dimensions(cache, os.path.join(section_dir, file))
+
+def bench_clean_pages(ctx):
+    """Render every semantic page"""
+    clear_site_caches(ctx['site'])
+    config = generate_clean_html.load_config(ctx['export'], ctx['site'])
+    for section, _, _ in generate_clean_html.PAGES:
+        generate_clean_html.render_page(config, section, ctx['text'][section])
+
+def bench_grid_pages(ctx):
+    """Gather context for and render every image-grid page"""
+    clear_site_caches(ctx['site'])
+    images_path = Path(ctx['site']) / 'images'
+    manifest = load_manifest(manifest_path(ctx['site']))
+    dimensions = load_dimension_cache(ctx['site'])
+    placeholders = load_placeholder_index(ctx['site'])
+    for filename, title, section, active_page in generate_pages.PAGES:
+        context = generate_pages.page_context(images_path, section, {}, manifest, dimensions, placeholders)
+        generate_pages.render_page(os.path.join(ctx['site'], filename), title, section, active_page, context)
+
+def bench_cleanup(ctx):
+    """Index the local images, then clean up every exported page"""
+    clear_site_caches(ctx['site'])
+    images_root = os.path.join(ctx['site'], 'images')
+    manifest = load_manifest(manifest_path(ctx['site']))
+    image_index = build_image_index(ctx['site'], source_pages(ctx['export']), manifest)
+    for section, filename in cleanup_squarespace.PAGES:
+        page = os.path.join(ctx['export'], section, 'index.html')
+        cleanup_squarespace.cleanup_html(page, os.path.join(ctx['site'], filename), section, manifest, images_root, 'compact', image_index)
+
+def bench_purge(ctx):
+    """Purge the Squarespace stylesheets against the cleaned-up pages"""
+    is_safe = compile_safelist(list(DEFAULT_SAFELIST))
+    usage = merge_usage([collect_usage(html) for html in ctx['cleaned']])
+    for target in TARGET_STYLESHEETS:
+        with open(os.path.join(ctx['site'], target), 'r', encoding='utf-8') as f:
+            purge_css(f.read(), usage, is_safe)
+
+async def serve_site(site_root, paths):
+    """Serve a site on a free port and load it with concurrent clients"""
+    server = await serve.start_server(site_root, port=0, quiet=True)
+    async with server:
+        host, port = server.sockets[0].getsockname()[:2]
+        return await run_load(host, port, paths, clients=32, requests=2000)
+
+def bench_serve(ctx):
+    """Serve the pages and gallery images to 32 concurrent keep-alive clients"""
+    paths = ['/' + filename for _, filename in cleanup_squarespace.PAGES]
+    for section in SECTIONS:
+        paths += [f'/images/{section}/{file}' for file in list_section_images(os.path.join(ctx['site'], 'images', section))[:20]]
+    asyncio.run(serve_site(ctx['site'], paths))
+
+# (name, function) in pipeline order; each runs with cold caches
+BENCHMARKS = [
+    ('source_documents.stream_records', bench_stream_records),
+    ('source_documents.extract_records (tree)', bench_tree_records),
+    ('extract_text_content.extract_all_text', bench_extract_text),
+    ('generate_clean_html.extract_images_from_html', bench_extract_images),
+    ('image_dimensions.get_dimensions', bench_dimensions),
+    ('generate_clean_html.render_page', bench_clean_pages),
+    ('generate_pages.render_page', bench_grid_pages),
+    ('cleanup_squarespace.cleanup_html', bench_cleanup),
+    ('purge_css.purge_css', bench_purge),
+    ('serve.handle_connection', bench_serve),
+]
+
+def time_benchmark(func, ctx, repeat):
+    """Run a benchmark repeat times; returns wall and CPU seconds of each run"""
+    runs = []
+    for _ in range(repeat):
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        # The scripts report progress as they go; keep the benchmark table readable
+        with redirect_stdout(io.StringIO()):
+            func(ctx)
+        runs.append((time.perf_counter() - start_wall, time.process_time() - start_cpu))
+    walls = [wall for wall, _ in runs]
+    return {
+        'runs': [round(wall, 4) for wall in walls],
+        'best': round(min(walls), 4),
+        'median': round(statistics.median(walls), 4),
+        'cpu': round(min(cpu for _, cpu in runs), 4),
+    }
+
+def profile_build(ctx, generator, jobs, top):
+    """Run a clean build.py --profile and aggregate its trace per span"""
+    clear_site_caches(ctx['site'])
+    trace = os.path.join(BUILD_DIR, 'benchmark-trace.json')
+    command = [
+        sys.executable, str(REPO_ROOT / 'build.py'), '--input', ctx['export'], '--output', ctx['site'],
+        '--generator', generator, '--profile', trace,
+    ]
+    if jobs:
+        command += ['--jobs', str(jobs)]
+
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    wall = time.perf_counter() - start
+
+    with open(os.path.join(ctx['site'], trace), 'r', encoding='utf-8') as f:
+        events = [event for event in json.load(f)['traceEvents'] if event['ph'] == 'X']
+    spans = {
+        name: {'calls': calls, 'wall': round(span_wall, 4), 'cpu': round(cpu, 4), 'peak_kb': peak}
+        for name, calls, span_wall, cpu, peak in build_profile.summarize(events, top)
+    }
+    return {'generator': generator, 'wall': round(wall, 4), 'spans': spans}
+
+def run_scale(scale, workdir, repeat, only, build, generators, jobs, top):
+    """Benchmark one scale; returns its results"""
+    root = os.path.join(workdir, f'scale-{scale}')
+    shutil.rmtree(root, ignore_errors=True)
+    start = time.perf_counter()
+    export_root, site_root = write_synthetic_site(root, scale)
+    print(f"\nScale {scale}x: synthetic site written in {time.perf_counter() - start:.1f}s")
+
+    ctx = {'export': str(export_root), 'site': str(site_root)}
+    ctx['text'] = extract_all_text(ctx['export'], SECTIONS)
+
+    images = sum(len(list_section_images(os.path.join(ctx['site'], 'images', section))) for section in SECTIONS)
+    source_bytes = sum(os.path.getsize(page) for _, page in source_pages(ctx['export']))
+    results = {'images': images, 'source_bytes': source_bytes, 'benchmarks': {}, 'builds': []}
+
+    for name, func in BENCHMARKS:
+        if only and not any(pattern in name for pattern in only):
+            continue
+        if name == 'purge_css.purge_css':
+            # Purge the CSS against the cleaned-up export, the pages that link these stylesheets
+            with redirect_stdout(io.StringIO()):
+                bench_cleanup(ctx)
+            ctx['cleaned'] = [
+                Path(ctx['site'], filename).read_text(encoding='utf-8') for _, filename in cleanup_squarespace.PAGES
+            ]
+        result = time_benchmark(func, ctx, repeat)
+        results['benchmarks'][name] = result
+        print(f"  {name:<50} {result['best']:>9.3f}s best {result['median']:>9.3f}s median")
+
+    if build:
+        for generator in generators:
+            profile = profile_build(ctx, generator, jobs, top)
+            results['builds'].append(profile)
+            print(f"  build.py --generator {generator:<28} {profile['wall']:>9.3f}s")
+            for name, span in profile['spans'].items():
+                print(f"    {name:<56} {span['calls']:>6} {span['wall']:>9.3f}s")
+
+    return results
+
+def compare(base_file, new_file):
+    """Print the ratio of every benchmark shared by two result files"""
+    with open(base_file, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_file, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+
+    print(f"{base['commit']} -> {new['commit']}")
+    for scale, new_results in new['scales'].items():
+        base_results = base['scales'].get(scale)
+        if not base_results:
+            continue
+        print(f"\nScale {scale}x")
+        for name, result in new_results['benchmarks'].items():
+            if name not in base_results['benchmarks']:
+                continue
+            before = base_results['benchmarks'][name]['best']
+            after = result['best']
+            ratio = after / before if before else float('inf')
+            flag = '' if abs(ratio - 1) <= NOISE else (' faster' if ratio < 1 else ' SLOWER')
+            print(f"  {name:<50} {before:>9.3f}s -> {after:>9.3f}s  x{ratio:.2f}{flag}")
+
+def main():
+    """Run the benchmarks and save the results"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, action='append', help=f'site size multiple, repeatable (default: {DEFAULT_SCALES}; 100 is 88,200 images)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark (default: %(default)s)')
+    parser.add_argument('--only', action='append', help='run benchmarks whose name contains this (repeatable)')
+    parser.add_argument('--no-build', dest='build', action='store_false', help='skip the profiled build.py runs')
+    parser.add_argument('--generator', action='append', choices=['clean', 'grid', 'squarespace'], help='generator for the profiled build (repeatable, default: clean)')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='worker processes for the profiled build (default: CPU count)')
+    parser.add_argument('--top', type=int, default=25, help='spans kept per profiled build (default: %(default)s)')
+    parser.add_argument('--workdir', help='where synthetic sites are written (default: a temporary directory)')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<commit>-<time>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='compare two result files instead of running')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit = git_commit()
+    results = {
+        'commit': commit,
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeat': args.repeat,
+        'scales': {},
+    }
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='maria-bench-')
+    try:
+        for scale in args.scale or DEFAULT_SCALES:
+            results['scales'][str(scale)] = run_scale(
+                scale, workdir, args.repeat, args.only, args.build, args.generator or ['clean'], args.jobs, args.top,
+            )
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or RESULTS_DIR / f"{commit}-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+if __name__ == '__main__':
+    main()
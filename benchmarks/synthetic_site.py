@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Synthetic Squarespace exports for benchmarking
+- Write MARIA_DATA-style <section>/index.html pages: fluid-engine blocks, inline
+  styles, squarespace-cdn.com image URLs with srcsets, text blocks between images
+- Write matching images/<section> folders of small but distinct JPEGs, plus the
+  repo's stylesheets and scripts, so the site-wide stages have something to work on
+- Scale 1 matches the real site (882 images); 10 and 100 multiply every section
+"""
+
+import argparse
+import io
+import random
+import shutil
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from image_pipeline import SECTIONS  # noqa: E402
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Images per section on the real site
+SECTION_IMAGE_COUNTS = {'home': 168, 'projects': 216, 'photoshoots': 306, 'press': 96, 'press-loans': 96}
+
+# A text block (h2 + h3 + p) is placed before every Nth image
+IMAGES_PER_TEXT_BLOCK = 6
+
+# Distinct base images; copies get a unique trailer so every file hashes differently
+BASE_IMAGE_SIZES = [(96, 128), (128, 96), (112, 112), (90, 160), (160, 90), (120, 150)]
+
+FLUID_ENGINE_ID = '669bf0d974cc7c7290042175'
+
+SITE_ASSETS = ['css', 'js', 'styles.css']
+
+def base_images(seed):
+    """Encode a few small JPEGs to copy from"""
+    if Image is None:
+        raise RuntimeError("Pillow is required to write synthetic images (pip install Pillow)")
+
+    rng = random.Random(seed)
+    images = []
+    for width, height in BASE_IMAGE_SIZES:
+        img = Image.new('RGB', (width, height))
+        # Coarse random blocks give the encoder (and perceptual hashes) something to work with
+        for x in range(0, width, 16):
+            for y in range(0, height, 16):
+                img.paste(tuple(rng.randrange(256) for _ in range(3)), (x, y, x + 16, y + 16))
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=80)
+        images.append((buffer.getvalue(), (width, height)))
+    return images
+
+def image_names(section, scale):
+    """Original (CDN) file names for a section at a scale"""
+    return [f'img-{section}-{index:06d}.jpg' for index in range(SECTION_IMAGE_COUNTS[section] * scale)]
+
+def write_images(site_root, scale, seed=0):
+    """Write images/<section>/<section>_<name> files; returns {section: [(name, (w, h))]}"""
+    images = base_images(seed)
+    written = {}
+    for section in SECTIONS:
+        section_dir = Path(site_root) / 'images' / section
+        section_dir.mkdir(parents=True, exist_ok=True)
+        written[section] = []
+        for index, name in enumerate(image_names(section, scale)):
+            data, size = images[index % len(images)]
+            # Bytes after the JPEG end marker are ignored by decoders but change the digest
+            with open(section_dir / f'{section}_{name}', 'wb') as f:
+                f.write(data + f'{section}/{index}'.encode('ascii'))
+            written[section].append((name, size))
+    return written
+
+def image_block(section, index, name, size):
+    """One fluid-engine image block as Squarespace exports it"""
+    width, height = size
+    url = f'https://images.squarespace-cdn.com/content/v1/5f1a{index:08x}/{index:x}-{section}/{name}'
+    srcset = ', '.join(f'{url}?format={w}w {w}w' for w in (100, 300, 500, 750, 1000, 1500, 2500))
+    return (
+        f'<div class="fe-block fe-block-{index:x}{section[:3]}" style="grid-area: {index % 31 + 1}/2/{index % 31 + 4}/12;">'
+        f'<div class="sqs-block image-block sqs-block-image" data-block-type="5" id="block-yui_{index:x}">'
+        f'<div class="sqs-block-content"><div class="image-block-outer-wrapper layout-caption-below design-layout-fluid">'
+        f'<figure class="sqs-block-image-figure intrinsic" style="max-width:{width}px;">'
+        f'<div class="fluid-image-animation-wrapper sqs-image sqs-block-alignment-wrapper" data-animation-role="image">'
+        f'<div class="fluid-image-container sqs-image-content" style="overflow: hidden;-webkit-mask-image: -webkit-radial-gradient(white, black);position: relative;width: 100%;height: 100%;">'
+        f'<img data-stretch="true" data-src="{url}" data-image="{url}" data-image-dimensions="{width}x{height}" '
+        f'data-image-focal-point="0.5,0.5" alt="" data-load="false" elementtiming="system-image-block" '
+        f'src="{url}" width="{width}" height="{height}" sizes="100vw" '
+        f'style="display:block;object-fit: cover; width: 100%; height: 100%; object-position: 50% 50%" srcset="{srcset}" loading="lazy" decoding="async" data-loader="sqs">'
+        f'</div></div></figure></div></div></div></div>'
+    )
+
+def text_block(section, index):
+    """One fluid-engine text block with a title, subtitle and paragraph"""
+    return (
+        f'<div class="fe-block fe-block-t{index:x}" style="grid-area: {index % 31 + 1}/14/{index % 31 + 3}/24;">'
+        f'<div class="sqs-block html-block sqs-block-html" data-block-type="2" id="block-t{index:x}">'
+        f'<div class="sqs-block-content"><div class="sqs-html-content">'
+        f'<h2 style="white-space:pre-wrap;">{section.upper()} PROJECT {index // IMAGES_PER_TEXT_BLOCK}</h2>'
+        f'<h3 style="white-space:pre-wrap;">Collection {index // IMAGES_PER_TEXT_BLOCK}</h3>'
+        f'<p class="" style="white-space:pre-wrap;">Notes on the garments, fabrics and print techniques behind look {index}.</p>'
+        f'</div></div></div></div>'
+    )
+
+def export_page(section, images):
+    """A whole Squarespace page for a section"""
+    head = (
+        '<!doctype html><html xmlns:og="http://opengraphprotocol.org/schema/" lang="en-GB" class="wf-loading"><head>'
+        '<meta http-equiv="X-UA-Compatible" content="IE=edge,chrome=1"><meta name="viewport" content="width=device-width, initial-scale=1">'
+        f'<title>{section.upper()} — MARIA GOUNDRY</title>'
+        '<script type="text/javascript" src="//use.typekit.net/ik/abc.js" async fetchpriority="high" onload="try{Typekit.load();}catch(e){}"></script>'
+        '<script>document.documentElement.classList.add("wf-loading")</script>'
+        '<script src="https://static1.squarespace.com/static/vta/5c5a519771c10ba3470d8101/scripts/site-bundle.js" defer></script>'
+        '<link rel="stylesheet" type="text/css" href="https://static1.squarespace.com/static/versioned-site-css/site.css"/>'
+        '<style>.wf-loading h1, .wf-loading h2 { animation: fonts-loading 2s; }</style>'
+        + ''.join(f'<style>.fe-{FLUID_ENGINE_ID} .fe-block-{i:x} {{ grid-area: {i}/1/{i + 2}/25; z-index: {i}; }}</style>' for i in range(20))
+        + '</head>'
+    )
+    body = [
+        f'<body id="collection-{section}" class="header-overlay-alignment-center tweak-social-icons-style-regular">',
+        '<div id="siteWrapper" class="clearfix site-wrapper"><header class="header theme-col--primary">'
+        '<div class="header-announcement-bar-wrapper"><nav class="header-nav-list">'
+        '<a href="/">Home</a><a href="/projects">Projects</a><a href="/photoshoots">Photoshoots</a>'
+        '<a href="/press">Press</a><a href="/press-loans">Press Loans</a><a href="/about">About</a></nav></div></header>',
+        f'<main id="page"><article class="sections"><section class="page-section"><div class="content-wrapper">'
+        f'<div class="fluid-engine fe-{FLUID_ENGINE_ID}">',
+        '<div class="fe-block" id="block-8d20fa4bb3eea7ba9cad"><div class="sqs-block-content">'
+        '<h1>MARIA GOUNDRY</h1><h1>PORTFOLIO</h1><p>Welcome to my digital portfolio.</p></div></div>',
+    ]
+    for index, (name, size) in enumerate(images):
+        if index % IMAGES_PER_TEXT_BLOCK == 0:
+            body.append(text_block(section, index))
+        body.append(image_block(section, index, name, size))
+    body.append(
+        '</div></div></section></article></main><footer class="sections"><h2>CONTACT</h2>'
+        '<p>EMAIL: maria.goundry98@gmail.com</p><p>INSTAGRAM</p></footer></div></body></html>'
+    )
+    return head + '\n'.join(body)
+
+def write_export(export_root, images):
+    """Write <section>/index.html for every section"""
+    for section, section_images in images.items():
+        section_dir = Path(export_root) / section
+        section_dir.mkdir(parents=True, exist_ok=True)
+        with open(section_dir / 'index.html', 'w', encoding='utf-8') as f:
+            f.write(export_page(section, section_images))
+
+def copy_site_assets(site_root):
+    """Copy the repo's stylesheets and scripts into a site root"""
+    for name in SITE_ASSETS:
+        source = REPO_ROOT / name
+        if source.is_dir():
+            shutil.copytree(source, Path(site_root) / name, dirs_exist_ok=True)
+        elif source.exists():
+            shutil.copy2(source, Path(site_root) / name)
+
+def write_synthetic_site(root, scale, seed=0):
+    """Write an export under root/export and its site (images, CSS, JS) under root/site"""
+    root = Path(root)
+    images = write_images(root / 'site', scale, seed)
+    copy_site_assets(root / 'site')
+    write_export(root / 'export', images)
+    return root / 'export', root / 'site'
+
+def main():
+    """Write a synthetic export and site to a directory"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root', help='directory to write export/ and site/ into')
+    parser.add_argument('--scale', type=int, default=1, help='multiple of the real image count (default: %(default)s)')
+    args = parser.parse_args()
+
+    export_root, site_root = write_synthetic_site(args.root, args.scale)
+    total = sum(SECTION_IMAGE_COUNTS.values()) * args.scale
+    print(f"Wrote {total} images to {site_root} and {len(SECTIONS)} pages to {export_root}")
+
+if __name__ == '__main__':
+    main()
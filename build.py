@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Build Maria's portfolio website with one command
+- Model the pipeline as a DAG: extract text, optimize and extract images, render pages, post-process
+- Render independent pages concurrently on a process pool
+- Read the Squarespace export from --input and write the site to --output
+- --only limits the build to some sections; --dry-run prints what would be rebuilt
+- --profile records per-phase/per-function timings to a Chrome trace
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from graphlib import TopologicalSorter
+import argparse
+import json
+import os
+from pathlib import Path
+
+import build_profile
+import cleanup_squarespace
+import extract_text_content
+import generate_clean_html
+import generate_pages
+import image_pipeline
+import source_documents
+from build_manifest import (
+    digest_values, file_digest, is_up_to_date, load_manifest, manifest_path, record_outputs, save_manifest, tree_digest,
+)
+from critical_css import inline_site
+from dedupe_images import load_aliases
+from extract_text_content import extract_all_text, save_text_content
+from fingerprint_assets import fingerprint_site
+from image_dimensions import save_dimension_cache
+from image_index import build_image_index, save_image_index
+from image_pipeline import SECTIONS, build_images, list_section_images
+from image_placeholders import save_placeholder_index
+from minify_html import minify_site
+from optimize_images import optimize_images
+from precompress import available_encodings, precompress_site
+from purge_css import purge_site
+from service_worker import build_service_worker
+from source_documents import load_records
+
+DEFAULT_INPUT = generate_clean_html.DEFAULT_INPUT
+DEFAULT_OUTPUT = str(Path(__file__).parent)
+
+# clean: semantic pages from the export's text and images (generate_clean_html)
+# grid: image grids from the images folders (generate_pages)
+# squarespace: the export itself, cleaned up (cleanup_squarespace)
+GENERATORS = ['clean', 'grid', 'squarespace']
+POST_STAGES = ['purge', 'critical', 'fingerprint', 'minify', 'service-worker', 'precompress']
+
+PAGE_FILES = {section: filename for section, filename in cleanup_squarespace.PAGES}
+
+# Scripts behind the post-processing stages; editing one reruns them all
+POST_SCRIPTS = ['purge_css.py', 'critical_css.py', 'fingerprint_assets.py', 'minify_html.py', 'service_worker.py', 'precompress.py']
+
+DEFAULT_TRACE = os.path.join('.build', 'build-trace.json')
+
+# Functions timed by --profile, in the main process and in every worker
+PROFILED_FUNCTIONS = [
+    (source_documents, ['parse_html', 'stream_records']),
+    (extract_text_content, ['extract_text_from_html']),
+    (generate_clean_html, [
+        'extract_images_from_html', 'render_image', 'generate_home_html', 'generate_projects_html',
+        'generate_photoshoots_html', 'generate_press_html', 'generate_press_loans_html',
+    ]),
+    (generate_pages, ['page_context', 'generate_html_template']),
+    (cleanup_squarespace, ['cleanup_html']),
+    (image_pipeline, ['process_image', 'picture_html']),
+]
+
+def enable_profiling():
+    """Turn on recording and wrap the profiled functions in this process"""
+    build_profile.enable()
+    for module, names in PROFILED_FUNCTIONS:
+        build_profile.instrument(module, names)
+
+def init_worker(profile=False):
+    """Start a worker process's profiling, when the build is profiled"""
+    if profile:
+        build_profile.reset()
+        enable_profiling()
+
+def source_page(state, section):
+    """Path of a section's page in the Squarespace export"""
+    return os.path.join(state['input'], section, 'index.html')
+
+def run_text(state):
+    """Extract the text of every section, keeping earlier text for sections not rebuilt"""
+    text_file = os.path.join(state['output'], 'text_content.json')
+    text = {}
+    if os.path.exists(text_file):
+        with open(text_file, 'r', encoding='utf-8') as f:
+            text = json.load(f)
+
+    extracted = extract_all_text(state['input'], state['sections'], state['manifest'], state['output'], state['dry_run'])
+    changed = any(text.get(section) != content for section, content in extracted.items())
+    text.update(extracted)
+    state['text'] = text
+
+    if changed and not state['dry_run']:
+        save_text_content(text, text_file)
+    print(f"text: {len(extracted)} sections{' (changed)' if changed else ''}")
+
+def run_optimize(state):
+    """Losslessly shrink the original images before anything reads them"""
+    if state['dry_run']:
+        print(f"optimize: would process {', '.join(state['sections'])}")
+        return
+    images_path = Path(state['output']) / 'images'
+    report = optimize_images(images_path, state['sections'], state['jobs'], state['manifest'], state['png_to_jpeg'])
+    # Converted PNGs are new aliases
+    state['aliases'] = load_aliases(images_path)
+    for section, (files, before, after) in report.items():
+        print(f"optimize:{section}: {files} images, {(before - after) / 1e3:.0f} kB saved")
+
+def run_derivatives(state):
+    """Build image derivatives for the sections being built"""
+    if state['dry_run']:
+        print(f"derivatives: would process {', '.join(state['sections'])}")
+        return
+    build_images(Path(state['output']) / 'images', state['sections'], state['jobs'], state['manifest'], state['placeholders'])
+
+def run_image_index(state):
+    """Index the local copies of CDN images once, for every cleanup worker"""
+    pages = [(section, source_page(state, section)) for section in SECTIONS]
+    state['image_index'] = build_image_index(state['output'], pages, state['manifest'])
+    if not state['dry_run']:
+        save_image_index(state['image_index'])
+    entries = state['image_index']['entries']
+    print(f"image-index: {len(entries['digests'])} images, {len(entries['ids'])} CDN asset ids")
+
+def run_images(state, section):
+    """List a section's images: from the export for clean/squarespace, from disk for grid"""
+    images_path = Path(state['output']) / 'images'
+    if state['generator'] == 'grid':
+        context = generate_pages.page_context(
+            images_path, section, state['aliases'], state['manifest'], state['dimensions'], state['placeholders'],
+        )
+        state['contexts'][section] = context
+        count = len(context['images'])
+    elif os.path.exists(source_page(state, section)):
+        count = len(load_records(source_page(state, section), state['manifest'], state['output'], read_only=state['dry_run'])['images'])
+    else:
+        count = len(list_section_images(images_path / section))
+    print(f"images:{section}: {count} images")
+
+def plan_page(state, section):
+    """Work out a page's manifest key, inputs and worker job"""
+    output = state['output']
+    filename = PAGE_FILES[section]
+    output_file = os.path.join(output, filename)
+
+    if state['generator'] == 'clean':
+        # The clean generator resolves its image URLs through the same index
+        config = dict(state['config'], image_index=state['image_index'])
+        text = state['text'][section]
+        inputs = generate_clean_html.page_inputs(config, state['template'], section, text)
+        return f'generate_clean_html:{filename}', inputs, output_file, (generate_clean_html.render_page, (config, section, text))
+
+    if state['generator'] == 'grid':
+        _, title, _, active_page = next(page for page in generate_pages.PAGES if page[2] == section)
+        context = state['contexts'][section]
+        inputs = digest_values(state['template'], title, section, context, state['static_pages'])
+        job = (generate_pages.render_page, (output_file, title, section, active_page, context, state['static_pages']))
+        return f'generate_pages:{filename}', inputs, output_file, job
+
+    images_root = os.path.join(output, 'images')
+    inputs = cleanup_squarespace.page_inputs(
+        state['manifest'], state['template'], source_page(state, section), images_root, state['image_index'], state['html_style'],
+    )
+    args = (source_page(state, section), output_file, section, None, images_root, state['html_style'], state['image_index'])
+    job = (cleanup_squarespace.cleanup_html, args)
+    return f'cleanup_squarespace:{filename}', inputs, output_file, job
+
+def run_page(state, section):
+    """Return the worker job for a stale page, or None when it is up to date"""
+    key, inputs, output_file, job = plan_page(state, section)
+    if is_up_to_date(state['manifest'], key, inputs):
+        print(f"page:{section}: up to date")
+        return None
+    if state['dry_run']:
+        print(f"page:{section}: would render {os.path.basename(output_file)}")
+        return None
+
+    # Workers load the manifest and placeholders from disk, so hand them what was computed so far
+    save_manifest(state['manifest'])
+    save_placeholder_index(state['placeholders'])
+
+    def finish(result):
+        if state['generator'] == 'clean':
+            _, _, dimensions = result
+            state['dimensions']['entries'].update(dimensions)
+            state['dimensions']['dirty'] |= bool(dimensions)
+        # The grid generator also writes the gallery manifest (and static pages)
+        outputs = result if state['generator'] == 'grid' else [output_file]
+        record_outputs(state['manifest'], key, inputs, outputs)
+        print(f"page:{section}: rendered {os.path.basename(output_file)}")
+
+    return job[0], job[1], finish
+
+def site_digest(state):
+    """Digest of the whole site as the post-processing stages find it, reused until a stage runs"""
+    if state['site_digest'] is None:
+        state['site_digest'] = tree_digest(state['manifest'], state['output'])
+    return state['site_digest']
+
+def post_inputs(state, stage):
+    """Digest of everything a post-processing stage reads: the site, the stage scripts and the codecs"""
+    manifest = state['manifest']
+    scripts = [file_digest(manifest, os.path.join(os.path.dirname(os.path.abspath(__file__)), name)) for name in POST_SCRIPTS]
+    return digest_values(stage, site_digest(state), scripts, available_encodings())
+
+def run_post(state, stage):
+    """Run one site-wide post-processing stage, unless it last left the site exactly as it is now"""
+    if state['dry_run']:
+        print(f"{stage}: would run")
+        return
+
+    output = state['output']
+    manifest = state['manifest']
+    key = f'post:{stage}'
+    inputs = post_inputs(state, stage)
+    if is_up_to_date(manifest, key, inputs):
+        print(f"{stage}: up to date")
+        return
+
+    if stage == 'purge':
+        results = purge_site(output, manifest=manifest)
+        print(f"purge: {len(results)} bundles")
+    elif stage == 'critical':
+        report = inline_site(output, manifest=manifest)
+        print(f"critical: {len(report)} pages")
+    elif stage == 'fingerprint':
+        assets, removed = fingerprint_site(output, manifest=manifest)
+        print(f"fingerprint: {len(assets)} assets, {removed} stale copies removed")
+    elif stage == 'minify':
+        report = minify_site(output, manifest=manifest)
+        saved = sum(before - after for before, after in report.values())
+        print(f"minify: {len(report)} pages, {saved / 1024:.1f} KB saved")
+    elif stage == 'service-worker':
+        entries = build_service_worker(output, manifest=manifest)
+        print(f"service-worker: {len(entries)} files precached")
+    elif stage == 'precompress':
+        results = precompress_site(output, state['jobs'], manifest)
+        print(f"precompress: {len(results)} files")
+
+    # Only a run that changed nothing proves the stage has nothing to do on this site
+    state['site_digest'] = None
+    if post_inputs(state, stage) == inputs:
+        record_outputs(manifest, key, inputs, [])
+
+def build_graph(state, skip):
+    """Nodes of the build DAG: {name: (dependencies, run)}
+
+    A run returns None when it finished in-process, or (func, args, finish)
+    for work that goes to the pool; finish receives the worker's result.
+    """
+    nodes = {}
+    sources = []
+    if state['generator'] == 'clean':
+        nodes['text'] = ([], run_text)
+        sources.append('text')
+    if 'optimize' not in skip:
+        nodes['optimize'] = ([], run_optimize)
+        sources.append('optimize')
+    if 'derivatives' not in skip:
+        nodes['derivatives'] = (['optimize'] if 'optimize' in nodes else [], run_derivatives)
+        sources.append('derivatives')
+    if state['generator'] in ('clean', 'squarespace'):
+        nodes['image-index'] = (list(sources), run_image_index)
+        sources.append('image-index')
+
+    pages = []
+    for section in state['sections']:
+        nodes[f'images:{section}'] = (list(sources), lambda state, section=section: run_images(state, section))
+        nodes[f'page:{section}'] = (sources + [f'images:{section}'], lambda state, section=section: run_page(state, section))
+        pages.append(f'page:{section}')
+
+    previous = pages
+    for stage in POST_STAGES:
+        if stage in skip:
+            continue
+        nodes[stage] = (previous, lambda state, stage=stage: run_post(state, stage))
+        previous = [stage]
+    return nodes
+
+def run_graph(nodes, state):
+    """Run the DAG, sending page renders to the pool as soon as their inputs are ready"""
+    sorter = TopologicalSorter({name: dependencies for name, (dependencies, _) in nodes.items()})
+    sorter.prepare()
+
+    profile = build_profile.is_enabled()
+    executor = None
+    try:
+        running = {}
+        while sorter.is_active():
+            for name in sorter.get_ready():
+                with build_profile.span(f'phase:{name}'):
+                    job = nodes[name][1](state)
+                if job is None:
+                    sorter.done(name)
+                    continue
+
+                # The pool starts with the first stale page, so a no-op build never spawns workers
+                if executor is None:
+                    executor = ProcessPoolExecutor(max_workers=state['jobs'], initializer=init_worker, initargs=(profile,))
+                func, args, finish = job
+                if profile:
+                    # Workers send their events back with the result
+                    running[executor.submit(build_profile.run_profiled, f'worker:{name}', func, *args)] = (name, finish)
+                else:
+                    running[executor.submit(func, *args)] = (name, finish)
+
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, finish = running.pop(future)
+                    result = future.result()
+                    if profile:
+                        result, events = result
+                        build_profile.add_events(events)
+                    finish(result)
+                    sorter.done(name)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+def main():
+    """Build the site"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default=DEFAULT_INPUT, help='Squarespace export root (default: %(default)s)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='site root to write to (default: %(default)s)')
+    parser.add_argument('--generator', choices=GENERATORS, default='clean', help='page generator (default: %(default)s)')
+    parser.add_argument('--html-style', choices=cleanup_squarespace.OUTPUT_STYLES, default='compact', help='how the squarespace generator writes pages (default: %(default)s)')
+    parser.add_argument('--static-pages', action='store_true', help='grid generator: also write static gallery pages for browsing without JavaScript')
+    parser.add_argument('--png-to-jpeg', action='store_true', help='optimize stage: replace PNGs without alpha by JPEGs when much smaller (lossy)')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--only', choices=SECTIONS, action='append', help='limit to a section (repeatable)')
+    parser.add_argument('--skip', choices=['optimize', 'derivatives'] + POST_STAGES, action='append', default=[], help='leave out a stage (repeatable)')
+    parser.add_argument('--dry-run', action='store_true', help='print what would be rebuilt without writing anything')
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_TRACE, help='write a Chrome trace of the build (default path: <output>/%(const)s); memory tracing slows Python-heavy stages')
+    parser.add_argument('--profile-top', type=int, default=15, help='spans listed in the profile summary (default: %(default)s)')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    if args.profile:
+        enable_profiling()
+    manifest = load_manifest(manifest_path(output))
+    # The clean generator's caches double as the build's, so each is loaded and saved once
+    config = generate_clean_html.load_config(args.input, output, manifest)
+
+    state = {
+        'input': args.input,
+        'output': output,
+        'generator': args.generator,
+        'html_style': args.html_style,
+        'static_pages': args.static_pages,
+        'png_to_jpeg': args.png_to_jpeg,
+        'sections': args.only or SECTIONS,
+        'jobs': args.jobs,
+        'dry_run': args.dry_run,
+        'manifest': manifest,
+        'config': config,
+        'dimensions': config['dimensions'],
+        'placeholders': config['placeholders'],
+        'aliases': load_aliases(Path(output) / 'images'),
+        'contexts': {},
+        'text': {},
+        'site_digest': None,
+    }
+    state['template'] = {
+        'clean': generate_clean_html.template_digest,
+        'grid': generate_pages.template_digest,
+        'squarespace': cleanup_squarespace.script_digest,
+    }[args.generator](manifest)
+
+    try:
+        with build_profile.span('build'):
+            run_graph(build_graph(state, set(args.skip)), state)
+    finally:
+        if not args.dry_run:
+            save_manifest(manifest)
+            save_dimension_cache(state['dimensions'])
+            save_placeholder_index(state['placeholders'])
+
+    if args.profile:
+        events = build_profile.drain_events()
+        trace_path = os.path.join(output, args.profile)
+        build_profile.write_trace(trace_path, events)
+        build_profile.print_summary(events, args.profile_top)
+        print(f"\nTrace written to {trace_path} (open in chrome://tracing or ui.perfetto.dev)")
+
+    print("\nDry run complete, no pages or assets written" if args.dry_run else "\nBuild complete!")
+
+if __name__ == '__main__':
+    main()
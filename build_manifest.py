@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Content-hash build manifest for incremental builds
+- Records input digests and produced outputs per image and per page
+- Caches file digests by size/mtime so unchanged files are never re-read
+- Stored as JSON in .build/manifest.json next to the site
+"""
+
+import hashlib
+import json
+import os
+
+BUILD_DIR = '.build'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+def manifest_path(base_path):
+    """Get the manifest location for a site root"""
+    return os.path.join(base_path, BUILD_DIR, MANIFEST_NAME)
+
+def load_manifest(path):
+    """Load a manifest, starting fresh if it is missing or from another version"""
+    manifest = {'version': MANIFEST_VERSION, 'files': {}, 'entries': {}}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                manifest = data
+        except (OSError, ValueError):
+            print(f"  Ignoring unreadable manifest {path}")
+
+    manifest['path'] = path
+    manifest['dirty'] = False
+    return manifest
+
+def save_manifest(manifest):
+    """Write the manifest atomically, only if something changed"""
+    if not manifest.get('dirty'):
+        return
+
+    path = manifest['path']
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {key: value for key, value in manifest.items() if key not in ('path', 'dirty')}
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+    manifest['dirty'] = False
+
+def load_json_cache(base_path, name):
+    """Load a JSON cache from a site root's .build directory, starting empty if unreadable"""
+    path = os.path.join(base_path, BUILD_DIR, name)
+    entries = {}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+
+    return {'path': path, 'entries': entries, 'dirty': False}
+
+def save_json_cache(cache):
+    """Write a JSON cache atomically, only if something changed"""
+    if not cache['dirty']:
+        return
+
+    os.makedirs(os.path.dirname(cache['path']), exist_ok=True)
+    tmp_path = cache['path'] + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache['entries'], f, indent=1, sort_keys=True)
+    os.replace(tmp_path, cache['path'])
+    cache['dirty'] = False
+
+def file_digest(manifest, path):
+    """Get a file's SHA-256, reusing the cached digest while size and mtime match"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cached = manifest['files'].get(path)
+    if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime_ns:
+        return cached['sha256']
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+
+    digest = sha.hexdigest()
+    manifest['files'][path] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': digest}
+    manifest['dirty'] = True
+    return digest
+
+def directory_digest(manifest, path):
+    """Digest a directory's file names and contents (non-recursive)"""
+    if not os.path.exists(path):
+        return digest_values([])
+    entries = []
+    for name in sorted(os.listdir(path)):
+        file_path = os.path.join(path, name)
+        if os.path.isfile(file_path):
+            entries.append((name, file_digest(manifest, file_path)))
+    return digest_values(entries)
+
+def tree_digest(manifest, path, skip_dirs=('__pycache__',)):
+    """Digest every file under a directory by relative name and content, leaving out hidden directories"""
+    entries = []
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in skip_dirs and not d.startswith('.'))
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            if os.path.isfile(file_path):
+                entries.append((os.path.relpath(file_path, path), file_digest(manifest, file_path)))
+    return digest_values(entries)
+
+def digest_values(*values):
+    """Digest arbitrary JSON-serialisable inputs (listings, text slices, settings)"""
+    encoded = json.dumps(values, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+def is_up_to_date(manifest, key, inputs_digest):
+    """Check whether an entry was built from these inputs and its outputs are untouched"""
+    entry = manifest['entries'].get(key)
+    if not entry or entry['inputs'] != inputs_digest:
+        return False
+
+    for output, digest in entry['outputs'].items():
+        if not os.path.exists(output) or file_digest(manifest, output) != digest:
+            return False
+
+    return True
+
+def record_outputs(manifest, key, inputs_digest, outputs):
+    """Record the outputs produced for an entry from the given inputs
+
+    Other entries that wrote one of these files (another generator writing
+    the same page) are dropped, so they rebuild instead of adopting it.
+    """
+    recorded = {os.path.abspath(output): file_digest(manifest, output) for output in outputs}
+    for other in [k for k, entry in manifest['entries'].items() if k != key and not recorded.keys().isdisjoint(entry['outputs'])]:
+        del manifest['entries'][other]
+
+    manifest['entries'][key] = {'inputs': inputs_digest, 'outputs': recorded}
+    manifest['dirty'] = True
+
+def refresh_output(manifest, output):
+    """Re-record an output rewritten in place by a post-processing stage
+
+    Entries that produced the file now expect its new content, so the
+    post-processed file doesn't make the producing stage look stale.
+    """
+    output = os.path.abspath(output)
+    for entry in manifest['entries'].values():
+        if output in entry['outputs']:
+            entry['outputs'][output] = file_digest(manifest, output)
+            manifest['dirty'] = True
+
+def recorded_outputs(manifest, key):
+    """Get the output paths recorded for an entry"""
+    entry = manifest['entries'].get(key)
+    return list(entry['outputs']) if entry else []
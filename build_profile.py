@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Opt-in timing instrumentation for the build
+- Record wall time, CPU time and peak traced memory per call of instrumented functions
+- Collect events from worker processes alongside the main process
+- Write a Chrome trace (chrome://tracing, Perfetto) and print the slowest functions
+"""
+
+from contextlib import contextmanager
+import functools
+import json
+import os
+import time
+import tracemalloc
+
+# Off unless enable() is called, so spans cost one check in normal builds
+_state = {'enabled': False, 'events': [], 'stack': []}
+
+# Span args kept as they are; anything else is stored as str() so events stay JSON- and pickle-safe
+SCALAR_TYPES = (str, int, float, bool, type(None))
+
+def enable():
+    """Start recording in this process"""
+    if not _state['enabled']:
+        _state['enabled'] = True
+        tracemalloc.start()
+
+def reset():
+    """Forget inherited events and open spans (a forked worker starts with the parent's)"""
+    _state['events'] = []
+    _state['stack'] = []
+
+def is_enabled():
+    """Check whether this process is recording"""
+    return _state['enabled']
+
+def scalar_args(args):
+    """Coerce span args to scalars; workers pickle their events back to the parent"""
+    return {key: value if isinstance(value, SCALAR_TYPES) else str(value) for key, value in args.items()}
+
+@contextmanager
+def span(name, **args):
+    """Record one timed region; nested spans report their own peak memory"""
+    if not _state['enabled']:
+        yield
+        return
+
+    # tracemalloc has a single peak, so each span resets it and hands its peak up to its parent
+    parent = _state['stack'][-1] if _state['stack'] else None
+    if parent is not None:
+        parent['peak'] = max(parent['peak'], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+
+    frame = {'peak': 0}
+    _state['stack'].append(frame)
+    start_wall = time.time()
+    start_perf = time.perf_counter()
+    start_cpu = time.process_time()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start_perf
+        cpu = time.process_time() - start_cpu
+        _state['stack'].pop()
+        peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+        if parent is not None:
+            parent['peak'] = max(parent['peak'], peak)
+        tracemalloc.reset_peak()
+
+        _state['events'].append({
+            'name': name,
+            'ph': 'X',
+            'ts': int(start_wall * 1e6),
+            'dur': int(duration * 1e6),
+            'pid': os.getpid(),
+            'tid': 0,
+            'args': dict(scalar_args(args), cpu_ms=round(cpu * 1000, 3), peak_kb=round(peak / 1024, 1)),
+        })
+
+def instrument(module, names):
+    """Wrap module-level functions in spans; calls through the module's globals pick them up"""
+    for name in names:
+        func = getattr(module, name, None)
+        if func is None or getattr(func, '__wrapped__', None):
+            continue
+
+        def wrapper(*args, _func=func, _name=f'{module.__name__}.{name}', **kwargs):
+            with span(_name):
+                return _func(*args, **kwargs)
+
+        setattr(module, name, functools.wraps(func)(wrapper))
+
+def drain_events():
+    """Take the events recorded so far in this process"""
+    events, _state['events'] = _state['events'], []
+    return events
+
+def add_events(events):
+    """Merge events recorded by a worker process"""
+    _state['events'].extend(events)
+
+def run_profiled(name, func, *args):
+    """Run a worker job in a span; returns (result, events) so the parent can merge them"""
+    with span(name):
+        result = func(*args)
+    return result, drain_events()
+
+def write_trace(path, events):
+    """Write events as a Chrome trace JSON file"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    processes = sorted({event['pid'] for event in events})
+    metadata = [
+        {'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': 'main' if pid == os.getpid() else f'worker {pid}'}}
+        for pid in processes
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': metadata + sorted(events, key=lambda e: e['ts']), 'displayTimeUnit': 'ms'}, f)
+
+def summarize(events, top=15):
+    """Aggregate events by name: [(name, calls, wall s, cpu s, peak KB)] slowest first"""
+    totals = {}
+    for event in events:
+        entry = totals.setdefault(event['name'], [0, 0.0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += event['dur'] / 1e6
+        entry[2] += event['args']['cpu_ms'] / 1000
+        entry[3] = max(entry[3], event['args']['peak_kb'])
+    rows = [(name, *values) for name, values in totals.items()]
+    return sorted(rows, key=lambda row: row[2], reverse=True)[:top]
+
+def print_summary(events, top=15):
+    """Print the top functions and phases by total wall time"""
+    print(f"\n{'Span':<60} {'Calls':>6} {'Wall':>9} {'CPU':>9} {'Peak':>10}")
+    for name, calls, wall, cpu, peak in summarize(events, top):
+        print(f"{name:<60} {calls:>6} {wall:>8.3f}s {cpu:>8.3f}s {peak / 1024:>7.1f} MB")
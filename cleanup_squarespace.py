@@ -4,21 +4,56 @@ Clean up Squarespace HTML files with minimal changes
 - Remove Squarespace scripts
 - Update image URLs to local paths
 - Keep all content and structure
+- Write the page compactly in one streamed pass (--minify to shrink it, --prettify to debug)
 """
 
-from bs4 import BeautifulSoup
-import re
+import argparse
 import os
 
-def cleanup_html(input_file, output_file, section_name):
-    """Clean up Squarespace HTML with minimal changes"""
+from build_manifest import (
+    digest_values, file_digest, is_up_to_date, load_manifest, manifest_path,
+    record_outputs, save_manifest,
+)
+from fingerprint_assets import CSS_URL_PATTERN
+from image_index import CDN_HOST_SUFFIX, build_image_index, index_digest, is_cdn_url, resolve_url, save_image_index
+from image_pipeline import DERIVED_DIR, DEFAULT_SIZES, MODERN_FORMATS, SECTIONS, build_srcset, load_derivative_index
+from build_profile import span
+from html_writer import write_html
+from source_documents import take_tree
+
+DEFAULT_INPUT = r'C:\DEV\MARIA\MARIA_DATA'
+DEFAULT_OUTPUT = r'C:\DEV\MARIA\MARIA_WEBSITE'
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PAGES = [
+    ('home', 'index.html'),
+    ('projects', 'projects.html'),
+    ('photoshoots', 'photoshoots.html'),
+    ('press', 'press.html'),
+    ('press-loans', 'press-loans.html'),
+]
+
+# Attributes holding a single image URL
+URL_ATTRIBUTES = ['src', 'data-src', 'data-image']
+
+# <source type> -> derivative extension
+MIME_EXTENSIONS = {mime_type: ext for ext, mime_type, options in MODERN_FORMATS}
+
+# How cleaned pages are written: compact (as parsed), minified, or indented by prettify() for debugging
+OUTPUT_STYLES = ['compact', 'minify', 'prettify']
+
+def cleanup_html(input_file, output_file, section_name, manifest=None, images_root=os.path.join(DEFAULT_OUTPUT, 'images'), style='compact', image_index=None):
+    """Clean up Squarespace HTML with minimal changes
+
+    Returns the CDN URLs left pointing at Squarespace because no local copy
+    was found. Without an image_index, one is built for this page alone.
+    """
 
     print(f"\nProcessing {section_name}...")
 
-    with open(input_file, 'r', encoding='utf-8') as f:
-        html = f.read()
-
-    soup = BeautifulSoup(html, 'html.parser')
+    # Reuses the tree if the extraction already parsed this page in tree mode
+    with span('cleanup_html.parse', page=section_name):
+        soup = take_tree(input_file, manifest)
 
     # Remove ONLY external Squarespace scripts (keep inline styles!)
     for script in soup.find_all('script'):
@@ -40,46 +75,87 @@ def cleanup_html(input_file, output_file, section_name):
             continue
 
     # Remove inline styles that hide text with fonts-loading animation
-    for style in soup.find_all('style'):
-        if style.string and 'fonts-loading' in style.string:
-            style.decompose()
+    for style_tag in soup.find_all('style'):
+        if style_tag.string and 'fonts-loading' in style_tag.string:
+            style_tag.decompose()
 
     # Keep Squarespace meta tags and config - they don't hurt and may be needed
 
-    # Update image URLs to local paths
-    # First, get list of actual image files we have
-    images_dir = os.path.join(r'C:\DEV\MARIA\MARIA_WEBSITE\images', section_name)
-    available_images = {}
-    if os.path.exists(images_dir):
-        for img_file in os.listdir(images_dir):
-            # Strip section prefix to get original name
-            original_name = img_file.replace(f'{section_name}_', '')
-            available_images[original_name.lower()] = img_file
-
-    for img in soup.find_all('img'):
-        src = img.get('src', '')
-        data_src = img.get('data-src', '')
-
-        if 'squarespace-cdn.com' in src:
-            # Extract filename from URL (last part before query params)
-            filename_match = re.search(r'/([^/\?]+\.(jpg|jpeg|png|gif|webp))', src, re.I)
-            if filename_match:
-                filename = filename_match.group(1)
-                # Find matching local file
-                if filename.lower() in available_images:
-                    local_file = available_images[filename.lower()]
-                    img['src'] = f'./images/{section_name}/{local_file}'
-                    # Keep srcset but update it too
-                    if img.get('srcset'):
-                        del img['srcset']
-
-        if 'squarespace-cdn.com' in data_src:
-            filename_match = re.search(r'/([^/\?]+\.(jpg|jpeg|png|gif|webp))', data_src, re.I)
-            if filename_match:
-                filename = filename_match.group(1)
-                if filename.lower() in available_images:
-                    local_file = available_images[filename.lower()]
-                    img['data-src'] = f'./images/{section_name}/{local_file}'
+    # Update image URLs to local paths through the cross-section index, in one pass over the tags
+    if image_index is None:
+        image_index = build_image_index(
+            os.path.dirname(images_root), [(section_name, input_file)],
+            manifest if manifest is not None else load_manifest(manifest_path(os.path.dirname(images_root))),
+        )
+    unresolved = {}
+    derivative_indexes = {}
+
+    def resolve(url):
+        """Local 'section/file' for a CDN URL, noting URLs without a local copy"""
+        if CDN_HOST_SUFFIX not in url or not is_cdn_url(url):
+            return None
+        item = resolve_url(image_index, url, section_name)
+        if item is None:
+            unresolved.setdefault(url, True)
+        return item
+
+    def derivative_srcset(item, ext=None):
+        """srcset of a local image's derivatives in one format ('' when there are none)"""
+        local_section, local_file = item.split('/', 1)
+        if local_section not in derivative_indexes:
+            derivative_indexes[local_section] = load_derivative_index(images_root, local_section)
+        return build_srcset(f'./images/{DERIVED_DIR}/{local_section}', local_file, derivative_indexes[local_section], ext)
+
+    def rewrite_css_url(match):
+        """Point a url() in an inline style (background-image) at the local copy"""
+        item = resolve(match.group(2))
+        return f'url({match.group(1)}./images/{item}{match.group(1)})' if item else match.group(0)
+
+    for tag in soup.find_all(True):
+        src_item = None
+        for attr in URL_ATTRIBUTES:
+            item = resolve(tag.get(attr, ''))
+            if item:
+                tag[attr] = f'./images/{item}'
+                src_item = src_item or (item if attr == 'src' else None)
+
+        if tag.name == 'img' and src_item:
+            # Replace the CDN srcset with the local derivatives
+            srcset = derivative_srcset(src_item)
+            if srcset:
+                tag['srcset'] = srcset
+                if not tag.get('sizes'):
+                    tag['sizes'] = DEFAULT_SIZES
+            elif tag.get('srcset'):
+                del tag['srcset']
+        elif tag.name in ('img', 'source') and CDN_HOST_SUFFIX in tag.get('srcset', ''):
+            candidates = [candidate.split(None, 1) for candidate in tag['srcset'].split(',') if candidate.strip()]
+            items = [resolve(candidate[0]) for candidate in candidates]
+            local_items = set(items) - {None}
+            if len(local_items) == 1 and None not in items:
+                # One photo at several CDN widths: point at its derivatives in the source's format
+                item = local_items.pop()
+                srcset = derivative_srcset(item, MIME_EXTENSIONS.get(tag.get('type')))
+                if srcset:
+                    tag['srcset'] = srcset
+                elif tag.name == 'source' and tag.get('type') in MIME_EXTENSIONS:
+                    # No local copy in this format; the <img> fallback covers it
+                    tag.decompose()
+                    continue
+                else:
+                    tag['srcset'] = f'./images/{item}'
+            else:
+                tag['srcset'] = ', '.join(
+                    ' '.join([f'./images/{item}' if item else candidate[0]] + candidate[1:])
+                    for candidate, item in zip(candidates, items)
+                )
+
+        style_attr = tag.get('style')
+        if style_attr and CDN_HOST_SUFFIX in style_attr:
+            tag['style'] = CSS_URL_PATTERN.sub(rewrite_css_url, style_attr)
+
+    if unresolved:
+        print(f"  {len(unresolved)} CDN references without a local copy")
 
     # Update navigation links
     for a in soup.find_all('a'):
@@ -110,8 +186,8 @@ def cleanup_html(input_file, output_file, section_name):
         head.append(link2)
 
         # Add critical CSS fixes at the very end
-        style = soup.new_tag('style')
-        style.string = '''
+        style_tag = soup.new_tag('style')
+        style_tag.string = '''
         /* Red background override */
         body { background-color: hsla(0, 97%, 55%, 1) !important; }
         .header-announcement-bar-wrapper { background-color: hsla(0, 97%, 55%, 1) !important; }
@@ -221,7 +297,7 @@ def cleanup_html(input_file, output_file, section_name):
         /* The layout intentionally positions text and images in different columns */
         /* Forcing all blocks to column 1 caused text/image overlapping */
         '''
-        head.append(style)
+        head.append(style_tag)
 
     # Remove the wf-loading class from html tag to prevent text hiding
     html_tag = soup.find('html')
@@ -254,34 +330,79 @@ def cleanup_html(input_file, output_file, section_name):
             content_div.append(new_html)
             print(f"  Replaced scaled-text with simple title HTML")
 
-    # Write cleaned HTML
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(str(soup.prettify()))
+    # Write cleaned HTML; prettify() builds the whole indented page in memory, so it's only for debugging
+    with span('cleanup_html.write', page=section_name, style=style):
+        with open(output_file, 'w', encoding='utf-8') as f:
+            if style == 'prettify':
+                f.write(soup.prettify())
+            else:
+                write_html(soup, f, minify=style == 'minify')
 
     print(f"  Cleaned HTML written to {output_file}")
+    return list(unresolved)
+
+def script_digest(manifest):
+    """Digest of the code that shapes every cleaned page"""
+    return digest_values(
+        file_digest(manifest, __file__),
+        file_digest(manifest, os.path.join(SCRIPT_DIR, 'image_pipeline.py')),
+        file_digest(manifest, os.path.join(SCRIPT_DIR, 'source_documents.py')),
+        file_digest(manifest, os.path.join(SCRIPT_DIR, 'html_writer.py')),
+        file_digest(manifest, os.path.join(SCRIPT_DIR, 'image_index.py')),
+    )
+
+def page_inputs(manifest, script, input_file, images_root, image_index, style='compact'):
+    """Digest of everything a cleaned page is built from
+
+    Pages may reference images from any section, so every section's
+    derivatives count.
+    """
+    return digest_values(
+        script,
+        style,
+        file_digest(manifest, input_file),
+        index_digest(image_index),
+        [load_derivative_index(images_root, section) for section in SECTIONS],
+    )
 
 def main():
     """Process all pages"""
-
-    base_input = r'C:\DEV\MARIA\MARIA_DATA'
-    base_output = r'C:\DEV\MARIA\MARIA_WEBSITE'
-
-    pages = [
-        ('home', 'index.html'),
-        ('projects', 'projects.html'),
-        ('photoshoots', 'photoshoots.html'),
-        ('press', 'press.html'),
-        ('press-loans', 'press-loans.html'),
-    ]
-
-    for section, output_filename in pages:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--minify', dest='style', action='store_const', const='minify', help='collapse whitespace, drop comments and optional end tags')
+    group.add_argument('--prettify', dest='style', action='store_const', const='prettify', help='indent the output (slow, for debugging)')
+    parser.set_defaults(style='compact')
+    args = parser.parse_args()
+
+    base_input = DEFAULT_INPUT
+    base_output = DEFAULT_OUTPUT
+    images_root = os.path.join(base_output, 'images')
+
+    # Pages are rebuilt only when their source page, the image index or this script change
+    manifest = load_manifest(manifest_path(base_output))
+    script = script_digest(manifest)
+    source_pages = [(section, os.path.join(base_input, section, 'index.html')) for section, _ in PAGES]
+    image_index = build_image_index(base_output, source_pages, manifest)
+    save_image_index(image_index)
+
+    for section, output_filename in PAGES:
         input_file = os.path.join(base_input, section, 'index.html')
         output_file = os.path.join(base_output, output_filename)
 
-        cleanup_html(input_file, output_file, section)
+        key = f'cleanup_squarespace:{output_filename}'
+        inputs = page_inputs(manifest, script, input_file, images_root, image_index, args.style)
+        if is_up_to_date(manifest, key, inputs):
+            print(f"\nSkipping {section} ({output_filename} is up to date)")
+            continue
+
+        unresolved = cleanup_html(input_file, output_file, section, manifest, images_root, args.style, image_index)
+        record_outputs(manifest, key, inputs, [output_file])
+        for url in unresolved:
+            print(f"  Unresolved: {url}")
+
+    save_manifest(manifest)
 
     print("\nAll pages cleaned successfully!")
-    print("\nNote: You may need to manually adjust image paths if filenames don't match exactly.")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Inline above-the-fold CSS and load the rest asynchronously
+- Bundle each page's render-blocking <link> stylesheets and <style> blocks into css/bundle-<hash>.css;
+  runs before fingerprinting, which rewrites the bundle's url()s and names it after its new content
+- Inline only the rules matching the first screenful of elements in <head>
+- Load the bundle with rel=preload (plus a <noscript> fallback) so it no longer blocks first paint
+- Report the render-blocking CSS bytes per page before and after
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from build_manifest import load_manifest, manifest_path, refresh_output, save_manifest
+from fingerprint_assets import CSS_URL_PATTERN, FINGERPRINTED_PATTERN, HASH_LENGTH, site_pages
+from minify_html import minify_css
+from purge_css import DEFAULT_SAFELIST, collect_usage, compile_safelist, purge_css
+
+PAGES = ['index.html', 'projects.html', 'photoshoots.html', 'press.html', 'press-loans.html', '404.html']
+BUNDLE_DIR = 'css'
+BUNDLE_PREFIX = 'bundle-'
+
+# Body elements counted as "above the fold": the header plus the first rows of content
+FOLD_ELEMENTS = 80
+
+HEAD_PATTERN = re.compile(r'(<head\b[^>]*>)(.*?)(</head>)', re.I | re.S)
+HEAD_TAG_PATTERN = re.compile(r'<noscript\b.*?</noscript>|<style\b([^>]*)>(.*?)</style>|<link\b([^>]*)>', re.I | re.S)
+ATTR_PATTERN = re.compile(r'([\w:-]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s"\'>]+))?')
+CRITICAL_MARKER = 'data-critical'
+
+def parse_attrs(text):
+    """Parse the attributes of a tag into a dict with lower-case names"""
+    return {name.lower(): value.strip('"\'') for name, value in ATTR_PATTERN.findall(text or '')}
+
+def is_local(url):
+    """Check whether a URL points into the site rather than at another host"""
+    parts = urlsplit(url)
+    return not (parts.scheme or parts.netloc or url.startswith('//'))
+
+def rebase_urls(css, from_dir, to_dir):
+    """Rewrite relative url() references so they resolve from to_dir instead of from_dir"""
+    def replace(match):
+        quote, url = match.group(1), match.group(2).strip()
+        if not is_local(url) or url.startswith(('/', '#')) or url.lower().startswith('data:'):
+            return match.group(0)
+        target = os.path.normpath(os.path.join(from_dir, url))
+        return f'url({quote}{Path(os.path.relpath(target, to_dir)).as_posix()}{quote})'
+    return CSS_URL_PATTERN.sub(replace, css)
+
+def collect_blocking_css(head, page_dir):
+    """Find the render-blocking CSS in a <head>
+
+    Returns (spans, sources): the (start, end) of every tag to replace and
+    [(css, directory its urls resolve from)] in document order. A bundle
+    preloaded by an earlier run counts as a stylesheet, and a previous
+    critical <style> is dropped, so the step can run again on its own output.
+    """
+    spans = []
+    sources = []
+    for match in HEAD_TAG_PATTERN.finditer(head):
+        tag = match.group(0)
+        if tag[:9].lower() == '<noscript':
+            if BUNDLE_PREFIX in tag:
+                spans.append(match.span())
+            continue
+
+        if match.group(2) is not None:
+            attrs = parse_attrs(match.group(1))
+            spans.append(match.span())
+            if CRITICAL_MARKER not in attrs:
+                sources.append((match.group(2), page_dir))
+            continue
+
+        attrs = parse_attrs(match.group(3))
+        rel = attrs.get('rel', '').lower().split()
+        href = attrs.get('href', '')
+        is_stylesheet = 'stylesheet' in rel and attrs.get('media', 'all') in ('all', 'screen')
+        is_bundle = 'preload' in rel and attrs.get('as') == 'style' and CRITICAL_MARKER in attrs
+        if not href or not is_local(href) or not (is_stylesheet or is_bundle):
+            continue
+
+        path = page_dir / href.split('?', 1)[0].split('#', 1)[0]
+        if not path.is_file():
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            sources.append((f.read(), path.parent))
+        spans.append(match.span())
+    return spans, sources
+
+def write_bundle(site_root, css):
+    """Write a bundle named after its content (shared by pages with the same CSS)"""
+    digest = hashlib.sha256(css.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+    path = Path(site_root) / BUNDLE_DIR / f'{BUNDLE_PREFIX}{digest}.css'
+    if not path.exists():
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(css)
+    return path
+
+def critical_head(critical, bundle_href):
+    """Markup replacing the blocking stylesheets: inline rules, preload, noscript fallback
+
+    Written already minified, so the minify stage leaves a rerun's output alone.
+    """
+    return (
+        f'<style {CRITICAL_MARKER}>{critical}</style>'
+        f'<link rel="preload" href="{bundle_href}" as="style" {CRITICAL_MARKER} onload="this.onload=null;this.rel=\'stylesheet\'">'
+        f'<noscript><link rel="stylesheet" href="{bundle_href}"></noscript>'
+    )
+
+def inline_critical_css(html, page_path, site_root, is_safe, fold_elements=FOLD_ELEMENTS):
+    """Rewrite one page; returns (html, bundle path, blocking bytes before, after)"""
+    head_match = HEAD_PATTERN.search(html)
+    if not head_match:
+        return html, None, 0, 0
+
+    head = head_match.group(2)
+    spans, sources = collect_blocking_css(head, page_path.parent)
+    if not sources:
+        return html, None, 0, 0
+    blocking_before = sum(len(css.encode('utf-8')) for css, directory in sources)
+
+    bundle_dir = Path(site_root) / BUNDLE_DIR
+    bundle = write_bundle(site_root, '\n'.join(rebase_urls(css, directory, bundle_dir) for css, directory in sources))
+    page_css = '\n'.join(rebase_urls(css, directory, page_path.parent) for css, directory in sources)
+    critical = minify_css(purge_css(page_css, collect_usage(html, fold_elements), is_safe))
+
+    bundle_href = Path(os.path.relpath(bundle, page_path.parent)).as_posix()
+    replacement = critical_head(critical, bundle_href)
+
+    # Replace the first blocking tag with the new markup and drop the others with their lines
+    pieces = []
+    position = 0
+    for index, (start, end) in enumerate(spans):
+        if index == 0:
+            pieces.append(head[position:start])
+            pieces.append(replacement)
+        else:
+            pieces.append(head[position:start].rstrip(' \t'))
+            if head.startswith('\n', end):
+                end += 1
+        position = end
+    pieces.append(head[position:])
+    new_head = ''.join(pieces)
+
+    new_html = html[:head_match.start(2)] + new_head + html[head_match.end(2):]
+    return new_html, bundle, blocking_before, len(f'<style {CRITICAL_MARKER}>{critical}</style>'.encode('utf-8'))
+
+def prune_stale_bundles(site_root, live):
+    """Remove bundles from earlier runs that no page references any more
+
+    Fingerprinted copies (from builds that hashed bundles again) are left
+    to fingerprint_assets, which tracks them.
+    """
+    removed = 0
+    for path in (Path(site_root) / BUNDLE_DIR).glob(f'{BUNDLE_PREFIX}*.css'):
+        if path not in live and not FINGERPRINTED_PATTERN.match(path.name):
+            os.remove(path)
+            removed += 1
+    return removed
+
+def inline_site(site_root, pages=PAGES, safelist=DEFAULT_SAFELIST, fold_elements=FOLD_ELEMENTS, manifest=None):
+    """Inline critical CSS into every page; returns {page: {'before', 'after', 'bundle'}}"""
+    site_root = Path(site_root).resolve()
+    is_safe = compile_safelist(list(safelist))
+
+    report = {}
+    live = set()
+    for page in site_pages(site_root, pages):
+        page_path = site_root / page
+        if not page_path.exists():
+            continue
+
+        with open(page_path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        new_html, bundle, before, after = inline_critical_css(html, page_path, site_root, is_safe, fold_elements)
+        if bundle is None:
+            continue
+        live.add(bundle)
+
+        if new_html != html:
+            with open(page_path, 'w', encoding='utf-8') as f:
+                f.write(new_html)
+            if manifest is not None:
+                refresh_output(manifest, page_path)
+
+        report[page] = {'before': before, 'after': after, 'bundle': bundle.relative_to(site_root).as_posix()}
+
+    prune_stale_bundles(site_root, live)
+    return report
+
+def main():
+    """Inline critical CSS for every page and report render-blocking bytes"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fold', type=int, default=FOLD_ELEMENTS, help='body elements treated as above the fold (default: %(default)s)')
+    parser.add_argument('--safelist', action='append', default=[], help="extra name or /regex/ to always inline (repeatable)")
+    parser.add_argument('--report', help='write the render-blocking bytes report as JSON to this file')
+    args = parser.parse_args()
+
+    base_path = Path(__file__).parent
+    manifest = load_manifest(manifest_path(base_path))
+
+    report = inline_site(base_path, PAGES, DEFAULT_SAFELIST + args.safelist, args.fold, manifest)
+    save_manifest(manifest)
+
+    print(f"{'Page':<20} {'Blocking before':>16} {'Blocking after':>16}")
+    for page, entry in report.items():
+        print(f"{page:<20} {entry['before'] / 1024:>13.1f} KB {entry['after'] / 1024:>13.1f} KB")
+    if not report:
+        print("No pages with render-blocking CSS")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+
+if __name__ == '__main__':
+    main()
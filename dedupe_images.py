@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Find near-duplicate images across sections with perceptual hashes
+- Compute a 64-bit difference hash (dHash) per image, cached by content digest
+- Index the hashes in a BK-tree so each lookup only visits nearby hashes
+- Report clusters of near-duplicates, or collapse them onto one canonical file
+  recorded in images/aliases.json so pages keep referencing the photo
+- Collapsed copies are moved to .build/duplicates/<section>/, never deleted, since a
+  similar frame from the same series can fall under the threshold too
+"""
+
+import argparse
+import json
+import os
+import shutil
+from pathlib import Path
+
+from build_manifest import BUILD_DIR, file_digest, load_json_cache, load_manifest, manifest_path, save_json_cache, save_manifest
+from image_dimensions import get_dimensions, load_dimension_cache, save_dimension_cache
+from image_pipeline import SECTIONS, list_section_images
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+HASH_CACHE_NAME = 'phashes.json'
+ALIASES_NAME = 'aliases.json'
+DUPLICATES_DIR = 'duplicates'
+
+# Hamming distance (out of 64 bits) under which two images count as the same photo
+DEFAULT_THRESHOLD = 6
+
+def difference_hash(path):
+    """Compute a 64-bit dHash: brightness gradients of a 9x8 grayscale thumbnail"""
+    if Image is None:
+        raise RuntimeError("Pillow is required to hash images (pip install Pillow)")
+
+    with Image.open(path) as img:
+        img.draft('L', (64, 64))
+        img = ImageOps.exif_transpose(img).convert('L').resize((9, 8), Image.LANCZOS)
+        pixels = img.tobytes()
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+def hamming(a, b):
+    """Count differing bits between two hashes"""
+    return bin(a ^ b).count('1')
+
+def bk_insert(tree, value, item):
+    """Insert a hash into a BK-tree; nodes are [hash, items, {distance: child}]"""
+    if tree is None:
+        return [value, [item], {}]
+
+    node = tree
+    while True:
+        distance = hamming(value, node[0])
+        if distance == 0:
+            node[1].append(item)
+            return tree
+        child = node[2].get(distance)
+        if child is None:
+            node[2][distance] = [value, [item], {}]
+            return tree
+        node = child
+
+def bk_search(tree, value, threshold):
+    """Find every item whose hash is within threshold of value"""
+    matches = []
+    stack = [tree] if tree else []
+    while stack:
+        node = stack.pop()
+        distance = hamming(value, node[0])
+        if distance <= threshold:
+            matches.extend(node[1])
+        # Triangle inequality: only children in [d - t, d + t] can match
+        for child_distance, child in node[2].items():
+            if distance - threshold <= child_distance <= distance + threshold:
+                stack.append(child)
+    return matches
+
+def load_hash_cache(base_path):
+    """Load cached hashes keyed by content digest"""
+    return load_json_cache(base_path, HASH_CACHE_NAME)
+
+def save_hash_cache(cache):
+    """Write the hash cache if new hashes were computed"""
+    save_json_cache(cache)
+
+def hash_images(images_path, manifest, hash_cache, sections=SECTIONS):
+    """Get {'section/file': dhash} for every image, hashing only new content"""
+    hashes = {}
+    for section in sections:
+        for file in list_section_images(images_path / section):
+            digest = file_digest(manifest, images_path / section / file)
+            if digest not in hash_cache['entries']:
+                hash_cache['entries'][digest] = format(difference_hash(images_path / section / file), '016x')
+                hash_cache['dirty'] = True
+            hashes[f'{section}/{file}'] = int(hash_cache['entries'][digest], 16)
+    return hashes
+
+def find_duplicates(hashes, threshold=DEFAULT_THRESHOLD):
+    """Group images into clusters of near-duplicates (clusters of one are dropped)"""
+    tree = None
+    for item in sorted(hashes):
+        tree = bk_insert(tree, hashes[item], item)
+
+    # Union-find over every pair the BK-tree reports as close
+    parent = {item: item for item in hashes}
+
+    def find(item):
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    for item in sorted(hashes):
+        for match in bk_search(tree, hashes[item], threshold):
+            root_a, root_b = find(item), find(match)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters = {}
+    for item in sorted(hashes):
+        clusters.setdefault(find(item), []).append(item)
+    return [members for members in clusters.values() if len(members) > 1]
+
+def pick_canonical(images_path, members, dimension_cache):
+    """Pick the copy with the most pixels (then the largest file) as canonical"""
+    def score(item):
+        size = get_dimensions(dimension_cache, images_path / item) or (0, 0)
+        return (size[0] * size[1], os.path.getsize(images_path / item), item)
+    return max(members, key=score)
+
+def load_aliases(images_path):
+    """Load the alias map of collapsed duplicates: {'section/file': 'section/file'}"""
+    path = Path(images_path) / ALIASES_NAME
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_aliases(images_path, aliases):
+    """Write the alias map"""
+    with open(Path(images_path) / ALIASES_NAME, 'w', encoding='utf-8') as f:
+        json.dump(aliases, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def resolve_alias(aliases, item):
+    """Follow aliases to the file that is actually on disk"""
+    seen = set()
+    while item in aliases and item not in seen:
+        seen.add(item)
+        item = aliases[item]
+    return item
+
+def collapse_duplicates(images_path, report, backup_path):
+    """Move each cluster's duplicates under backup_path and alias them to the canonical copy
+
+    Returns the updated alias map; moving a file back and deleting its alias undoes it.
+    """
+    aliases = load_aliases(images_path)
+    for cluster in report:
+        for item in cluster['duplicates']:
+            target = Path(backup_path) / item
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(Path(images_path) / item, target)
+            aliases[item] = cluster['canonical']
+    save_aliases(images_path, aliases)
+    return aliases
+
+def main():
+    """Report or collapse near-duplicate images"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threshold', type=int, default=DEFAULT_THRESHOLD, help='max Hamming distance (default: %(default)s)')
+    parser.add_argument('--report', help='write the clusters as JSON to this file')
+    parser.add_argument('--collapse', action='store_true', help='move duplicates to .build/duplicates and record them in images/aliases.json')
+    args = parser.parse_args()
+
+    base_path = Path(__file__).parent
+    images_path = base_path / 'images'
+
+    manifest = load_manifest(manifest_path(base_path))
+    hash_cache = load_hash_cache(base_path)
+    dimension_cache = load_dimension_cache(base_path)
+
+    hashes = hash_images(images_path, manifest, hash_cache)
+    clusters = find_duplicates(hashes, args.threshold)
+
+    report = []
+    duplicate_bytes = 0
+    for members in clusters:
+        canonical = pick_canonical(images_path, members, dimension_cache)
+        duplicates = [item for item in members if item != canonical]
+        duplicate_bytes += sum(os.path.getsize(images_path / item) for item in duplicates)
+        report.append({'canonical': canonical, 'duplicates': duplicates})
+
+    save_hash_cache(hash_cache)
+    save_dimension_cache(dimension_cache)
+    save_manifest(manifest)
+
+    for cluster in report:
+        print(f"{cluster['canonical']}")
+        for item in cluster['duplicates']:
+            print(f"  = {item} (distance {hamming(hashes[item], hashes[cluster['canonical']])})")
+
+    duplicate_count = sum(len(cluster['duplicates']) for cluster in report)
+    print(f"\n{len(hashes)} images, {len(report)} clusters, {duplicate_count} duplicates ({duplicate_bytes / 1e6:.1f} MB)")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+
+    if args.collapse:
+        backup_path = base_path / BUILD_DIR / DUPLICATES_DIR
+        collapse_duplicates(images_path, report, backup_path)
+        print(f"Collapsed {duplicate_count} duplicates into {images_path / ALIASES_NAME}; the copies were moved to {backup_path}")
+
+if __name__ == '__main__':
+    main()
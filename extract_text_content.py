@@ -3,60 +3,69 @@
 Extract text content from original Squarespace HTML files
 """
 
-from bs4 import BeautifulSoup
 import os
 import json
 
-def extract_text_from_html(html_file):
-    """Extract meaningful text content from HTML"""
-    with open(html_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+from source_documents import SCRIPT_DIR, load_records
 
-    soup = BeautifulSoup(content, 'html.parser')
+DEFAULT_INPUT = r'C:\DEV\MARIA\MARIA_DATA'
+DEFAULT_OUTPUT_FILE = r'C:\DEV\MARIA\MARIA_WEBSITE\text_content.json'
+SECTIONS = ['home', 'projects', 'photoshoots', 'press', 'press-loans']
 
+def extract_text_from_html(html_file, manifest=None, base_path=None, read_only=False):
+    """Extract meaningful text content from HTML
+
+    Parsed records are cached under base_path (default: next to the scripts).
+    """
     text_content = []
 
-    # Find all text blocks
-    for block in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p']):
-        text = block.get_text(strip=True)
+    # Text blocks come from the shared loader, which parses each source page once;
+    # 'block' keeps each one's position so images can be placed under their heading
+    for index, block in enumerate(load_records(html_file, manifest, base_path or SCRIPT_DIR, read_only=read_only)['text']):
+        text = block['text']
         if text and len(text) > 1:  # Ignore empty or single-char text
             # Get tag name
-            tag = block.name
+            tag = block['tag']
             # Clean up text
             text = text.replace('\xa0', ' ').strip()
             if text not in ['CONTACT', 'FOLLOW', 'WEBSITES']:  # Skip footer duplicates
                 text_content.append({
                     'tag': tag,
-                    'text': text
+                    'text': text,
+                    'block': index
                 })
 
     return text_content
 
-def main():
-    base_path = r'C:\DEV\MARIA\MARIA_DATA'
-    sections = ['home', 'projects', 'photoshoots', 'press', 'press-loans']
-
+def extract_all_text(base_path, sections=SECTIONS, manifest=None, cache_path=None, read_only=False):
+    """Extract the text of every section that has a source page"""
     all_content = {}
-
     for section in sections:
         html_file = os.path.join(base_path, section, 'index.html')
         if os.path.exists(html_file):
-            print(f"\n=== {section.upper()} ===")
-            content = extract_text_from_html(html_file)
-            all_content[section] = content
-
-            for item in content[:20]:  # Show first 20 items
-                try:
-                    print(f"{item['tag']}: {item['text']}")
-                except UnicodeEncodeError:
-                    print(f"{item['tag']}: [text with special characters]")
+            all_content[section] = extract_text_from_html(html_file, manifest, cache_path, read_only)
+    return all_content
 
-    # Save to JSON
-    output_file = r'C:\DEV\MARIA\MARIA_WEBSITE\text_content.json'
+def save_text_content(all_content, output_file):
+    """Write the extracted text as JSON"""
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(all_content, f, indent=2, ensure_ascii=False)
 
-    print(f"\n\nSaved all content to {output_file}")
+def main():
+    all_content = extract_all_text(DEFAULT_INPUT)
+
+    for section, content in all_content.items():
+        print(f"\n=== {section.upper()} ===")
+        for item in content[:20]:  # Show first 20 items
+            try:
+                print(f"{item['tag']}: {item['text']}")
+            except UnicodeEncodeError:
+                print(f"{item['tag']}: [text with special characters]")
+
+    # Save to JSON
+    save_text_content(all_content, DEFAULT_OUTPUT_FILE)
+
+    print(f"\n\nSaved all content to {DEFAULT_OUTPUT_FILE}")
 
 if __name__ == '__main__':
     main()
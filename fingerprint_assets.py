@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Fingerprint static assets with content hashes for long-lived caching
+- Link every local CSS/JS/image/font referenced by the pages to name.<hash>.ext
+- Rewrite src/href/srcset/data-src and CSS url() references to the hashed names,
+  in the pages and in the image-grid gallery manifests (data/gallery-*.json)
+- Write asset-manifest.json and a _headers file marking hashed assets immutable
+  (read by Netlify and Cloudflare Pages; GitHub Pages ignores it)
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from build_manifest import file_digest, load_manifest, manifest_path, refresh_output, save_manifest
+
+PAGES = ['index.html', 'projects.html', 'photoshoots.html', 'press.html', 'press-loans.html', '404.html']
+ASSET_MANIFEST_NAME = 'asset-manifest.json'
+# Written by generate_pages; their URLs are relative to the pages at the site root
+GALLERY_GLOB = 'data/gallery-*.json'
+# generate_pages --static-pages output, which links assets like the pages do
+STATIC_PAGE_GLOB = '*-page-*.html'
+HEADERS_NAME = '_headers'
+# Written by service_worker.py after this stage; browsers must revalidate it on every check
+SERVICE_WORKER_NAME = 'sw.js'
+
+FINGERPRINT_EXTENSIONS = (
+    '.css', '.js', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.svg', '.ico',
+    '.woff', '.woff2', '.ttf', '.otf', '.eot',
+)
+HASH_LENGTH = 10
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+HTML_CACHE_CONTROL = 'no-cache'
+# Unhashed assets may change between builds, so they're only cached briefly
+DEFAULT_CACHE_CONTROL = 'public, max-age=300'
+
+FINGERPRINTED_PATTERN = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[A-Za-z0-9]+)$' % HASH_LENGTH)
+# critical_css bundles are named after their content already (bundle-<hash>.css)
+CONTENT_NAME = 'bundle-{digest}.css'
+CONTENT_NAMED_PATTERN = re.compile(r'^bundle-[0-9a-f]{%d}\.css$' % HASH_LENGTH)
+ATTRIBUTE_PATTERN = re.compile(r'(\s(?:src|href|data-src|srcset)=")([^"]*)(")', re.I)
+CSS_URL_PATTERN = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)', re.I)
+
+def fingerprinted_name(filename, digest):
+    """Insert a content hash before the extension: main.css -> main.<hash>.css"""
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}.{digest[:HASH_LENGTH]}{ext}'
+
+def is_fingerprinted(filename):
+    """Check whether a filename carries a content hash (name.<hash>.ext or a critical CSS bundle)"""
+    return FINGERPRINTED_PATTERN.match(filename) is not None or CONTENT_NAMED_PATTERN.match(filename) is not None
+
+def site_pages(site_root, pages=PAGES):
+    """The given pages plus the static gallery pages (generate_pages --static-pages) in the site"""
+    static_pages = [path.name for path in sorted(Path(site_root).glob(STATIC_PAGE_GLOB))]
+    return list(pages) + [page for page in static_pages if page not in pages]
+
+def original_path(path):
+    """Map an already fingerprinted path back to its source file"""
+    match = FINGERPRINTED_PATTERN.match(path.name)
+    if match:
+        source = path.with_name(match.group('stem') + match.group('ext'))
+        if source.exists():
+            return source
+    return path
+
+def resolve_reference(url, base_dir, site_root):
+    """Resolve a local URL to (source file, url path part, query/fragment suffix), or None"""
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path or url.startswith('//'):
+        return None
+    if not parts.path.lower().endswith(FINGERPRINT_EXTENSIONS):
+        return None
+
+    path = unquote(parts.path)
+    target = (site_root / path.lstrip('/')) if path.startswith('/') else (base_dir / path)
+    target = original_path(Path(os.path.normpath(target)))
+    if not target.is_file():
+        return None
+
+    suffix = url[len(parts.path):]
+    return target, parts.path, suffix
+
+def fingerprint_asset(state, source):
+    """Create the hashed copy of an asset (CSS is rewritten first) and return its path"""
+    site_root = state['site_root']
+    key = source.relative_to(site_root).as_posix()
+    if key in state['assets']:
+        return site_root / state['assets'][key]
+    if CONTENT_NAMED_PATTERN.match(source.name):
+        return fingerprint_bundle(state, source, key)
+
+    if source.suffix.lower() == '.css':
+        with open(source, 'r', encoding='utf-8') as f:
+            css = f.read()
+        rewritten = rewrite_css(state, css, source.parent)
+        digest = file_digest(state['manifest'], source) if rewritten == css else content_digest(rewritten)
+        target = source.with_name(fingerprinted_name(source.name, digest))
+        if not target.exists():
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(rewritten)
+    else:
+        target = source.with_name(fingerprinted_name(source.name, file_digest(state['manifest'], source)))
+        if not target.exists():
+            link_or_copy(source, target)
+
+    state['assets'][key] = target.relative_to(site_root).as_posix()
+    return target
+
+def fingerprint_bundle(state, source, key):
+    """Rewrite a critical CSS bundle's url()s and name it after its new content
+
+    The bundle it replaces is removed by fingerprint_site once every page
+    links the new one, so a rebuild finds the same bundle critical_css would
+    write from it.
+    """
+    with open(source, 'r', encoding='utf-8') as f:
+        css = f.read()
+    rewritten = rewrite_css(state, css, source.parent)
+    target = source.with_name(CONTENT_NAME.format(digest=content_digest(rewritten)[:HASH_LENGTH]))
+    if not target.exists():
+        with open(target, 'w', encoding='utf-8') as f:
+            f.write(rewritten)
+
+    state['assets'][key] = target.relative_to(state['site_root']).as_posix()
+    return target
+
+def collapse_bundles(state):
+    """Record rewritten bundles under their own names and remove the bundles they replace"""
+    for key, path in list(state['assets'].items()):
+        if key != path and CONTENT_NAMED_PATTERN.match(key.rsplit('/', 1)[-1]):
+            del state['assets'][key]
+            state['assets'][path] = path
+            if (state['site_root'] / key).exists():
+                os.remove(state['site_root'] / key)
+
+def rewrite_url(state, url, base_dir):
+    """Rewrite one URL to its fingerprinted form, keeping its style and suffix"""
+    resolved = resolve_reference(url.strip(), base_dir, state['site_root'])
+    if not resolved:
+        return url
+    source, path, suffix = resolved
+    target = fingerprint_asset(state, source)
+    # Only the last path segment changes, so relative/absolute style is preserved
+    if '/' in path:
+        return path.rsplit('/', 1)[0] + '/' + target.name + suffix
+    return target.name + suffix
+
+def rewrite_srcset(state, value, base_dir):
+    """Rewrite every candidate URL of a srcset"""
+    candidates = []
+    for candidate in value.split(','):
+        pieces = candidate.strip().split(None, 1)
+        if not pieces:
+            continue
+        pieces[0] = rewrite_url(state, pieces[0], base_dir)
+        candidates.append(' '.join(pieces))
+    return ', '.join(candidates)
+
+def rewrite_css(state, css, base_dir):
+    """Rewrite url() references in a stylesheet or style attribute"""
+    def replace(match):
+        quote, url = match.group(1), match.group(2)
+        return f'url({quote}{rewrite_url(state, url, base_dir)}{quote})'
+    return CSS_URL_PATTERN.sub(replace, css)
+
+def rewrite_html(state, html, base_dir):
+    """Rewrite asset references in a page"""
+    def replace_attribute(match):
+        prefix, value, closing = match.groups()
+        if prefix.strip().lower().startswith('srcset'):
+            value = rewrite_srcset(state, value, base_dir)
+        else:
+            value = rewrite_url(state, value, base_dir)
+        return prefix + value + closing
+
+    html = ATTRIBUTE_PATTERN.sub(replace_attribute, html)
+    return rewrite_css(state, html, base_dir)
+
+def rewrite_gallery(state, gallery, base_dir):
+    """Rewrite the image URLs of a gallery manifest's items"""
+    for entry in gallery['items']:
+        entry['src'] = rewrite_url(state, entry['src'], base_dir)
+        if 'srcset' in entry:
+            entry['srcset'] = rewrite_srcset(state, entry['srcset'], base_dir)
+        for source in entry.get('sources', []):
+            source[1] = rewrite_srcset(state, source[1], base_dir)
+    return gallery
+
+def content_digest(text):
+    """SHA-256 of text content"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def link_or_copy(source, target):
+    """Hard-link a file so fingerprinted images cost no extra disk, copying across devices"""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+def prune_stale_assets(site_root, previous, current):
+    """Remove hashed files from the previous run that are no longer referenced"""
+    removed = 0
+    live = set(current.values())
+    for path in previous.values():
+        if path not in live and (Path(site_root) / path).exists():
+            os.remove(Path(site_root) / path)
+            removed += 1
+    return removed
+
+def write_headers(site_root, assets):
+    """Write a _headers file: immutable caching for hashed assets, revalidation for HTML
+
+    The header syntax has no pattern telling main.<hash>.css from main.css,
+    and a splat rule would make the unhashed originals next to the hashed
+    copies immutable too, so each file gets an exact rule: hashed names are
+    immutable and their originals get the short default lifetime. The
+    service worker's rule is written here too, so the file comes out the
+    same whether or not that stage runs after.
+    """
+    rules = {}
+    for source, path in assets.items():
+        if source != path:
+            rules[f'/{source}'] = DEFAULT_CACHE_CONTROL
+        rules[f'/{path}'] = IMMUTABLE_CACHE_CONTROL
+
+    lines = []
+    for rule in sorted(rules):
+        lines.append(rule)
+        lines.append(f'  Cache-Control: {rules[rule]}')
+    lines.append('/*.html')
+    lines.append(f'  Cache-Control: {HTML_CACHE_CONTROL}')
+    lines.append('/')
+    lines.append(f'  Cache-Control: {HTML_CACHE_CONTROL}')
+    lines.append(f'/{SERVICE_WORKER_NAME}')
+    lines.append(f'  Cache-Control: {HTML_CACHE_CONTROL}')
+
+    write_if_changed(Path(site_root) / HEADERS_NAME, '\n'.join(lines) + '\n')
+
+def write_if_changed(path, text):
+    """Write a file only when its content changes, so a no-op rebuild leaves it untouched"""
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return False
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return True
+
+def fingerprint_site(site_root, pages=PAGES, manifest=None):
+    """Fingerprint every asset referenced by the given pages and rewrite the pages"""
+    site_root = Path(site_root)
+    manifest = manifest if manifest is not None else load_manifest(manifest_path(site_root))
+    # Assets are fingerprinted on first reference; 'assets' maps source -> hashed path
+    state = {'site_root': site_root, 'manifest': manifest, 'assets': {}}
+
+    for page in site_pages(site_root, pages):
+        page_path = site_root / page
+        if not page_path.exists():
+            continue
+
+        with open(page_path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        rewritten = rewrite_html(state, html, page_path.parent)
+
+        if rewritten != html:
+            with open(page_path, 'w', encoding='utf-8') as f:
+                f.write(rewritten)
+            # Keep the generators' manifest entries pointing at the rewritten page
+            refresh_output(manifest, page_path)
+            print(f"  Rewrote {page}")
+
+    # Images mounted by js/gallery.js need the hashed names as much as those in the pages
+    for gallery_path in sorted(site_root.glob(GALLERY_GLOB)):
+        with open(gallery_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        rewritten = json.dumps(rewrite_gallery(state, json.loads(text), site_root), separators=(',', ':'))
+
+        if rewritten != text:
+            with open(gallery_path, 'w', encoding='utf-8') as f:
+                f.write(rewritten)
+            refresh_output(manifest, gallery_path)
+            print(f"  Rewrote {gallery_path.relative_to(site_root).as_posix()}")
+
+    collapse_bundles(state)
+
+    asset_manifest_path = site_root / ASSET_MANIFEST_NAME
+    previous = {}
+    if asset_manifest_path.exists():
+        with open(asset_manifest_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+
+    removed = prune_stale_assets(site_root, previous, state['assets'])
+    write_if_changed(asset_manifest_path, json.dumps(state['assets'], indent=2, sort_keys=True) + '\n')
+    write_headers(site_root, state['assets'])
+
+    return state['assets'], removed
+
+def main():
+    """Fingerprint the assets of every page"""
+    base_path = Path(__file__).parent
+    manifest = load_manifest(manifest_path(base_path))
+
+    print("Fingerprinting assets...")
+    assets, removed = fingerprint_site(base_path, PAGES, manifest)
+    save_manifest(manifest)
+
+    print(f"\n{len(assets)} assets fingerprinted, {removed} stale copies removed")
+    print(f"Manifest written to {base_path / ASSET_MANIFEST_NAME}")
+
+if __name__ == '__main__':
+    main()
@@ -4,39 +4,147 @@ Generate clean, semantic HTML for Maria Goundry Portfolio
 Replaces complex Squarespace structure with simple HTML + CSS Grid
 """
 
-from bs4 import BeautifulSoup
+from bisect import bisect_right
+from heapq import merge
 import json
 import os
 import re
 
-# Paths
-BASE_INPUT = r'C:\DEV\MARIA\MARIA_DATA'
-BASE_OUTPUT = r'C:\DEV\MARIA\MARIA_WEBSITE'
-TEXT_CONTENT_FILE = os.path.join(BASE_OUTPUT, 'text_content.json')
-
-def extract_images_from_html(html_file, section_name):
-    """Extract all image paths from original HTML in order"""
-    with open(html_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+from build_manifest import (
+    digest_values, file_digest, is_up_to_date, load_manifest, manifest_path,
+    record_outputs, save_manifest,
+)
+from image_dimensions import get_dimensions, load_dimension_cache, save_dimension_cache
+from image_index import build_image_index, index_digest, resolve_url, save_image_index
+from image_placeholders import load_placeholder_index, placeholder_style
+from image_pipeline import DERIVED_DIR, GALLERY_SIZES, SECTIONS, list_section_images, load_derivative_index, picture_html
+from source_documents import load_records
 
-    soup = BeautifulSoup(content, 'html.parser')
+# Paths
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUT = r'C:\DEV\MARIA\MARIA_DATA'
+DEFAULT_OUTPUT = r'C:\DEV\MARIA\MARIA_WEBSITE'
+
+def load_config(base_input=DEFAULT_INPUT, base_output=DEFAULT_OUTPUT, manifest=None, image_index=None):
+    """Everything the generators read: the source export, the site root and that site's caches
+
+    Pass the build's manifest and image index to share them; missing ones are
+    loaded from the site root (the image index on first use).
+    """
+    return {
+        'input': base_input,
+        'output': base_output,
+        'images_root': os.path.join(base_output, 'images'),
+        'manifest': manifest if manifest is not None else load_manifest(manifest_path(base_output)),
+        'dimensions': load_dimension_cache(base_output),
+        'placeholders': load_placeholder_index(base_output),
+        'image_index': image_index,
+        # Derivative indexes, loaded once per section
+        'derivatives': {},
+    }
+
+IMAGE_FILENAME_PATTERN = re.compile(r'/([^/\?]+\.(jpg|jpeg|png|gif|webp))', re.I)
+
+def local_image_index(config):
+    """The cross-section index of local image copies, brought up to date once per run"""
+    if config['image_index'] is None:
+        pages = [(section, os.path.join(config['input'], section, 'index.html')) for section in SECTIONS]
+        config['image_index'] = build_image_index(config['output'], pages, config['manifest'])
+    return config['image_index']
+
+def extract_images_from_html(config, html_file, section_name):
+    """Extract all images from original HTML in order, with where each sits in the page
+
+    Returns [{'src': local path, 'heading': block index of the nearest preceding
+    heading (None before the first), 'position': text blocks before the image}].
+    Images without a local copy keep their CDN URL.
+    """
     images = []
 
-    # Find all img tags
-    for img in soup.find_all('img'):
-        src = img.get('src', '') or img.get('data-src', '')
-        if src:
-            # Extract filename
-            filename_match = re.search(r'/([^/\?]+\.(jpg|jpeg|png|gif|webp))', src, re.I)
-            if filename_match:
-                filename = filename_match.group(1)
-                # Convert to local path
-                local_path = f'./images/{section_name}/{filename}'
-                # Check if file exists (some filenames have section prefix)
-                images.append(local_path)
+    # Image URLs and their anchors come from the shared loader, which parses each source page once
+    records = load_records(html_file, config['manifest'], config['output'])
+    for src, (heading, position) in zip(records['images'], records['anchors']):
+        if src and IMAGE_FILENAME_PATTERN.search(src):
+            # Downloads are saved as <section>_<name>, possibly in another section's folder
+            item = resolve_url(local_image_index(config), src, section_name)
+            local_path = f'./images/{item}' if item else src
+            images.append({'src': local_path, 'heading': heading, 'position': position})
 
     return images
 
+def spread_evenly(count, images):
+    """Split images into count consecutive groups of near-equal size, keeping every image"""
+    groups = [[] for _ in range(count)]
+    for i, img in enumerate(images):
+        groups[i * count // len(images)].append(img)
+    return groups
+
+def place_images(items, images):
+    """Group images under the item whose heading they follow: [[images of item 0], ...]
+
+    Each item opens at its first text block ('block'); an image goes to the
+    last item opening at or before its nearest heading, found by bisection.
+    Images above the first item join it, so none are dropped. Text extracted
+    before blocks were recorded falls back to an even split.
+    """
+    if not items:
+        return []
+    starts = [item.get('block') for item in items]
+    if None in starts:
+        print("  Text content has no block positions (re-run extract_text_content.py); spreading images evenly")
+        return spread_evenly(len(items), images)
+
+    groups = [[] for _ in items]
+    for img in images:
+        anchor = img['heading'] if img['heading'] is not None else img['position'] - 1
+        groups[max(bisect_right(starts, anchor) - 1, 0)].append(img)
+    return groups
+
+def section_derivatives(config, section_name):
+    """Load the derivative index for a section once per run"""
+    if section_name not in config['derivatives']:
+        config['derivatives'][section_name] = load_derivative_index(config['images_root'], section_name)
+    return config['derivatives'][section_name]
+
+def section_placeholders(config, section_name):
+    """Map each local image of a section to its placeholder, if one was built"""
+    section_dir = os.path.join(config['images_root'], section_name)
+    placeholders = {}
+    for file in list_section_images(section_dir):
+        placeholders[file] = config['placeholders']['entries'].get(file_digest(config['manifest'], os.path.join(section_dir, file)))
+    return placeholders
+
+def section_images_digest(config, section_name):
+    """Digest of a section's image names and contents, ignoring fingerprinted copies"""
+    section_dir = os.path.join(config['images_root'], section_name)
+    return digest_values([(file, file_digest(config['manifest'], os.path.join(section_dir, file))) for file in list_section_images(section_dir)])
+
+def render_image(config, img, alt):
+    """Render a gallery image as <picture> with WebP/AVIF sources when available"""
+    if not img.startswith('./images/'):
+        return f'        <img src="{img}" alt="{alt}">\n'
+    section_name = img.split('/')[-2]
+    local_path = os.path.join(config['output'], img)
+    # Intrinsic size lets the browser reserve the box before the image loads
+    size = get_dimensions(config['dimensions'], local_path)
+    img_attrs = f' width="{size[0]}" height="{size[1]}"' if size else ''
+
+    # Tiny preview painted behind the image until it loads
+    if os.path.exists(local_path):
+        style = placeholder_style(config['placeholders']['entries'].get(file_digest(config['manifest'], local_path)))
+        if style:
+            img_attrs += f' style="{style}"'
+
+    return picture_html(
+        img,
+        alt,
+        f'./images/{DERIVED_DIR}/{section_name}',
+        section_derivatives(config, section_name),
+        sizes=GALLERY_SIZES,
+        indent='        ',
+        img_attrs=img_attrs,
+    ) + '\n'
+
 def generate_nav():
     """Generate navigation HTML"""
     return '''    <nav class="main-nav">
@@ -50,15 +158,16 @@ def generate_nav():
     </nav>'''
 
 def generate_footer():
-    """Generate footer HTML"""
+    """Generate footer HTML, with the script that registers the service worker"""
     return '''    <footer class="main-footer">
       <p>EMAIL: maria.goundry98@gmail.com</p>
       <a href="https://instagram.com/mariagoundry" target="_blank">INSTAGRAM</a>
       <a href="https://www.notjustalabel.com/designer/maria-goundry" target="_blank">NOT JUST A LABEL</a>
       <a href="https://neighbourhoodmagazine.com/contributors/maria-goundry/" target="_blank">NEIGHBOURHOOD MAGAZINE</a>
-    </footer>'''
+    </footer>
+    <script src="./js/navigation.js" defer></script>'''
 
-def generate_home_html(text_data, images):
+def generate_home_html(config, text_data, images):
     """Generate home page HTML"""
     print("\n=== Generating HOME page ===")
 
@@ -74,25 +183,26 @@ def generate_home_html(text_data, images):
     sections_html = ""
     current_section = {}
 
+    sections = []
     for i, item in enumerate(content_items[3:], start=3):  # Skip hero items
         if item['tag'] in ['h2', 'h3']:
-            # Save previous section
-            if current_section:
-                sections_html += generate_home_section(current_section, images)
             # Start new section
             current_section = {
                 'title': item['text'],
                 'description': '',
+                'block': item.get('block'),
                 'images': []
             }
+            sections.append(current_section)
         elif item['tag'] == 'p' and current_section:
             # Add to description
             if not item['text'].startswith('→'):
                 current_section['description'] += item['text'] + ' '
 
-    # Add last section
-    if current_section:
-        sections_html += generate_home_section(current_section, images)
+    # Each section previews the images placed under its heading
+    for section, section_images in zip(sections, place_images(sections, images)):
+        section['images'] = section_images
+        sections_html += generate_home_section(config, section)
 
     html = f'''<!DOCTYPE html>
 <html lang="en">
@@ -121,15 +231,12 @@ def generate_home_html(text_data, images):
 
     return html
 
-def generate_home_section(section, all_images):
+def generate_home_section(config, section):
     """Generate a home section with images"""
     # Take first 6 images for preview
     images_html = ""
-    if all_images:
-        img_count = min(6, len(all_images))
-        for i in range(img_count):
-            if i < len(all_images):
-                images_html += f'''        <img src="{all_images[i]}" alt="{section['title']}">\n'''
+    for img in section['images'][:6]:
+        images_html += render_image(config, img['src'], section['title'])
 
     return f'''    <section class="home-section">
       <h2>{section['title']}</h2>
@@ -140,7 +247,7 @@ def generate_home_section(section, all_images):
 
 '''
 
-def generate_projects_html(text_data, images):
+def generate_projects_html(config, text_data, images):
     """Generate projects page HTML"""
     print("\n=== Generating PROJECTS page ===")
 
@@ -157,7 +264,8 @@ def generate_projects_html(text_data, images):
                 projects.append(current_project)
             current_project = {
                 'title': item['text'],
-                'year': ''
+                'year': '',
+                'block': item.get('block')
             }
         elif item['tag'] == 'h3' and current_project:
             current_project['year'] = item['text']
@@ -165,18 +273,12 @@ def generate_projects_html(text_data, images):
     if current_project:
         projects.append(current_project)
 
-    # Distribute images evenly among projects
-    images_per_project = len(images) // len(projects) if projects else 0
-
+    # Place each image under the project heading it follows in the source page
     sections_html = ""
-    for i, project in enumerate(projects):
-        start_img = i * images_per_project
-        end_img = start_img + images_per_project
-        project_images = images[start_img:end_img]
-
+    for project, project_images in zip(projects, place_images(projects, images)):
         images_html = ""
         for img in project_images:
-            images_html += f'''        <img src="{img}" alt="{project['title']}">\n'''
+            images_html += render_image(config, img['src'], project['title'])
 
         sections_html += f'''    <section class="project-section">
       <header class="project-header">
@@ -212,7 +314,7 @@ def generate_projects_html(text_data, images):
 
     return html
 
-def generate_photoshoots_html(text_data, images):
+def generate_photoshoots_html(config, text_data, images):
     """Generate photoshoots page HTML"""
     print("\n=== Generating PHOTOSHOOTS page ===")
 
@@ -229,7 +331,8 @@ def generate_photoshoots_html(text_data, images):
                 shoots.append(current_shoot)
             current_shoot = {
                 'year': item['text'],
-                'credits': []
+                'credits': [],
+                'block': item.get('block')
             }
         elif item['tag'] == 'p' and current_shoot:
             current_shoot['credits'].append(item['text'])
@@ -237,22 +340,16 @@ def generate_photoshoots_html(text_data, images):
     if current_shoot:
         shoots.append(current_shoot)
 
-    # Distribute images evenly among shoots
-    images_per_shoot = len(images) // len(shoots) if shoots else 0
-
+    # Place each image under the shoot heading it follows in the source page
     sections_html = ""
-    for i, shoot in enumerate(shoots):
-        start_img = i * images_per_shoot
-        end_img = start_img + images_per_shoot
-        shoot_images = images[start_img:end_img]
-
+    for shoot, shoot_images in zip(shoots, place_images(shoots, images)):
         credits_html = ""
         for credit in shoot['credits']:
             credits_html += f'''        <p>{credit}</p>\n'''
 
         images_html = ""
         for img in shoot_images:
-            images_html += f'''        <img src="{img}" alt="Photoshoot {shoot['year']}">\n'''
+            images_html += render_image(config, img['src'], f"Photoshoot {shoot['year']}")
 
         sections_html += f'''    <section class="photoshoot-section">
       <header class="photoshoot-header">
@@ -289,7 +386,7 @@ def generate_photoshoots_html(text_data, images):
 
     return html
 
-def generate_press_html(text_data, images):
+def generate_press_html(config, text_data, images):
     """Generate press page HTML"""
     print("\n=== Generating PRESS page ===")
 
@@ -306,7 +403,8 @@ def generate_press_html(text_data, images):
                 press_items.append(current_item)
             current_item = {
                 'title': item['text'],
-                'link': ''
+                'link': '',
+                'block': item.get('block')
             }
         elif item['tag'] == 'p' and current_item and item['text'].startswith('http'):
             current_item['link'] = item['text']
@@ -314,18 +412,12 @@ def generate_press_html(text_data, images):
     if current_item:
         press_items.append(current_item)
 
-    # Distribute images evenly among press items
-    images_per_item = len(images) // len(press_items) if press_items else 0
-
+    # Place each image under the press item heading it follows in the source page
     articles_html = ""
-    for i, item in enumerate(press_items):
-        start_img = i * images_per_item
-        end_img = start_img + images_per_item
-        item_images = images[start_img:end_img]
-
+    for item, item_images in zip(press_items, place_images(press_items, images)):
         images_html = ""
         for img in item_images:
-            images_html += f'''        <img src="{img}" alt="{item['title']}">\n'''
+            images_html += render_image(config, img['src'], item['title'])
 
         articles_html += f'''    <article class="press-item">
       <header class="press-header">
@@ -361,7 +453,7 @@ def generate_press_html(text_data, images):
 
     return html
 
-def generate_press_loans_html(text_data, images):
+def generate_press_loans_html(config, text_data, images):
     """Generate press-loans page HTML"""
     print("\n=== Generating PRESS-LOANS page ===")
 
@@ -371,43 +463,47 @@ def generate_press_loans_html(text_data, images):
     # Extract header
     header_title = "LOOKS AVAILABLE TO BORROW"
 
-    # Group loan items (collect p tags with garment names, then images)
-    # For simplicity, we'll create sections with labels + images
+    # Group loan items: a run of garment labels (p tags) and the images that follow it
+    labels = [item for item in content_items if item['tag'] == 'p']
     loan_items = []
-    current_labels = []
 
-    for item in content_items:
-        if item['tag'] == 'h2':
-            continue  # Skip header, we already have it
-        elif item['tag'] == 'p':
-            # These are garment labels
-            current_labels.append(item['text'])
-
-    # Create loan items - group every 3-5 labels together
-    items_count = max(3, len(images) // 10)  # At least 3 items
-    labels_per_item = len(current_labels) // items_count if items_count else 1
-    images_per_item = len(images) // items_count if items_count else 1
-
-    for i in range(items_count):
-        start_label = i * labels_per_item
-        end_label = start_label + labels_per_item
-        start_img = i * images_per_item
-        end_img = start_img + images_per_item
-
-        loan_items.append({
-            'labels': current_labels[start_label:end_label],
-            'images': images[start_img:end_img]
-        })
+    if any(label.get('block') is None for label in labels):
+        # Text extracted before blocks were recorded: fall back to even groups
+        print("  Text content has no block positions (re-run extract_text_content.py); spreading images evenly")
+        items_count = max(3, len(images) // 10)  # At least 3 items
+        label_groups = spread_evenly(items_count, labels) if labels else [[] for _ in range(items_count)]
+        image_groups = spread_evenly(items_count, images) if images else [[] for _ in range(items_count)]
+        loan_items = [{'labels': l, 'images': i} for l, i in zip(label_groups, image_groups)]
+    else:
+        # An image sits just before text block 'position'; labels and images are merged in page order
+        events = merge(
+            (('label', label['block'], label) for label in labels),
+            (('image', img['position'] - 0.5, img) for img in images),
+            key=lambda event: event[1],
+        )
+        current = None
+        for kind, _, value in events:
+            if kind == 'label':
+                # A label after images starts the next item
+                if current is None or current['images']:
+                    current = {'labels': [], 'images': []}
+                    loan_items.append(current)
+                current['labels'].append(value)
+            else:
+                if current is None:
+                    current = {'labels': [], 'images': []}
+                    loan_items.append(current)
+                current['images'].append(value)
 
     items_html = ""
     for item in loan_items:
         labels_html = ""
         for label in item['labels']:
-            labels_html += f'''        <p class="loan-label">{label}</p>\n'''
+            labels_html += f'''        <p class="loan-label">{label['text']}</p>\n'''
 
         images_html = ""
         for img in item['images']:
-            images_html += f'''        <img src="{img}" alt="Available garment">\n'''
+            images_html += render_image(config, img['src'], 'Available garment')
 
         items_html += f'''    <article class="loan-item">
       <div class="loan-labels">
@@ -443,47 +539,104 @@ def generate_press_loans_html(text_data, images):
 
     return html
 
+PAGES = [
+    ('home', 'index.html', generate_home_html),
+    ('projects', 'projects.html', generate_projects_html),
+    ('photoshoots', 'photoshoots.html', generate_photoshoots_html),
+    ('press', 'press.html', generate_press_html),
+    ('press-loans', 'press-loans.html', generate_press_loans_html),
+]
+
+def template_digest(manifest):
+    """Digest of the code that shapes every page"""
+    return digest_values(
+        file_digest(manifest, __file__),
+        file_digest(manifest, os.path.join(SCRIPT_DIR, 'image_pipeline.py')),
+        file_digest(manifest, os.path.join(SCRIPT_DIR, 'image_dimensions.py')),
+        file_digest(manifest, os.path.join(SCRIPT_DIR, 'image_placeholders.py')),
+        file_digest(manifest, os.path.join(SCRIPT_DIR, 'source_documents.py')),
+        file_digest(manifest, os.path.join(SCRIPT_DIR, 'image_index.py')),
+    )
+
+def page_inputs(config, template, section_name, text_data):
+    """Digest of everything a page is built from
+
+    Images may resolve to another section's copy, so every section's
+    derivatives and placeholders count.
+    """
+    return digest_values(
+        template,
+        file_digest(config['manifest'], os.path.join(config['input'], section_name, 'index.html')),
+        text_data,
+        section_images_digest(config, section_name),
+        index_digest(local_image_index(config)),
+        [section_derivatives(config, section) for section in SECTIONS],
+        [section_placeholders(config, section) for section in SECTIONS],
+    )
+
+def render_page(config, section_name, text_data):
+    """Generate one page and write it; returns (output file, image count, new dimension entries)
+
+    Dimensions read here are handed back so a worker process's cache
+    updates aren't lost.
+    """
+    output_filename, generator_func = next((filename, func) for name, filename, func in PAGES if name == section_name)
+    input_html = os.path.join(config['input'], section_name, 'index.html')
+    output_file = os.path.join(config['output'], output_filename)
+
+    # Extract images from original HTML
+    images = extract_images_from_html(config, input_html, section_name)
+
+    print(f"\n  Extracted {len(images)} images")
+
+    # Generate HTML
+    html = generator_func(config, text_data, images)
+
+    # Write to file
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(html)
+
+    dimensions = config['dimensions']
+    return output_file, len(images), dimensions['entries'] if dimensions['dirty'] else {}
+
 def main():
     """Generate all pages"""
     print("=" * 60)
     print("GENERATING CLEAN HTML FOR MARIA GOUNDRY PORTFOLIO")
     print("=" * 60)
 
+    config = load_config()
+
     # Load text content
-    with open(TEXT_CONTENT_FILE, 'r', encoding='utf-8') as f:
+    with open(os.path.join(config['output'], 'text_content.json'), 'r', encoding='utf-8') as f:
         text_content = json.load(f)
 
-    sections = [
-        ('home', 'index.html', generate_home_html),
-        ('projects', 'projects.html', generate_projects_html),
-        ('photoshoots', 'photoshoots.html', generate_photoshoots_html),
-        ('press', 'press.html', generate_press_html),
-        ('press-loans', 'press-loans.html', generate_press_loans_html),
-    ]
-
-    for section_name, output_filename, generator_func in sections:
-        # Extract images from original HTML
-        input_html = os.path.join(BASE_INPUT, section_name, 'index.html')
-        images = extract_images_from_html(input_html, section_name)
+    # Pages are rebuilt only when their source page, text slice, derivatives or the templates change
+    manifest = config['manifest']
+    template = template_digest(manifest)
 
-        print(f"\n  Extracted {len(images)} images")
+    for section_name, output_filename, generator_func in PAGES:
+        key = f'generate_clean_html:{output_filename}'
+        inputs = page_inputs(config, template, section_name, text_content[section_name])
+        if is_up_to_date(manifest, key, inputs):
+            print(f"\n  [SKIP] {output_filename} is up to date")
+            continue
 
-        # Generate HTML
-        html = generator_func(text_content[section_name], images)
-
-        # Write to file
-        output_file = os.path.join(BASE_OUTPUT, output_filename)
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html)
+        output_file, _, _ = render_page(config, section_name, text_content[section_name])
 
+        record_outputs(manifest, key, inputs, [output_file])
         print(f"  [OK] Generated {output_filename}")
 
+    save_manifest(manifest)
+    save_dimension_cache(config['dimensions'])
+    save_image_index(local_image_index(config))
+
     print("\n" + "=" * 60)
     print("ALL PAGES GENERATED SUCCESSFULLY!")
     print("=" * 60)
     print("\nNext steps:")
-    print("1. Start local server: python -m http.server 8001")
-    print("2. Open http://localhost:8001/ in browser")
+    print("1. Start local server: python serve.py")
+    print("2. Open http://localhost:8000/ in browser")
     print("3. Test all pages and verify content")
     print("=" * 60)
 
@@ -1,49 +1,162 @@
 #!/usr/bin/env python3
 """
 Generate HTML pages for Maria's portfolio website
+- Render the first screenful of each gallery; write the rest to data/gallery-<section>.json
+  for js/gallery.js to mount on scroll
+- Optionally write static <page>-page-<N>.html pages for browsing without JavaScript
 """
 
-import os
+import argparse
+import json
 from pathlib import Path
 
+from build_manifest import (
+    digest_values, file_digest, is_up_to_date, load_manifest, manifest_path,
+    record_outputs, save_manifest,
+)
+from dedupe_images import load_aliases, resolve_alias
+from image_dimensions import get_dimensions, load_dimension_cache, nearest_aspect_class, save_dimension_cache
+from image_placeholders import load_placeholder_index, placeholder_style
+from image_pipeline import (
+    DEFAULT_SIZES, DERIVED_DIR, list_section_images, load_derivative_index, picture_markup, picture_sources,
+    sizes_for_grid_class,
+)
+
+# Grid items rendered into the page; the rest are mounted from the gallery manifest
+FIRST_SCREEN = 12
+
+# Items per static fallback page and per ?page=N of the loader; the page itself is page 1
+PAGE_SIZE = FIRST_SCREEN
+
+GALLERY_DIR = 'data'
+
 def get_images_from_folder(folder_path):
     """Get all image files from a folder"""
+    return list_section_images(folder_path)
+
+def resolve_section_images(images_path, section_name, aliases):
+    """List a section's images, following collapsed duplicates to their canonical files
+
+    Duplicates of an image already in the section are dropped; duplicates of
+    an image in another section point at that file. Returns the filenames and
+    a map from filename to the section holding it, for files held elsewhere.
+    """
+    names = get_images_from_folder(Path(images_path) / section_name)
+    names += [alias.split('/', 1)[1] for alias in aliases if alias.startswith(f'{section_name}/')]
+
     images = []
-    if os.path.exists(folder_path):
-        for file in sorted(os.listdir(folder_path)):
-            if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
-                images.append(file)
-    return images
+    sources = {}
+    for name in sorted(names):
+        source_section, file = resolve_alias(aliases, f'{section_name}/{name}').split('/', 1)
+        if file in images:
+            continue
+        images.append(file)
+        if source_section != section_name:
+            sources[file] = source_section
 
-def generate_html_template(page_title, section_name, images, active_page):
-    """Generate HTML page template"""
+    return images, sources
 
-    # Generate image grid HTML
-    image_html = []
-    for i, img in enumerate(images):
-        # Vary grid item sizes for visual interest
-        if i % 5 == 0:
-            grid_class = "grid-item--two-thirds"
-        elif i % 3 == 0:
-            grid_class = "grid-item--third"
-        else:
-            grid_class = "grid-item--half"
-
-        # Vary aspect ratios
-        if i % 4 == 0:
-            aspect_class = "aspect-1-1"
-        elif i % 4 == 1:
-            aspect_class = "aspect-3-2"
-        elif i % 4 == 2:
-            aspect_class = "aspect-2-3"
+def gallery_entry(index, img, section_name, derivatives, dimensions, placeholders, sources):
+    """Describe one grid item compactly, for the page and for js/gallery.js"""
+    # Vary grid item sizes for visual interest
+    if index % 5 == 0:
+        grid_class = "grid-item--two-thirds"
+    elif index % 3 == 0:
+        grid_class = "grid-item--third"
+    else:
+        grid_class = "grid-item--half"
+
+    # Use the real aspect ratio when the image size is known, otherwise vary it
+    size = dimensions.get(img)
+    if size:
+        aspect_class = nearest_aspect_class(*size)
+    elif index % 4 == 0:
+        aspect_class = "aspect-1-1"
+    elif index % 4 == 1:
+        aspect_class = "aspect-3-2"
+    elif index % 4 == 2:
+        aspect_class = "aspect-2-3"
+    else:
+        aspect_class = "aspect-3-4"
+
+    # Responsive, modern-format candidates sized to the grid column
+    img_section = sources.get(img, section_name)
+    url_prefix = f'./images/{DERIVED_DIR}/{img_section}'
+    entry = {'src': f'./images/{img_section}/{img}', 'class': f'{grid_class} {aspect_class}'}
+    if size:
+        entry['width'], entry['height'] = size
+    srcset, modern_sources = picture_sources(url_prefix, img, derivatives)
+    if srcset:
+        entry['srcset'] = srcset
+        entry['sizes'] = sizes_for_grid_class(grid_class)
+        entry['sources'] = modern_sources
+    # Tiny preview painted behind the image until it loads
+    if placeholders.get(img):
+        entry['placeholder'] = placeholders[img]
+    return entry
+
+def gallery_entries(section_name, images, derivatives=None, dimensions=None, placeholders=None, sources=None):
+    """Describe every grid item of a section, in page order"""
+    derivatives = derivatives or {}
+    dimensions = dimensions or {}
+    placeholders = placeholders or {}
+    sources = sources or {}
+    return [
+        gallery_entry(i, img, section_name, derivatives, dimensions, placeholders, sources)
+        for i, img in enumerate(images)
+    ]
+
+def entry_html(entry, alt, indent='        '):
+    """Render a grid item as <picture> with typed modern sources and an <img> fallback"""
+    style = placeholder_style(entry.get('placeholder'))
+    style_attr = f' style="{style}"' if style else ''
+    size_attrs = f' width="{entry["width"]}" height="{entry["height"]}"' if 'width' in entry else ''
+
+    picture = picture_markup(
+        entry['src'], alt, entry.get('srcset'), entry.get('sources', []),
+        entry.get('sizes', DEFAULT_SIZES), indent + '  ', size_attrs + ' loading="lazy"',
+    )
+    return f'{indent}<div class="grid-item {entry["class"]}"{style_attr}>\n{picture}\n{indent}</div>'
+
+def gallery_path(section_name):
+    """Site-relative location of a section's gallery manifest"""
+    return f'{GALLERY_DIR}/gallery-{section_name}.json'
+
+def page_filename(filename, page):
+    """Static fallback page N of a gallery page (page 1 is the page itself)"""
+    return filename if page == 1 else filename.replace('.html', f'-page-{page}.html')
+
+def pagination_html(filename, page, page_count):
+    """Links between a gallery's static pages"""
+    links = []
+    for number in range(1, page_count + 1):
+        if number == page:
+            links.append(f'      <span aria-current="page">{number}</span>')
         else:
-            aspect_class = "aspect-3-4"
+            links.append(f'      <a href="{page_filename(filename, number)}">{number}</a>')
+    return '    <nav class="gallery-pages" aria-label="Gallery pages">\n' + '\n'.join(links) + '\n    </nav>'
+
+def generate_html_template(page_title, section_name, images, active_page, derivatives=None, dimensions=None, placeholders=None, sources=None, entries=None, page=None, page_count=0):
+    """Generate HTML page template
 
-        image_html.append(f'''        <div class="grid-item {grid_class} {aspect_class}">
-          <img src="./images/{section_name}/{img}" alt="Maria Goundry - {page_title}" loading="lazy">
-        </div>''')
+    Without a page, renders the first screenful and hooks the rest up to the
+    gallery loader; with one, renders that static page of PAGE_SIZE items.
+    """
+    if entries is None:
+        entries = gallery_entries(section_name, images, derivatives, dimensions, placeholders, sources)
+    alt = f'Maria Goundry - {page_title}'
 
-    images_section = '\n'.join(image_html)
+    # Generate image grid HTML
+    if page is None:
+        shown = entries[:FIRST_SCREEN]
+        grid_attrs = f' data-gallery="./{gallery_path(section_name)}" data-rendered="{len(shown)}"'
+        pages_html = f'\n    <noscript>\n{pagination_html(active_page, 1, page_count)}\n    </noscript>' if page_count > 1 else ''
+    else:
+        shown = entries[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        grid_attrs = ''
+        pages_html = '\n' + pagination_html(active_page, page, page_count)
+
+    images_section = '\n'.join(entry_html(entry, alt) for entry in shown)
 
     # Create navigation with active state
     nav_items = {
@@ -55,13 +168,14 @@ def generate_html_template(page_title, section_name, images, active_page):
     }
 
     nav_html = []
-    for page, label in nav_items.items():
-        if page == active_page:
-            nav_html.append(f'        <li><a href="{page}" class="active">{label.upper()}</a></li>')
+    for nav_page, label in nav_items.items():
+        if nav_page == active_page:
+            nav_html.append(f'        <li><a href="{nav_page}" class="active">{label.upper()}</a></li>')
         else:
-            nav_html.append(f'        <li><a href="{page}">{label.upper()}</a></li>')
+            nav_html.append(f'        <li><a href="{nav_page}">{label.upper()}</a></li>')
 
     nav_section = '\n'.join(nav_html)
+    copyright_label = section_name.split('/')[-1].split('\\')[-1].upper()
 
     html = f'''<!DOCTYPE html>
 <html lang="en">
@@ -100,9 +214,9 @@ def generate_html_template(page_title, section_name, images, active_page):
 
   <!-- Main Content -->
   <main class="main-content">
-    <div class="image-grid">
+    <div class="image-grid"{grid_attrs}>
 {images_section}
-    </div>
+    </div>{pages_html}
   </main>
 
   <!-- Footer -->
@@ -123,48 +237,125 @@ def generate_html_template(page_title, section_name, images, active_page):
       </div>
     </div>
     <div class="footer-copyright">
-      <p>&copy; {section_name.split('/')[-1].split('\\')[-1].upper()} Maria Goundry. All rights reserved.</p>
+      <p>&copy; {copyright_label} Maria Goundry. All rights reserved.</p>
     </div>
   </footer>
 
   <!-- JavaScript -->
   <script src="./js/navigation.js"></script>
+  <script src="./js/gallery.js" defer></script>
 
 </body>
 </html>
 '''
     return html
 
+PAGES = [
+    ('index.html', 'Home', 'home', 'index.html'),
+    ('projects.html', 'Projects', 'projects', 'projects.html'),
+    ('photoshoots.html', 'Photoshoots', 'photoshoots', 'photoshoots.html'),
+    ('press.html', 'Press', 'press', 'press.html'),
+    ('press-loans.html', 'Press Loans', 'press-loans', 'press-loans.html'),
+]
+
+def template_digest(manifest):
+    """Digest of the code that shapes every page"""
+    return digest_values(
+        file_digest(manifest, __file__),
+        file_digest(manifest, Path(__file__).parent / 'image_pipeline.py'),
+        file_digest(manifest, Path(__file__).parent / 'image_dimensions.py'),
+        file_digest(manifest, Path(__file__).parent / 'image_placeholders.py'),
+        file_digest(manifest, Path(__file__).parent / 'dedupe_images.py'),
+    )
+
+def page_context(images_path, section, aliases, manifest, dimension_cache, placeholder_index):
+    """Gather everything a section's page is rendered from"""
+    # Get images for this section (collapsed duplicates may live in other sections)
+    images, sources = resolve_section_images(images_path, section, aliases)
+    derivatives = {}
+    for source_section in sorted({section, *sources.values()}):
+        derivatives.update(load_derivative_index(images_path, source_section))
+
+    dimensions = {}
+    placeholders = {}
+    for img in images:
+        img_path = images_path / sources.get(img, section) / img
+        size = get_dimensions(dimension_cache, img_path)
+        if size:
+            dimensions[img] = size
+        placeholder = placeholder_index['entries'].get(file_digest(manifest, img_path))
+        if placeholder:
+            placeholders[img] = placeholder
+
+    return {
+        'images': images,
+        'sources': sources,
+        'derivatives': derivatives,
+        'dimensions': dimensions,
+        'placeholders': placeholders,
+    }
+
+def write_text(path, text):
+    """Write a generated file, creating its directory"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+def render_page(output_path, title, section, active_page, context, static_pages=False):
+    """Render a page, its gallery manifest and optionally its static pages; returns the files written"""
+    output_path = Path(output_path)
+    entries = gallery_entries(
+        section, context['images'], context['derivatives'], context['dimensions'], context['placeholders'], context['sources'],
+    )
+    page_count = -(-len(entries) // PAGE_SIZE) if static_pages else 0
+
+    gallery_file = output_path.parent / gallery_path(section)
+    gallery = {'alt': f'Maria Goundry - {title}', 'pageSize': PAGE_SIZE, 'items': entries}
+    write_text(gallery_file, json.dumps(gallery, separators=(',', ':')))
+
+    written = [output_path, gallery_file]
+    write_text(output_path, generate_html_template(title, section, context['images'], active_page, entries=entries, page_count=page_count))
+    for page in range(2, page_count + 1):
+        page_path = output_path.with_name(page_filename(output_path.name, page))
+        write_text(page_path, generate_html_template(title, section, context['images'], active_page, entries=entries, page=page, page_count=page_count))
+        written.append(page_path)
+    return [str(path) for path in written]
+
 def main():
     """Generate all HTML pages"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--static-pages', action='store_true', help=f'also write static pages of {PAGE_SIZE} images for browsing without JavaScript')
+    args = parser.parse_args()
+
     base_path = Path(__file__).parent
     images_path = base_path / 'images'
 
-    pages = [
-        ('index.html', 'Home', 'home', 'index.html'),
-        ('projects.html', 'Projects', 'projects', 'projects.html'),
-        ('photoshoots.html', 'Photoshoots', 'photoshoots', 'photoshoots.html'),
-        ('press.html', 'Press', 'press', 'press.html'),
-        ('press-loans.html', 'Press Loans', 'press-loans', 'press-loans.html'),
-    ]
+    # Pages are rebuilt only when their image listing, derivatives or the templates change
+    manifest = load_manifest(manifest_path(base_path))
+    dimension_cache = load_dimension_cache(base_path)
+    placeholder_index = load_placeholder_index(base_path)
+    aliases = load_aliases(images_path)
+    template = template_digest(manifest)
 
-    for filename, title, section, active_page in pages:
-        # Get images for this section
-        section_path = images_path / section
-        images = get_images_from_folder(section_path)
-
-        print(f"Generating {filename}... ({len(images)} images)")
+    for filename, title, section, active_page in PAGES:
+        context = page_context(images_path, section, aliases, manifest, dimension_cache, placeholder_index)
+        output_path = base_path / filename
 
-        # Generate HTML
-        html = generate_html_template(title, section, images, active_page)
+        key = f'generate_pages:{filename}'
+        inputs = digest_values(template, title, section, context, args.static_pages)
+        if is_up_to_date(manifest, key, inputs):
+            print(f"Skipping {filename} (up to date)")
+            continue
 
-        # Write to file
-        output_path = base_path / filename
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html)
+        print(f"Generating {filename}... ({len(context['images'])} images)")
+        written = render_page(output_path, title, section, active_page, context, args.static_pages)
 
+        record_outputs(manifest, key, inputs, written)
         print(f"  Created {filename}")
 
+    save_manifest(manifest)
+    save_dimension_cache(dimension_cache)
+
     print(f"\nAll pages generated successfully!")
 
 if __name__ == '__main__':
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Fast serialization of parsed (BeautifulSoup) pages
+- Write a tree to a file in one pass, in chunks, without building the whole page as a string
+- Compact by default: markup is written as parsed, with no indentation added
+- Minify: collapse whitespace, drop comments, bare boolean attributes and optional end tags
+"""
+
+import re
+
+from bs4.element import CData, Comment, Declaration, Doctype, NavigableString, ProcessingInstruction, Tag
+
+CHUNK_SIZE = 1 << 16
+
+# Content written as-is: no escaping, no whitespace changes
+RAW_TEXT = {'script', 'style'}
+
+# Whitespace in these is significant
+PREFORMATTED = {'pre', 'textarea', 'script', 'style'}
+
+# Elements that break a line by themselves; whitespace between them doesn't render
+BLOCK = {
+    'address', 'article', 'aside', 'blockquote', 'body', 'caption', 'dd', 'details', 'dialog', 'div', 'dl',
+    'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'head',
+    'header', 'hgroup', 'hr', 'html', 'li', 'link', 'main', 'meta', 'nav', 'noscript', 'ol', 'option', 'p',
+    'pre', 'script', 'section', 'style', 'summary', 'table', 'tbody', 'td', 'template', 'tfoot', 'th',
+    'thead', 'title', 'tr', 'ul',
+}
+
+# Starting one of these closes an open <p> (HTML spec, "optional tags")
+CLOSES_PARAGRAPH = {
+    'address', 'article', 'aside', 'blockquote', 'details', 'div', 'dl', 'fieldset', 'figcaption', 'figure',
+    'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hgroup', 'hr', 'main', 'menu', 'nav',
+    'ol', 'p', 'pre', 'section', 'table', 'ul',
+}
+
+# A </p> at the end of these can't be dropped
+KEEPS_PARAGRAPH_END = {'a', 'audio', 'del', 'ins', 'map', 'noscript', 'video'}
+
+# End tags that may be left out when followed by one of these tags (None: by nothing);
+# </head> is always written because critical_css.py finds the head by it
+OPTIONAL_END_TAGS = {
+    'li': {'li', None},
+    'dt': {'dt', 'dd'},
+    'dd': {'dt', 'dd', None},
+    'option': {'option', 'optgroup', None},
+    'optgroup': {'optgroup', None},
+    'thead': {'tbody', 'tfoot'},
+    'tbody': {'tbody', 'tfoot', None},
+    'tfoot': {None},
+    'tr': {'tr', None},
+    'td': {'td', 'th', None},
+    'th': {'td', 'th', None},
+    'body': {None},
+    'html': {None},
+}
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def escape_text(text):
+    """Escape text content"""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def escape_attribute(value):
+    """Escape a double-quoted attribute value"""
+    return escape_text(value).replace('"', '&quot;')
+
+def start_tag(tag, minify):
+    """Opening tag with its attributes"""
+    parts = [f'<{tag.name}']
+    for name, value in tag.attrs.items():
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(value)
+        if minify and value == '':
+            parts.append(f' {name}')
+        else:
+            parts.append(f' {name}="{escape_attribute(value)}"')
+    parts.append('>')
+    return ''.join(parts)
+
+def is_conditional_comment(node):
+    """Check for an IE conditional comment, which has to survive minification"""
+    return node.startswith('[if') or node.startswith('<![endif')
+
+def in_preformatted(node):
+    """Check whether a text node sits inside an element that keeps its whitespace"""
+    return any(parent.name in PREFORMATTED for parent in node.parents)
+
+def is_droppable(node):
+    """Check whether minifying drops a node: plain comments and whitespace between blocks"""
+    if isinstance(node, Comment):
+        return not is_conditional_comment(node)
+    if type(node) is not NavigableString or node.strip():
+        return False
+    parent = node.parent
+    if parent is None or parent.name in PREFORMATTED or in_preformatted(node):
+        return False
+    # Whitespace touching a block (or the edge of a block parent) never renders
+    for neighbour in (node.previous_sibling, node.next_sibling):
+        if neighbour is None:
+            if parent.name not in BLOCK and parent.name != '[document]':
+                return False
+        elif not isinstance(neighbour, Tag) or neighbour.name not in BLOCK:
+            return False
+    return True
+
+def next_kept_sibling(node):
+    """The next sibling that survives minification"""
+    sibling = node.next_sibling
+    while sibling is not None and is_droppable(sibling):
+        sibling = sibling.next_sibling
+    return sibling
+
+def end_tag_is_optional(tag):
+    """Check whether a minified tree can leave out a tag's end tag"""
+    following = next_kept_sibling(tag)
+    if following is not None and not isinstance(following, Tag):
+        # Text or a kept comment right after the element would move inside it
+        return False
+    following_name = following.name if following is not None else None
+
+    if tag.name == 'p':
+        if following is None:
+            return tag.parent is not None and tag.parent.name not in KEEPS_PARAGRAPH_END
+        return following_name in CLOSES_PARAGRAPH
+    return following_name in OPTIONAL_END_TAGS.get(tag.name, ())
+
+def serialize_node(node, minify):
+    """Markup of a leaf node (text, comment, doctype and similar)"""
+    if isinstance(node, Comment):
+        return '' if minify and not is_conditional_comment(node) else f'<!--{node}-->'
+    if isinstance(node, Doctype):
+        return f'<!DOCTYPE {node}>'
+    if isinstance(node, CData):
+        return f'<![CDATA[{node}]]>'
+    if isinstance(node, ProcessingInstruction):
+        return f'<?{node}>'
+    if isinstance(node, Declaration):
+        return f'<!{node}>'
+
+    parent = node.parent.name if node.parent is not None else None
+    if parent in RAW_TEXT:
+        return str(node)
+    text = escape_text(node)
+    if minify:
+        if is_droppable(node):
+            return ''
+        if not in_preformatted(node):
+            text = WHITESPACE_PATTERN.sub(' ', text)
+    return text
+
+def iter_markup(root, minify=False):
+    """Yield a tree's markup piece by piece, without recursion"""
+    # Each frame is (tag, iterator over its children); a tag's end is written when its children run out
+    stack = [(root, iter(root.contents))]
+    while stack:
+        tag, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if tag is not root and not tag.is_empty_element and not (minify and end_tag_is_optional(tag)):
+                yield f'</{tag.name}>'
+            continue
+
+        if isinstance(child, Tag):
+            yield start_tag(child, minify)
+            if not child.is_empty_element:
+                stack.append((child, iter(child.contents)))
+        else:
+            yield serialize_node(child, minify)
+
+def write_html(soup, f, minify=False, chunk_size=CHUNK_SIZE):
+    """Write a tree to an open text file; returns the number of characters written"""
+    buffer = []
+    buffered = 0
+    written = 0
+    for piece in iter_markup(soup, minify):
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= chunk_size:
+            f.write(''.join(buffer))
+            written += buffered
+            buffer = []
+            buffered = 0
+    f.write(''.join(buffer))
+    return written + buffered
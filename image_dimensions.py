@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Read image pixel dimensions from file headers without decoding
+- Supports JPEG, PNG, GIF and WebP (detected by content, not extension)
+- Honours JPEG EXIF orientation so portrait photos report portrait sizes
+- Caches results in .build/dimensions.json keyed by path, size and mtime
+"""
+
+import math
+import os
+import struct
+import sys
+
+from build_manifest import load_json_cache, save_json_cache
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+CACHE_NAME = 'dimensions.json'
+
+# Aspect ratio helpers defined in css/layout.css
+ASPECT_CLASSES = {
+    'aspect-1-1': 1 / 1,
+    'aspect-3-2': 3 / 2,
+    'aspect-2-3': 2 / 3,
+    'aspect-3-4': 3 / 4,
+    'aspect-4-3': 4 / 3,
+    'aspect-16-9': 16 / 9,
+}
+
+# JPEG start-of-frame markers (excluding DHT/JPG/DAC which share the range)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def read_dimensions(path):
+    """Get (width, height) of an image from its header, or None if unrecognised
+
+    A truncated or corrupt header falls back to Pillow, and the file is
+    skipped with a warning if that can't read it either.
+    """
+    try:
+        return read_header_dimensions(path)
+    except (OSError, ValueError, struct.error) as error:
+        header_error = error
+
+    if Image is not None:
+        try:
+            with Image.open(path) as img:
+                width, height = img.size
+                # Orientations 5-8 rotate by 90 degrees
+                if img.getexif().get(0x0112, 1) >= 5:
+                    width, height = height, width
+                return width, height
+        except (OSError, ValueError, struct.error, SyntaxError):
+            pass
+    print(f"  Skipping dimensions of {path}: unreadable header ({header_error})")
+    return None
+
+def read_header_dimensions(path):
+    """Parse (width, height) out of the file header; raises struct.error if it is cut short"""
+    with open(path, 'rb') as f:
+        head = f.read(32)
+        f.seek(0)
+
+        if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', head[6:10])
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            return read_webp_dimensions(f)
+        if head[:2] == b'\xff\xd8':
+            return read_jpeg_dimensions(f)
+
+    return None
+
+def read_webp_dimensions(f):
+    """Parse the first chunk of a WebP file"""
+    data = f.read(30)
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        # Lossy: 14-bit sizes after the 3-byte frame tag and start code
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L':
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        width = int.from_bytes(data[24:27], 'little') + 1
+        height = int.from_bytes(data[27:30], 'little') + 1
+        return width, height
+    return None
+
+def read_jpeg_dimensions(f):
+    """Walk JPEG marker segments up to the start-of-frame"""
+    f.seek(2)
+    orientation = 1
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        # Padding bytes and standalone markers carry no length
+        if code == 0xFF:
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+
+        length = struct.unpack('>H', f.read(2))[0]
+        if code in JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>xHH', f.read(5))
+            # Orientations 5-8 rotate by 90 degrees
+            if orientation >= 5:
+                width, height = height, width
+            return width, height
+        if code == 0xE1:
+            segment = f.read(length - 2)
+            orientation = read_exif_orientation(segment) or orientation
+        elif code == 0xDA:
+            return None
+        else:
+            f.seek(length - 2, os.SEEK_CUR)
+
+def read_exif_orientation(segment):
+    """Get the orientation tag from an APP1 EXIF segment"""
+    if not segment.startswith(b'Exif\x00\x00'):
+        return None
+    tiff = segment[6:]
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        return None
+
+    try:
+        ifd_offset = struct.unpack(endian + 'I', tiff[4:8])[0]
+        entry_count = struct.unpack(endian + 'H', tiff[ifd_offset:ifd_offset + 2])[0]
+        for i in range(entry_count):
+            entry = ifd_offset + 2 + i * 12
+            tag, _, _, value = struct.unpack(endian + 'HHIH', tiff[entry:entry + 10])
+            if tag == 0x0112:
+                return value
+    except struct.error:
+        return None
+    return None
+
+def nearest_aspect_class(width, height):
+    """Get the aspect class closest to the real ratio (compared on a log scale)"""
+    ratio = width / height
+    return min(ASPECT_CLASSES, key=lambda name: abs(math.log(ratio / ASPECT_CLASSES[name])))
+
+def load_dimension_cache(base_path):
+    """Load the dimension cache for a site root"""
+    return load_json_cache(base_path, CACHE_NAME)
+
+def save_dimension_cache(cache):
+    """Write the dimension cache if new sizes were read"""
+    save_json_cache(cache)
+
+def get_dimensions(cache, path):
+    """Get (width, height) for a file, reading the header only on a cache miss"""
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    cached = cache['entries'].get(path)
+    if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime_ns:
+        return tuple(cached['dimensions']) if cached['dimensions'] else None
+
+    dimensions = read_dimensions(path)
+    cache['entries'][path] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'dimensions': dimensions}
+    cache['dirty'] = True
+    return tuple(dimensions) if dimensions else None
+
+def main():
+    """Print the dimensions of the given files"""
+    for path in sys.argv[1:]:
+        size = read_dimensions(path)
+        if size:
+            print(f"{path}: {size[0]}x{size[1]} ({nearest_aspect_class(*size)})")
+        else:
+            print(f"{path}: unrecognised format")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Cross-section index of the local copies of Squarespace CDN images
+- Map original filenames (URL-decoded, case- and copy-suffix-insensitive), content
+  digests and CDN asset ids to the file actually on disk, following collapsed duplicates
+- Learn asset ids from the export's pages, so renamed or re-exported variants of an
+  upload still resolve to the same local file
+- Built once per build and stored in .build/image-index.json for the page workers
+- Print the CDN references in the export that have no local copy
+"""
+
+import argparse
+import json
+import os
+import re
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from build_manifest import BUILD_DIR, digest_values, file_digest, load_manifest, manifest_path, save_manifest
+from dedupe_images import load_aliases, resolve_alias
+from image_pipeline import SECTIONS, list_section_images
+
+DEFAULT_INPUT = r'C:\DEV\MARIA\MARIA_DATA'
+INDEX_NAME = 'image-index.json'
+INDEX_VERSION = 1
+
+CDN_HOST_SUFFIX = 'squarespace-cdn.com'
+CDN_URL_PATTERN = re.compile(r'(?:https?:)?//[\w.-]*squarespace-cdn\.com/[^\s"\'()<>,]+', re.I)
+IMAGE_NAME_PATTERN = re.compile(r'\.(jpe?g|png|gif|webp|avif)$', re.I)
+
+# "IMG_1234 (1).jpg" / "IMG_1234+(2).jpg": the browser's names for a re-downloaded file
+COPY_SUFFIX_PATTERN = re.compile(r'[\s+]*\(\d+\)(?=\.[^.]+$)')
+
+def normalize_name(name):
+    """Key a filename the way different exports of the same upload agree on"""
+    return COPY_SUFFIX_PATTERN.sub('', unquote(name).replace('+', ' ')).strip().lower()
+
+def is_cdn_url(url):
+    """Check whether a URL points at the Squarespace image CDN"""
+    host = urlsplit(url if '//' in url else '//' + url).netloc.lower()
+    return host.endswith(CDN_HOST_SUFFIX)
+
+def parse_cdn_url(url):
+    """Split a CDN URL into (asset id, filename); the id is the path up to the filename
+
+    .../content/v1/<site>/<upload>/IMG_1234.jpg?format=1500w -> ('content/v1/<site>/<upload>', 'IMG_1234.jpg')
+    """
+    path = urlsplit(url).path.strip('/')
+    if '/' not in path:
+        return None, path or None
+    asset_id, filename = path.rsplit('/', 1)
+    return asset_id, filename if IMAGE_NAME_PATTERN.search(filename) else None
+
+def local_name(section, file):
+    """Original upload name of a downloaded file (downloads are saved as <section>_<name>)"""
+    prefix = f'{section}_'
+    return file[len(prefix):] if file.startswith(prefix) else file
+
+def index_path(site_root):
+    """Index location for a site root"""
+    return os.path.join(site_root, BUILD_DIR, INDEX_NAME)
+
+def empty_entries():
+    """A fresh index: files and lookups are rebuilt from disk, learned ids persist"""
+    return {'version': INDEX_VERSION, 'inputs': None, 'names': {}, 'digests': {}, 'ids': {}, 'scanned': []}
+
+def load_image_index(site_root):
+    """Load the image index for a site root"""
+    path = index_path(site_root)
+    entries = empty_entries()
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                entries = data
+        except (OSError, ValueError):
+            pass
+
+    return {'path': path, 'entries': entries, 'dirty': False}
+
+def save_image_index(index):
+    """Write the image index if it changed"""
+    if not index['dirty']:
+        return
+
+    os.makedirs(os.path.dirname(index['path']), exist_ok=True)
+    tmp_path = index['path'] + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index['entries'], f, indent=1, sort_keys=True)
+    os.replace(tmp_path, index['path'])
+    index['dirty'] = False
+
+def index_files(index, images_root, manifest):
+    """Rebuild the name and digest lookups when the images on disk or the aliases changed"""
+    images_root = Path(images_root)
+    files = {}
+    for section in SECTIONS:
+        for file in list_section_images(images_root / section):
+            files[f'{section}/{file}'] = file_digest(manifest, images_root / section / file)
+    aliases = load_aliases(images_root)
+
+    inputs = digest_values(files, aliases)
+    entries = index['entries']
+    if entries['inputs'] == inputs:
+        return
+
+    names = {}
+    digests = {}
+    # Sections in site order, so a file shared by several sections maps to the first one's copy
+    for item, digest in files.items():
+        section, file = item.split('/', 1)
+        names.setdefault(normalize_name(local_name(section, file)), {}).setdefault(section, item)
+        digests.setdefault(digest, item)
+    # Collapsed duplicates keep resolving by their old name, to the canonical file
+    for alias in aliases:
+        section, file = alias.split('/', 1)
+        canonical = resolve_alias(aliases, alias)
+        if canonical in files:
+            names.setdefault(normalize_name(local_name(section, file)), {})[section] = canonical
+
+    # Ids whose content was rewritten (e.g. by optimize_images) are relearned by rescanning the pages
+    ids = {asset_id: digest for asset_id, digest in entries['ids'].items() if digest in digests}
+    entries.update(inputs=inputs, names=names, digests=digests, ids=ids, scanned=[])
+    index['dirty'] = True
+
+def lookup_name(entries, filename, section=None):
+    """Find a local file by upload name, preferring the given section's copy"""
+    matches = entries['names'].get(normalize_name(filename))
+    if not matches:
+        return None
+    return matches.get(section) or next(iter(matches.values()))
+
+def resolve_url(index, url, section=None):
+    """Map a CDN URL to a local 'section/file', or None when there is no local copy"""
+    entries = index['entries']
+    asset_id, filename = parse_cdn_url(url)
+    item = lookup_name(entries, filename, section) if filename else None
+    if item is None and asset_id:
+        # A renamed variant of an upload seen before resolves through its content
+        digest = entries['ids'].get(asset_id)
+        item = entries['digests'].get(digest) if digest else None
+    return item
+
+def learn_ids(index, html, section, manifest, images_root):
+    """Record the content behind every CDN asset id a page resolves by name"""
+    entries = index['entries']
+    for url in CDN_URL_PATTERN.findall(html):
+        asset_id, filename = parse_cdn_url(url)
+        if not asset_id or not filename or asset_id in entries['ids']:
+            continue
+        item = lookup_name(entries, filename, section)
+        if item:
+            entries['ids'][asset_id] = file_digest(manifest, os.path.join(images_root, item))
+            index['dirty'] = True
+
+def build_image_index(site_root, source_pages, manifest):
+    """Bring the index up to date with the images on disk and the export's pages
+
+    source_pages is [(section, path)]; pages already scanned since the
+    images last changed are skipped.
+    """
+    images_root = os.path.join(site_root, 'images')
+    index = load_image_index(site_root)
+    index_files(index, images_root, manifest)
+
+    entries = index['entries']
+    scanned = []
+    for section, page in source_pages:
+        if not os.path.exists(page):
+            continue
+        digest = file_digest(manifest, page)
+        if digest not in entries['scanned']:
+            with open(page, 'r', encoding='utf-8') as f:
+                learn_ids(index, f.read(), section, manifest, images_root)
+        scanned.append(digest)
+    if scanned != entries['scanned']:
+        entries['scanned'] = scanned
+        index['dirty'] = True
+
+    return index
+
+def index_digest(index):
+    """Digest of everything lookups depend on, for page manifest inputs"""
+    entries = index['entries']
+    return digest_values(entries['inputs'], entries['ids'])
+
+def find_unresolved(index, html, section=None):
+    """CDN URLs in a page with no local copy, in order of first appearance"""
+    unresolved = {}
+    for url in CDN_URL_PATTERN.findall(html):
+        if url not in unresolved and resolve_url(index, url, section) is None:
+            unresolved[url] = True
+    return list(unresolved)
+
+def main():
+    """Build the index for the export and report CDN references without a local copy"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default=DEFAULT_INPUT, help='Squarespace export root (default: %(default)s)')
+    parser.add_argument('--output', default=str(Path(__file__).parent), help='site root (default: %(default)s)')
+    args = parser.parse_args()
+
+    manifest = load_manifest(manifest_path(args.output))
+    pages = [(section, os.path.join(args.input, section, 'index.html')) for section in SECTIONS]
+    index = build_image_index(args.output, pages, manifest)
+    save_image_index(index)
+    save_manifest(manifest)
+
+    entries = index['entries']
+    print(f"{len(entries['digests'])} local images, {len(entries['names'])} names, {len(entries['ids'])} CDN asset ids")
+    for section, page in pages:
+        if not os.path.exists(page):
+            continue
+        with open(page, 'r', encoding='utf-8') as f:
+            unresolved = find_unresolved(index, f.read(), section)
+        print(f"{section}: {len(unresolved)} unresolved CDN references")
+        for url in unresolved[:10]:
+            print(f"  {url}")
+        if len(unresolved) > 10:
+            print(f"  ... and {len(unresolved) - 10} more")
+
+if __name__ == '__main__':
+    main()
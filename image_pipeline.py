@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Build responsive image derivatives for Maria's portfolio website
+- Resize every image in images/<section> to a ladder of widths
+- Encode WebP/AVIF siblings and keep them only when they are smaller
+- Compute a tiny inline placeholder for each image
+- Write the derivatives to images/derived/<section>
+- Spread the work over a process pool, one chunk of files per task
+- Provide srcset/sizes/<picture> helpers for the page generators
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import os
+import re
+from pathlib import Path
+
+from build_manifest import (
+    digest_values, file_digest, is_up_to_date, load_manifest, manifest_path,
+    record_outputs, recorded_outputs, save_manifest,
+)
+from fingerprint_assets import is_fingerprinted
+from image_placeholders import compute_placeholder, load_placeholder_index, save_placeholder_index, store_placeholder
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+SECTIONS = ['home', 'projects', 'photoshoots', 'press', 'press-loans']
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+# Width ladder for derivatives (never upscaled past the original width)
+WIDTHS = [480, 960, 1600, 2400]
+DERIVED_DIR = 'derived'
+JPEG_QUALITY = 82
+# Bumped when derivatives change without a setting changing (2: siblings encoded from the resized original)
+DERIVATIVES_VERSION = 2
+
+# Modern formats in <picture> preference order, with encoder settings
+MODERN_FORMATS = [
+    ('avif', 'image/avif', {'quality': 60, 'speed': 6}),
+    ('webp', 'image/webp', {'quality': 80, 'method': 6}),
+]
+# A modern format must save at least this fraction of bytes to be kept
+MIN_SAVING = 0.05
+
+# Files per pool task; small enough to balance sections of very different sizes
+CHUNK_SIZE = 8
+
+# `sizes` for each grid column class: full width below the 768px breakpoint,
+# otherwise the class's share of the 24-column grid, capped at the 1500px max width
+GRID_SIZES = {
+    'grid-item--full': '(max-width: 768px) 100vw, (max-width: 1500px) 100vw, 1500px',
+    'grid-item--half': '(max-width: 768px) 100vw, (max-width: 1500px) 50vw, 750px',
+    'grid-item--third': '(max-width: 768px) 100vw, (max-width: 1500px) 34vw, 500px',
+    'grid-item--two-thirds': '(max-width: 768px) 100vw, (max-width: 1500px) 67vw, 1000px',
+}
+DEFAULT_SIZES = '100vw'
+
+# `sizes` for the 1/2/3 column galleries in styles.css
+GALLERY_SIZES = '(max-width: 767px) 100vw, (max-width: 1023px) 50vw, 33vw'
+
+DERIVATIVE_PATTERN = re.compile(r'^(?P<stem>.+)-(?P<width>\d+)w\.[a-z0-9]+$')
+
+def derivative_name(filename, width):
+    """Get the derivative filename for an image at a given width"""
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}-{width}w{ext.lower()}'
+
+def target_widths(original_width):
+    """Get the ladder widths to produce for an image of the given width"""
+    widths = [w for w in WIDTHS if w < original_width]
+    # Always include the original size so the srcset has a full-quality candidate
+    if original_width <= WIDTHS[-1]:
+        widths.append(original_width)
+    return widths
+
+def generate_derivatives(source_path, output_dir):
+    """Resize one image to every ladder width, in its own format and the modern ones
+
+    WebP/AVIF siblings are encoded from the same resized pixels as the
+    fallback, in the same pass, rather than decoded back from the lossy
+    fallback file. Returns (derivatives, modern): the fallback filenames,
+    largest first, and the modern siblings worth keeping.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required to build image derivatives (pip install Pillow)")
+
+    source_path = Path(source_path)
+    output_dir = Path(output_dir)
+
+    with Image.open(source_path) as img:
+        # Animated GIFs can't be resized frame-by-frame here, leave them alone
+        if getattr(img, 'is_animated', False):
+            return [], []
+
+        img = ImageOps.exif_transpose(img)
+        formats = [fmt for fmt in MODERN_FORMATS if f'.{fmt[0]}' != source_path.suffix.lower()]
+        derivatives = []
+        siblings = {ext: [] for ext, mime_type, options in formats}
+
+        # Resize from largest to smallest so each step starts from fewer pixels
+        for width in sorted(target_widths(img.width), reverse=True):
+            output_path = output_dir / derivative_name(source_path.name, width)
+            derivatives.append(output_path.name)
+
+            height = max(1, round(img.height * width / img.width))
+            if width != img.width:
+                img = img.resize((width, height), Image.LANCZOS)
+
+            save_image(img, output_path)
+            for ext, mime_type, options in formats:
+                sibling = output_path.with_suffix(f'.{ext}')
+                encode_modern_format(img, sibling, ext, options)
+                siblings[ext].append(sibling)
+
+    return derivatives, keep_smallest_formats(output_dir, derivatives, siblings)
+
+def save_image(img, output_path):
+    """Save an image using the encoder matching its file extension"""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    ext = output_path.suffix.lower()
+
+    if ext in ('.jpg', '.jpeg'):
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        img.save(output_path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif ext == '.png':
+        img.save(output_path, 'PNG', optimize=True)
+    elif ext == '.webp':
+        img.save(output_path, 'WEBP', quality=JPEG_QUALITY, method=6)
+    else:
+        img.save(output_path)
+
+def encode_modern_format(img, output_path, ext, options):
+    """Encode a resized image as a WebP/AVIF sibling of its fallback"""
+    if img.mode not in ('RGB', 'RGBA', 'L'):
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+    img.save(output_path, ext.upper(), **options)
+
+def keep_smallest_formats(output_dir, derivatives, siblings):
+    """Keep the modern siblings that are worth serving, deleting the rest
+
+    Each format is judged on the total size across all widths so a <picture>
+    source never covers only part of the width ladder. A format is kept only
+    when it beats the fallback and every format listed after it.
+    """
+    output_dir = Path(output_dir)
+    best_total = sum((output_dir / name).stat().st_size for name in derivatives)
+    kept = []
+
+    # Judge from the last preference upwards so each format competes with what follows it
+    for ext, mime_type, options in reversed(MODERN_FORMATS):
+        outputs = siblings.get(ext)
+        if not outputs:
+            continue
+
+        total = sum(f.stat().st_size for f in outputs)
+        if total <= best_total * (1 - MIN_SAVING):
+            best_total = total
+            kept.extend(f.name for f in outputs)
+        else:
+            for output_path in outputs:
+                output_path.unlink()
+
+    return kept
+
+def process_image(source_path, output_dir):
+    """Build all derivatives, modern-format siblings and the placeholder for one image"""
+    derivatives, modern = generate_derivatives(source_path, output_dir)
+    placeholder = compute_placeholder(source_path)
+    return derivatives, modern, placeholder
+
+def process_chunk(section_path, output_dir, files):
+    """Process a chunk of files from one section (runs in a worker process)"""
+    return [(file,) + process_image(Path(section_path) / file, output_dir) for file in files]
+
+def list_section_images(section_path):
+    """List a section's image files in a stable order, ignoring fingerprinted copies"""
+    if not os.path.exists(section_path):
+        return []
+    return sorted(
+        f for f in os.listdir(section_path)
+        if f.lower().endswith(IMAGE_EXTENSIONS) and not is_fingerprinted(f)
+    )
+
+def settings_digest():
+    """Digest of the settings that shape every derivative"""
+    return digest_values(DERIVATIVES_VERSION, WIDTHS, JPEG_QUALITY, MODERN_FORMATS, MIN_SAVING)
+
+def build_images(images_path, sections=SECTIONS, jobs=None, manifest=None, placeholders=None):
+    """Process every image of the given sections on a process pool
+
+    Work is split into per-section chunks and submitted together so large
+    sections don't leave workers idle. Results are reassembled in section
+    and filename order, so the outcome doesn't depend on the worker count.
+    With a manifest, images whose content and settings are unchanged are
+    skipped and their recorded outputs reused. Placeholders are stored in
+    the given placeholder index, keyed by image digest.
+    Returns {section: [(file, derivatives, modern), ...]}.
+    """
+    images_path = Path(images_path)
+    settings = settings_digest()
+    cached = {}
+    tasks = []
+    for section in sections:
+        stale = []
+        for file in list_section_images(images_path / section):
+            key = f'image:{section}/{file}'
+            if manifest is not None:
+                digest = file_digest(manifest, images_path / section / file)
+                inputs = digest_values(digest, settings)
+                has_placeholder = placeholders is None or digest in placeholders['entries']
+                if has_placeholder and is_up_to_date(manifest, key, inputs):
+                    cached[(section, file)] = split_outputs(file, recorded_outputs(manifest, key))
+                    continue
+            stale.append(file)
+
+        for start in range(0, len(stale), CHUNK_SIZE):
+            tasks.append((section, start, stale[start:start + CHUNK_SIZE]))
+
+    total_files = sum(len(files) for _, _, files in tasks)
+    print(f"Processing {total_files} images ({len(cached)} up to date) in {len(tasks)} chunks on {jobs or os.cpu_count()} workers")
+
+    chunks = {}
+    if tasks:
+        done_files = 0
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {}
+            for section, start, files in tasks:
+                future = executor.submit(process_chunk, images_path / section, images_path / DERIVED_DIR / section, files)
+                futures[future] = (section, start)
+
+            for future in as_completed(futures):
+                section, start = futures[future]
+                chunks[(section, start)] = future.result()
+                done_files += len(chunks[(section, start)])
+                print(f"  [{done_files}/{total_files}] {section} {start + 1}-{start + len(chunks[(section, start)])}")
+
+    for (section, start), chunk in chunks.items():
+        for file, derivatives, modern, placeholder in chunk:
+            cached[(section, file)] = (derivatives, modern)
+            if manifest is not None:
+                record_image(manifest, images_path, section, file, derivatives + modern, settings)
+                if placeholders is not None:
+                    store_placeholder(placeholders, file_digest(manifest, images_path / section / file), placeholder)
+
+    results = {section: [] for section in sections}
+    for section, file in sorted(cached, key=lambda k: (sections.index(k[0]), k[1])):
+        results[section].append((file,) + cached[(section, file)])
+
+    return results
+
+def split_outputs(file, outputs):
+    """Split recorded output paths back into (derivatives, modern siblings)"""
+    fallback_ext = os.path.splitext(file)[1].lower()
+    names = sorted((os.path.basename(output) for output in outputs), key=derivative_sort_key)
+    derivatives = [name for name in names if os.path.splitext(name)[1] == fallback_ext]
+    modern = [name for name in names if os.path.splitext(name)[1] != fallback_ext]
+    return derivatives, modern
+
+def derivative_sort_key(name):
+    """Order derivative names by width, largest first, like generate_derivatives"""
+    match = DERIVATIVE_PATTERN.match(name)
+    return (-int(match.group('width')) if match else 0, name)
+
+def record_image(manifest, images_path, section, file, outputs, settings):
+    """Record an image's outputs and remove ones left over from its previous build"""
+    key = f'image:{section}/{file}'
+    output_dir = images_path / DERIVED_DIR / section
+    output_paths = [os.path.abspath(output_dir / name) for name in outputs]
+
+    for old_output in recorded_outputs(manifest, key):
+        if old_output not in output_paths and os.path.exists(old_output):
+            os.remove(old_output)
+
+    inputs = digest_values(file_digest(manifest, images_path / section / file), settings)
+    record_outputs(manifest, key, inputs, output_paths)
+
+def load_derivative_index(images_root, section_name):
+    """Map each original image stem to its derivatives on disk, by extension and width"""
+    derived_dir = os.path.join(images_root, DERIVED_DIR, section_name)
+    index = {}
+    if os.path.exists(derived_dir):
+        for file in os.listdir(derived_dir):
+            match = DERIVATIVE_PATTERN.match(file)
+            if match:
+                ext = os.path.splitext(file)[1][1:]
+                variants = index.setdefault(match.group('stem'), {}).setdefault(ext, {})
+                variants[int(match.group('width'))] = file
+
+    return index
+
+def build_srcset(url_prefix, filename, derivative_index, ext=None):
+    """Build a srcset string for an image from its derivatives in one format
+
+    Defaults to the original's own format, i.e. the <img> fallback.
+    """
+    stem, original_ext = os.path.splitext(filename)
+    variants = derivative_index.get(stem, {}).get(ext or original_ext[1:].lower())
+    if not variants:
+        return ''
+
+    return ', '.join(f'{url_prefix}/{variants[w]} {w}w' for w in sorted(variants))
+
+def picture_sources(url_prefix, filename, derivative_index):
+    """Get an image's fallback srcset and its [mime type, srcset] modern sources
+
+    The fallback srcset is empty when no derivatives exist for the file.
+    """
+    fallback_srcset = build_srcset(url_prefix, filename, derivative_index)
+    sources = []
+    for ext, mime_type, options in MODERN_FORMATS:
+        srcset = build_srcset(url_prefix, filename, derivative_index, ext)
+        if srcset:
+            sources.append([mime_type, srcset])
+    return fallback_srcset, sources
+
+def picture_markup(src, alt, srcset, sources, sizes=DEFAULT_SIZES, indent='', img_attrs=''):
+    """Render <picture> from a fallback srcset and [mime type, srcset] sources
+
+    Falls back to a bare <img> without a srcset.
+    """
+    if not srcset:
+        return f'{indent}<img src="{src}" alt="{alt}"{img_attrs}>'
+
+    lines = [f'{indent}<picture>']
+    for mime_type, source_srcset in sources:
+        lines.append(f'{indent}  <source type="{mime_type}" srcset="{source_srcset}" sizes="{sizes}">')
+    lines.append(f'{indent}  <img src="{src}" srcset="{srcset}" sizes="{sizes}" alt="{alt}"{img_attrs}>')
+    lines.append(f'{indent}</picture>')
+
+    return '\n'.join(lines)
+
+def picture_html(src, alt, url_prefix, derivative_index, sizes=DEFAULT_SIZES, indent='', img_attrs=''):
+    """Render an image as <picture> with typed modern sources and an <img> fallback
+
+    Falls back to a bare <img> when no derivatives exist for the file.
+    """
+    srcset, sources = picture_sources(url_prefix, src.rsplit('/', 1)[-1], derivative_index)
+    return picture_markup(src, alt, srcset, sources, sizes, indent, img_attrs)
+
+def sizes_for_grid_class(grid_class):
+    """Get the sizes attribute matching a grid column class"""
+    return GRID_SIZES.get(grid_class, DEFAULT_SIZES)
+
+def main():
+    """Build derivatives for every section"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--only', choices=SECTIONS, action='append', help='limit to a section (repeatable)')
+    parser.add_argument('--force', action='store_true', help='ignore the build manifest and reprocess everything')
+    args = parser.parse_args()
+
+    base_path = Path(__file__).parent
+    images_path = base_path / 'images'
+
+    manifest = load_manifest(manifest_path(base_path))
+    placeholders = load_placeholder_index(base_path)
+    if args.force:
+        manifest['entries'] = {key: entry for key, entry in manifest['entries'].items() if not key.startswith('image:')}
+
+    try:
+        results = build_images(images_path, args.only or SECTIONS, args.jobs, manifest, placeholders)
+    finally:
+        save_manifest(manifest)
+        save_placeholder_index(placeholders)
+
+    print()
+    for section, images in results.items():
+        derivative_count = sum(len(derivatives) for _, derivatives, _ in images)
+        modern_count = sum(len(modern) for _, _, modern in images)
+        print(f"{section}: {len(images)} images, {derivative_count} derivatives, {modern_count} WebP/AVIF siblings")
+
+    print(f"\nAll derivatives generated successfully!")
+
+if __name__ == '__main__':
+    main()
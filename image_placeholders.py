@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Low-quality image placeholders for Maria's portfolio website
+- Encode a tiny (~16px) WebP preview of each image as a data URI
+- Store them in .build/placeholders.json keyed by the image's SHA-256
+- Generators inline them as CSS backgrounds so something paints before the image bytes arrive
+"""
+
+import base64
+import io
+
+from build_manifest import load_json_cache, save_json_cache
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+INDEX_NAME = 'placeholders.json'
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_QUALITY = 30
+
+def compute_placeholder(source_path):
+    """Encode a tiny WebP preview of an image as a data URI"""
+    if Image is None:
+        raise RuntimeError("Pillow is required to build placeholders (pip install Pillow)")
+
+    with Image.open(source_path) as img:
+        # JPEG can decode straight to a reduced scale, skipping most of the work
+        img.draft('RGB', (PLACEHOLDER_WIDTH * 4, PLACEHOLDER_WIDTH * 4))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+
+        height = max(1, round(img.height * PLACEHOLDER_WIDTH / img.width))
+        img = img.resize((PLACEHOLDER_WIDTH, height), Image.BILINEAR)
+
+        buffer = io.BytesIO()
+        img.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY, method=6)
+
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+def load_placeholder_index(base_path):
+    """Load the placeholder index for a site root"""
+    return load_json_cache(base_path, INDEX_NAME)
+
+def save_placeholder_index(index):
+    """Write the placeholder index if placeholders were added"""
+    save_json_cache(index)
+
+def store_placeholder(index, digest, placeholder):
+    """Add a placeholder for the image content with the given digest"""
+    if index['entries'].get(digest) != placeholder:
+        index['entries'][digest] = placeholder
+        index['dirty'] = True
+
+def placeholder_style(placeholder):
+    """Inline style painting a placeholder behind an image"""
+    if not placeholder:
+        return ''
+    return f'background: url({placeholder}) center / cover no-repeat;'
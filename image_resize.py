@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+On-demand image variants for serve.py's /img/<section>/<file>?w=&fmt= route
+- Resize on first request, decoding JPEGs in draft mode at the smallest scale that still covers the width
+- Snap widths to a fixed ladder and never upscale, so a gallery's requests share few variants
+- Keep variants in a content-addressed disk cache under .build/resized, bounded in bytes with LRU eviction
+- Resize on a process pool; concurrent requests for the same variant share one job
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import os
+from pathlib import Path
+
+from build_manifest import BUILD_DIR, digest_values, file_digest
+from image_pipeline import JPEG_QUALITY, MODERN_FORMATS, WIDTHS, save_image
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+CACHE_DIR = 'resized'
+TMP_PREFIX = 'tmp-'
+DEFAULT_CACHE_BYTES = 512 << 20
+
+# Requested widths are rounded up to the next of these (the derivative ladder plus thumbnail sizes)
+RESIZE_WIDTHS = sorted({160, 320} | set(WIDTHS))
+
+# fmt= value -> (extension, Content-Type); 'orig' keeps the source's format
+FORMATS = {
+    'jpeg': ('.jpg', 'image/jpeg'),
+    'jpg': ('.jpg', 'image/jpeg'),
+    'png': ('.png', 'image/png'),
+    'webp': ('.webp', 'image/webp'),
+    'avif': ('.avif', 'image/avif'),
+}
+SOURCE_FORMATS = {'.jpg': 'jpeg', '.jpeg': 'jpeg', '.png': 'png', '.webp': 'webp', '.gif': 'png'}
+MODERN_OPTIONS = {ext: options for ext, _, options in MODERN_FORMATS}
+
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+def snap_width(width):
+    """Round a requested width up to the ladder (the largest rung caps it)"""
+    for rung in RESIZE_WIDTHS:
+        if width <= rung:
+            return rung
+    return RESIZE_WIDTHS[-1]
+
+def parse_variant(query, source_name):
+    """Read w= and fmt= from a parsed query string: (width or None, format), or None if invalid"""
+    width = None
+    if 'w' in query:
+        try:
+            width = int(query['w'][0])
+        except ValueError:
+            return None
+        if width <= 0:
+            return None
+        width = snap_width(width)
+
+    fmt = query.get('fmt', ['orig'])[0].lower()
+    if fmt == 'orig':
+        fmt = SOURCE_FORMATS.get(os.path.splitext(source_name)[1].lower())
+    if fmt not in FORMATS:
+        return None
+    if fmt == 'jpg':
+        fmt = 'jpeg'
+    return width, fmt
+
+def resize_variant(source_path, output_path, width, fmt):
+    """Write one resized, re-encoded variant of an image (runs in a worker process)
+
+    Returns False for images that can't be resized (animated GIFs).
+    """
+    with Image.open(source_path) as img:
+        if getattr(img, 'is_animated', False):
+            return False
+
+        if width is not None and img.format == 'JPEG':
+            # Decode at 1/2, 1/4 or 1/8 scale when that still covers the target width
+            orientation = img.getexif().get(0x0112)
+            height = max(1, round(img.height * width / img.width)) if orientation not in TRANSPOSED_ORIENTATIONS else None
+            draft_size = (width, height) if height else (max(1, round(img.width * width / img.height)), width)
+            img.draft('RGB', draft_size)
+
+        img = ImageOps.exif_transpose(img)
+        if width is not None and width < img.width:
+            img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+
+        output_path = Path(output_path)
+        # Same extension, so save_image picks the right encoder
+        tmp_path = output_path.with_name(TMP_PREFIX + output_path.name)
+        if fmt in MODERN_OPTIONS:
+            if img.mode not in ('RGB', 'RGBA', 'L'):
+                img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+            img.save(tmp_path, fmt.upper(), **MODERN_OPTIONS[fmt])
+        else:
+            save_image(img, tmp_path)
+    os.replace(tmp_path, output_path)
+    return True
+
+def cache_root(site_root):
+    """Variant cache location for a site root"""
+    return os.path.join(site_root, BUILD_DIR, CACHE_DIR)
+
+def open_resize_cache(site_root, max_bytes=DEFAULT_CACHE_BYTES, jobs=None):
+    """Load the variant cache, least recently used first, and start the worker pool"""
+    root = cache_root(site_root)
+    os.makedirs(root, exist_ok=True)
+
+    found = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith(TMP_PREFIX):
+            os.remove(path)
+        elif os.path.isfile(path):
+            stat = os.stat(path)
+            found.append((stat.st_mtime_ns, name, stat.st_size))
+
+    entries = OrderedDict((name, size) for _, name, size in sorted(found))
+    cache = {
+        'root': root,
+        'entries': entries,
+        'size': sum(entries.values()),
+        'max_bytes': max_bytes,
+        'pending': {},
+        # Source digests, cached by size/mtime like the build manifest's
+        'digests': {'files': {}, 'dirty': False},
+        'pool': ProcessPoolExecutor(max_workers=jobs) if Image is not None else None,
+    }
+    evict(cache)
+    return cache
+
+def close_resize_cache(cache):
+    """Stop the worker pool"""
+    if cache['pool'] is not None:
+        cache['pool'].shutdown(cancel_futures=True)
+
+def touch(cache, name):
+    """Mark a variant as just used; the mtime carries the order across restarts"""
+    cache['entries'].move_to_end(name)
+    try:
+        os.utime(os.path.join(cache['root'], name))
+    except OSError:
+        pass
+
+def evict(cache):
+    """Remove least recently used variants until the cache fits its budget"""
+    while cache['size'] > cache['max_bytes'] and len(cache['entries']) > 1:
+        name, size = cache['entries'].popitem(last=False)
+        cache['size'] -= size
+        try:
+            os.remove(os.path.join(cache['root'], name))
+        except OSError:
+            pass
+
+def variant_name(digest, width, fmt):
+    """Cache filename of a variant: the hash of its source content and settings"""
+    settings = digest_values(digest, width, fmt, JPEG_QUALITY, MODERN_OPTIONS.get(fmt))
+    return settings[:32] + FORMATS[fmt][0]
+
+async def get_variant(cache, source_path, width, fmt):
+    """Path of a cached variant, resizing it first if needed; None if the image can't be resized"""
+    loop = asyncio.get_running_loop()
+    digest = await loop.run_in_executor(None, file_digest, cache['digests'], source_path)
+    name = variant_name(digest, width, fmt)
+    path = os.path.join(cache['root'], name)
+
+    if name in cache['entries']:
+        touch(cache, name)
+        return path
+
+    job = cache['pending'].get(name)
+    if job is None:
+        job = loop.create_task(run_resize(cache, source_path, name, width, fmt))
+        cache['pending'][name] = job
+    # A cancelled request doesn't cancel the job other requests are waiting on
+    return await asyncio.shield(job)
+
+async def run_resize(cache, source_path, name, width, fmt):
+    """Resize one variant on the pool and add it to the cache"""
+    path = os.path.join(cache['root'], name)
+    try:
+        resized = await asyncio.get_running_loop().run_in_executor(
+            cache['pool'], resize_variant, str(source_path), path, width, fmt,
+        )
+        if not resized:
+            return None
+        cache['entries'][name] = os.path.getsize(path)
+        cache['size'] += cache['entries'][name]
+        evict(cache)
+        return path
+    finally:
+        del cache['pending'][name]
+
+def main():
+    """Report the variant cache of a site root, optionally clearing it"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--root', default=str(Path(__file__).parent), help='site root (default: %(default)s)')
+    parser.add_argument('--clear', action='store_true', help='delete every cached variant')
+    args = parser.parse_args()
+
+    root = cache_root(args.root)
+    names = os.listdir(root) if os.path.isdir(root) else []
+    total = sum(os.path.getsize(os.path.join(root, name)) for name in names)
+    print(f"{len(names)} cached variants, {total / 1024 / 1024:.1f} MB in {root}")
+    if args.clear:
+        for name in names:
+            os.remove(os.path.join(root, name))
+        print("Cleared")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+// Gallery loader: mounts the rest of an image grid from its JSON manifest as the reader scrolls,
+// and keeps only the rows near the viewport in the DOM
+document.addEventListener('DOMContentLoaded', function() {
+  const grid = document.querySelector('.image-grid[data-gallery]');
+  if (!grid || !window.fetch) {
+    return;
+  }
+
+  // Rows are mounted this far ahead of the viewport, and taken out of the DOM
+  // once they are this many viewport heights outside it
+  const MOUNT_MARGIN = '150% 0px';
+  const RECYCLE_SCREENS = 3;
+  const BATCH_SIZE = 12;
+
+  let entries = [];
+  let alt = '';
+  let next = parseInt(grid.dataset.rendered, 10) || 0;
+
+  // Rows taken out above and below the mounted ones, nearest last: {start, end, height}.
+  // A row's height includes the gap under it; each spacer stands in for its rows.
+  const above = [];
+  const below = [];
+  const topSpacer = createSpacer();
+  const bottomSpacer = createSpacer();
+
+  function createSpacer() {
+    const spacer = document.createElement('div');
+    spacer.className = 'gallery-spacer';
+    spacer.setAttribute('aria-hidden', 'true');
+    spacer.hidden = true;
+    return spacer;
+  }
+
+  function buildPicture(entry) {
+    const img = document.createElement('img');
+    // Lazy before src, so nothing is fetched until the item is near the viewport
+    img.loading = 'lazy';
+    img.decoding = 'async';
+    img.alt = alt;
+    if (entry.width) {
+      img.width = entry.width;
+      img.height = entry.height;
+    }
+    if (!entry.srcset) {
+      img.src = entry.src;
+      return img;
+    }
+
+    const picture = document.createElement('picture');
+    entry.sources.forEach(([type, srcset]) => {
+      const source = document.createElement('source');
+      source.type = type;
+      source.srcset = srcset;
+      source.sizes = entry.sizes;
+      picture.appendChild(source);
+    });
+    img.sizes = entry.sizes;
+    img.srcset = entry.srcset;
+    img.src = entry.src;
+    picture.appendChild(img);
+    return picture;
+  }
+
+  function buildItem(entry, index) {
+    const item = document.createElement('div');
+    item.className = 'grid-item ' + entry.class;
+    item.dataset.index = index;
+    if (entry.placeholder) {
+      item.style.background = 'url(' + entry.placeholder + ') center / cover no-repeat';
+    }
+    item.appendChild(buildPicture(entry));
+    return item;
+  }
+
+  function buildItems(start, end) {
+    const batch = document.createDocumentFragment();
+    for (let index = start; index < end; index++) {
+      batch.appendChild(buildItem(entries[index], index));
+    }
+    return batch;
+  }
+
+  function mountBatch() {
+    const end = Math.min(next + BATCH_SIZE, entries.length);
+    bottomSpacer.before(buildItems(next, end));
+    next = end;
+  }
+
+  function rowGap() {
+    return parseFloat(getComputedStyle(grid).rowGap) || 0;
+  }
+
+  // Mounted items grouped into rows: items placed in the same grid row share their top
+  function mountedRows(gap) {
+    const rows = [];
+    grid.querySelectorAll(':scope > .grid-item').forEach(item => {
+      const row = rows[rows.length - 1];
+      if (row && row.top === item.offsetTop) {
+        row.items.push(item);
+        row.bottom = Math.max(row.bottom, item.offsetTop + item.offsetHeight + gap);
+      } else {
+        rows.push({ top: item.offsetTop, bottom: item.offsetTop + item.offsetHeight + gap, items: [item] });
+      }
+    });
+    return rows;
+  }
+
+  function takeRow(row) {
+    row.items.forEach(item => item.remove());
+    return {
+      start: parseInt(row.items[0].dataset.index, 10),
+      end: parseInt(row.items[row.items.length - 1].dataset.index, 10) + 1,
+      height: row.bottom - row.top,
+    };
+  }
+
+  // Whole rows are removed, so the remaining items keep their grid placement;
+  // a full-width spacer (whose own gap counts once) keeps the scroll height
+  function sizeSpacer(spacer, rows, gap) {
+    const height = rows.reduce((total, row) => total + row.height, 0);
+    spacer.hidden = height === 0;
+    spacer.style.height = Math.max(0, height - gap) + 'px';
+  }
+
+  function update() {
+    scheduled = false;
+    const gap = rowGap();
+    const margin = window.innerHeight * RECYCLE_SCREENS;
+    const offset = -grid.getBoundingClientRect().top;
+    const viewTop = offset - margin;
+    const viewBottom = offset + window.innerHeight + margin;
+    const rows = mountedRows(gap);
+    if (!rows.length) {
+      return;
+    }
+
+    // Positions read above stay valid: every removal is balanced by its spacer
+    let firstTop = rows[0].top;
+    let lastBottom = rows[rows.length - 1].bottom;
+    while (rows.length > 1 && rows[0].bottom < viewTop) {
+      above.push(takeRow(rows.shift()));
+    }
+    while (above.length && firstTop > viewTop) {
+      const row = above.pop();
+      topSpacer.after(buildItems(row.start, row.end));
+      firstTop -= row.height;
+    }
+    while (rows.length > 1 && rows[rows.length - 1].top > viewBottom) {
+      below.push(takeRow(rows.pop()));
+    }
+    while (below.length && lastBottom < viewBottom) {
+      const row = below.pop();
+      bottomSpacer.before(buildItems(row.start, row.end));
+      lastBottom += row.height;
+    }
+    sizeSpacer(topSpacer, above, gap);
+    sizeSpacer(bottomSpacer, below, gap);
+  }
+
+  let scheduled = false;
+  function scheduleUpdate() {
+    if (!scheduled) {
+      scheduled = true;
+      window.requestAnimationFrame(update);
+    }
+  }
+
+  // Row heights depend on the grid's width, so a resize puts every row back before measuring again
+  function restoreAll() {
+    while (above.length) {
+      const row = above.pop();
+      topSpacer.after(buildItems(row.start, row.end));
+    }
+    while (below.length) {
+      const row = below.pop();
+      bottomSpacer.before(buildItems(row.start, row.end));
+    }
+    sizeSpacer(topSpacer, above, 0);
+    sizeSpacer(bottomSpacer, below, 0);
+    scheduleUpdate();
+  }
+
+  fetch(grid.dataset.gallery)
+    .then(response => response.json())
+    .then(function(gallery) {
+      entries = gallery.items;
+      alt = gallery.alt;
+
+      // ?page=N starts the grid at that page's first image
+      const page = parseInt(new URLSearchParams(window.location.search).get('page'), 10);
+      if (page > 1) {
+        grid.textContent = '';
+        next = Math.min((page - 1) * gallery.pageSize, entries.length);
+      }
+      grid.prepend(topSpacer);
+      grid.append(bottomSpacer);
+      const first = next - grid.querySelectorAll(':scope > .grid-item').length;
+      grid.querySelectorAll(':scope > .grid-item').forEach((item, index) => {
+        item.dataset.index = first + index;
+      });
+
+      if (!('IntersectionObserver' in window)) {
+        // No IntersectionObserver: mount everything at once
+        while (next < entries.length) {
+          mountBatch();
+        }
+        return;
+      }
+
+      const sentinel = document.createElement('div');
+      sentinel.className = 'gallery-sentinel';
+      grid.after(sentinel);
+
+      const mounter = new IntersectionObserver(function(changes) {
+        // Rows recycled below come back through update() before new ones are mounted
+        if (!changes.some(change => change.isIntersecting) || below.length) {
+          return;
+        }
+        mountBatch();
+        scheduleUpdate();
+        if (next >= entries.length) {
+          mounter.disconnect();
+          sentinel.remove();
+        } else {
+          // Re-observe so a sentinel still in range mounts the next batch too
+          mounter.unobserve(sentinel);
+          mounter.observe(sentinel);
+        }
+      }, { rootMargin: MOUNT_MARGIN });
+      mounter.observe(sentinel);
+
+      window.addEventListener('scroll', scheduleUpdate, { passive: true });
+      window.addEventListener('resize', restoreAll);
+    })
+    .catch(function(error) {
+      console.warn('Gallery manifest could not be loaded:', error);
+    });
+});
@@ -59,3 +59,10 @@ document.addEventListener('DOMContentLoaded', function() {
     }
   });
 });
+
+// Offline and repeat-visit caching (sw.js is written by the build; absent in a plain checkout)
+if ('serviceWorker' in navigator) {
+  window.addEventListener('load', function() {
+    navigator.serviceWorker.register('./sw.js').catch(function() {});
+  });
+}
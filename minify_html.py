@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Minify the generated HTML pages in place
+- Remove comments (IE conditional comments stay) and collapse whitespace between tags,
+  keeping it inside <pre>/<textarea>/<script> and single spaces between inline content
+- Minify inline <style> blocks
+- Stream each page through the parser in chunks, writing as it goes, so large gallery
+  pages are never held in memory more than once
+- Skip pages already minified since they last changed, and report bytes saved per page
+"""
+
+from html.parser import HTMLParser
+import argparse
+import os
+import re
+from pathlib import Path
+
+from build_manifest import digest_values, file_digest, is_up_to_date, load_manifest, manifest_path, record_outputs, refresh_output, save_manifest
+from fingerprint_assets import site_pages
+from html_writer import BLOCK, escape_attribute, is_conditional_comment
+from purge_css import strip_comments
+
+PAGES = ['index.html', 'projects.html', 'photoshoots.html', 'press.html', 'press-loans.html', '404.html']
+CHUNK_SIZE = 1 << 16
+
+# Content copied verbatim (style is minified as CSS instead)
+VERBATIM = {'pre', 'textarea', 'script'}
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+CSS_STRING_PATTERN = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+CSS_PUNCTUATION_PATTERN = re.compile(r'\s*([{};,>])\s*')
+CSS_COLON_PATTERN = re.compile(r':\s+')
+
+def minify_css(css):
+    """Drop comments and the whitespace CSS doesn't need, leaving strings untouched"""
+    parts = CSS_STRING_PATTERN.split(strip_comments(css))
+    for index in range(0, len(parts), 2):
+        part = WHITESPACE_PATTERN.sub(' ', parts[index])
+        part = CSS_PUNCTUATION_PATTERN.sub(r'\1', part)
+        parts[index] = CSS_COLON_PATTERN.sub(':', part)
+    return ''.join(parts).replace(';}', '}').strip()
+
+class MinifyingParser(HTMLParser):
+    """Re-emit a page's tokens with comments and insignificant whitespace left out
+
+    Whitespace next to a block-level tag never renders, so it's dropped;
+    whitespace between inline content becomes one space. A trailing space
+    is held back until the next token shows whether it is needed.
+    """
+
+    def __init__(self, write):
+        super().__init__(convert_charrefs=False)
+        self.write = write
+        self.verbatim = []
+        self.style = None
+        self.after_block = True
+        self.pending_space = False
+
+    def emit_inline(self, markup):
+        """Write inline content, preceded by a held-back space"""
+        if self.pending_space:
+            self.write(' ')
+            self.pending_space = False
+        self.write(markup)
+        self.after_block = False
+
+    def emit_tag(self, tag, markup):
+        """Write a tag; block-level tags swallow the whitespace around them"""
+        if tag in BLOCK:
+            self.pending_space = False
+            self.write(markup)
+            self.after_block = True
+        else:
+            self.emit_inline(markup)
+
+    def start_tag(self, tag, attrs):
+        """Rebuild a start tag with normalised attribute spacing"""
+        parts = [f'<{tag}']
+        for name, value in attrs:
+            parts.append(f' {name}' if value is None else f' {name}="{escape_attribute(value)}"')
+        parts.append('>')
+        return ''.join(parts)
+
+    def handle_starttag(self, tag, attrs):
+        self.emit_tag(tag, self.start_tag(tag, attrs))
+        if tag in VERBATIM:
+            self.verbatim.append(tag)
+        elif tag == 'style':
+            self.style = []
+
+    def handle_startendtag(self, tag, attrs):
+        # HTML ignores the self-closing slash, so <div/> opens a div like <div> does
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == 'style' and self.style is not None:
+            self.write(minify_css(''.join(self.style)))
+            self.style = None
+        elif self.verbatim and tag == self.verbatim[-1]:
+            self.verbatim.pop()
+        self.emit_tag(tag, f'</{tag}>')
+
+    def handle_data(self, data):
+        if self.style is not None:
+            self.style.append(data)
+            return
+        if self.verbatim:
+            self.emit_inline(data)
+            return
+
+        text = WHITESPACE_PATTERN.sub(' ', data)
+        if self.after_block or self.pending_space:
+            text = text.lstrip(' ')
+        trailing = text.endswith(' ')
+        text = text.rstrip(' ')
+        if text:
+            self.emit_inline(text)
+        if trailing and not self.after_block:
+            self.pending_space = True
+
+    def handle_entityref(self, name):
+        self.handle_reference(f'&{name};')
+
+    def handle_charref(self, name):
+        self.handle_reference(f'&#{name};')
+
+    def handle_reference(self, markup):
+        """Entity and character references are copied as written"""
+        if self.style is not None:
+            self.style.append(markup)
+        else:
+            self.emit_inline(markup)
+
+    def handle_comment(self, data):
+        if is_conditional_comment(data):
+            self.emit_inline(f'<!--{data}-->')
+
+    def handle_decl(self, decl):
+        self.write(f'<!{decl}>')
+
+    def handle_pi(self, data):
+        self.write(f'<?{data}>')
+
+    def unknown_decl(self, data):
+        self.write(f'<![{data}]>')
+
+def minify_file(source, target, chunk_size=CHUNK_SIZE):
+    """Stream-minify one HTML file into another; returns (bytes before, bytes after)"""
+    with open(target, 'w', encoding='utf-8', newline='') as out:
+        buffer = []
+
+        def write(markup):
+            buffer.append(markup)
+            if len(buffer) >= 1024:
+                out.write(''.join(buffer))
+                buffer.clear()
+
+        parser = MinifyingParser(write)
+        with open(source, 'r', encoding='utf-8', newline='') as f:
+            for chunk in iter(lambda: f.read(chunk_size), ''):
+                parser.feed(chunk)
+        parser.close()
+        out.write(''.join(buffer))
+    return os.path.getsize(source), os.path.getsize(target)
+
+def script_digest(manifest):
+    """Digest of the code that shapes minified pages"""
+    return digest_values(
+        file_digest(manifest, __file__),
+        file_digest(manifest, Path(__file__).parent / 'html_writer.py'),
+        file_digest(manifest, Path(__file__).parent / 'purge_css.py'),
+    )
+
+def minify_site(site_root, pages=PAGES, manifest=None):
+    """Minify every page in place; returns {page: (bytes before, bytes after)}
+
+    Pages minified by an earlier run and untouched since are skipped and
+    reported at their current size.
+    """
+    site_root = Path(site_root).resolve()
+    script = script_digest(manifest) if manifest is not None else None
+
+    report = {}
+    for page in site_pages(site_root, pages):
+        page_path = site_root / page
+        if not page_path.exists():
+            continue
+
+        key = f'minify_html:{page}'
+        if manifest is not None and is_up_to_date(manifest, key, digest_values(script, file_digest(manifest, page_path))):
+            size = os.path.getsize(page_path)
+            report[page] = (size, size)
+            continue
+
+        tmp_path = page_path.with_name(page_path.name + '.tmp')
+        before, after = minify_file(page_path, tmp_path)
+        os.replace(tmp_path, page_path)
+        report[page] = (before, after)
+
+        if manifest is not None:
+            # The page itself belongs to its generator; this entry only remembers it's been minified
+            refresh_output(manifest, page_path)
+            record_outputs(manifest, key, digest_values(script, file_digest(manifest, page_path)), [])
+
+    return report
+
+def main():
+    """Minify every page and report the bytes saved"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages', nargs='*', default=PAGES, help='pages to minify, relative to the site root (default: all)')
+    args = parser.parse_args()
+
+    base_path = Path(__file__).parent
+    manifest = load_manifest(manifest_path(base_path))
+    report = minify_site(base_path, args.pages, manifest)
+    save_manifest(manifest)
+
+    print(f"{'Page':<20} {'Before':>12} {'After':>12} {'Saved':>8}")
+    for page, (before, after) in report.items():
+        saved = 1 - after / before if before else 0
+        print(f"{page:<20} {before / 1024:>9.1f} KB {after / 1024:>9.1f} KB {saved:>7.1%}")
+    total_before = sum(before for before, _ in report.values())
+    total_after = sum(after for _, after in report.values())
+    print(f"{'Total':<20} {total_before / 1024:>9.1f} KB {total_after / 1024:>9.1f} KB {(total_before - total_after) / 1024:>6.1f} KB saved")
+
+if __name__ == '__main__':
+    main()
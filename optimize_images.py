@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Losslessly shrink the original images in images/<section>
+- JPEG: drop metadata segments (camera/Squarespace EXIF and its thumbnail, XMP, IPTC, comments),
+  keeping the orientation, the ICC profile and the JFIF/Adobe headers; the image data is untouched.
+  With jpegtran on PATH, also rewrite the entropy coding as optimized progressive
+- PNG: recompress at maximum effort with the same pixels, ICC profile and transparency
+- --png-to-jpeg: replace PNGs without alpha by JPEGs (lossy, so opt-in), recorded in images/aliases.json
+- Optimize on a process pool, only files whose content changed since they were last optimized
+- Print the bytes saved per section
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import io
+import os
+import shutil
+import struct
+import subprocess
+from pathlib import Path
+
+from build_manifest import digest_values, file_digest, is_up_to_date, load_manifest, manifest_path, record_outputs, save_manifest
+from dedupe_images import load_aliases, save_aliases
+from image_pipeline import JPEG_QUALITY, SECTIONS, list_section_images
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Files per pool task, as for derivatives
+CHUNK_SIZE = 8
+
+# A rewrite is kept only when it saves at least this many bytes (a PNG->JPEG conversion: this fraction)
+MIN_SAVED_BYTES = 64
+MIN_CONVERSION_SAVING = 0.2
+
+ORIENTATION_TAG = 0x0112
+
+# JPEG segments kept: APP0 (JFIF), APP2 ICC profiles, APP14 (Adobe colour transform);
+# every other APPn and COM is metadata. Markers without a length: SOI, EOI, RSTn, TEM
+ICC_SIGNATURE = b'ICC_PROFILE\x00'
+EXIF_SIGNATURE = b'Exif\x00\x00'
+APP0, APP1, APP2, APP14, APP15, COM, SOS = 0xE0, 0xE1, 0xE2, 0xEE, 0xEF, 0xFE, 0xDA
+STANDALONE_MARKERS = {0x01, 0xD8, 0xD9} | set(range(0xD0, 0xD8))
+
+# Formats are told apart by content: many of the export's .jpg files are WebP from the CDN
+JPEG_MAGIC = b'\xff\xd8\xff'
+PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+# Bit depth byte of the IHDR chunk, which always follows the signature
+PNG_BIT_DEPTH_OFFSET = 24
+
+def jpegtran_path():
+    """jpegtran on PATH, or None"""
+    return shutil.which('jpegtran')
+
+def orientation_exif(exif_payload):
+    """A minimal EXIF block holding only the orientation of the given one, or None if upright"""
+    exif = Image.Exif()
+    try:
+        exif.load(exif_payload)
+    except (SyntaxError, ValueError, struct.error):
+        return None
+    orientation = exif.get(ORIENTATION_TAG)
+    if not orientation or orientation == 1:
+        return None
+    minimal = Image.Exif()
+    minimal[ORIENTATION_TAG] = orientation
+    return minimal.tobytes()
+
+def segment(marker, payload):
+    """Encode a JPEG marker segment"""
+    return bytes((0xFF, marker)) + struct.pack('>H', len(payload) + 2) + payload
+
+def strip_jpeg_metadata(data):
+    """Remove metadata segments from a JPEG, keeping orientation and colour information
+
+    Segments are copied byte for byte up to the start of scan; the
+    compressed image data after it is never touched.
+    """
+    if data[:2] != b'\xff\xd8':
+        raise ValueError("Not a JPEG file")
+    out = [data[:2]]
+    offset = 2
+    while offset < len(data):
+        if data[offset] != 0xFF:
+            raise ValueError(f"Bad JPEG marker at {offset}")
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            offset += 1
+            continue
+        if marker in STANDALONE_MARKERS:
+            out.append(data[offset:offset + 2])
+            offset += 2
+            continue
+
+        length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+        end = offset + 2 + length
+        payload = data[offset + 4:end]
+        if marker == SOS:
+            # Everything from the first scan on is image data
+            out.append(data[offset:])
+            break
+        if marker == APP1 and payload.startswith(EXIF_SIGNATURE):
+            exif = orientation_exif(payload)
+            if exif:
+                out.append(segment(APP1, exif))
+        elif marker in (APP0, APP14) or (marker == APP2 and payload.startswith(ICC_SIGNATURE)):
+            out.append(data[offset:end])
+        elif not (APP0 <= marker <= APP15 or marker == COM):
+            out.append(data[offset:end])
+        offset = end
+    return b''.join(out)
+
+def optimize_jpeg(data, jpegtran):
+    """Strip a JPEG's metadata and, with jpegtran, optimize its coding losslessly"""
+    data = strip_jpeg_metadata(data)
+    if jpegtran:
+        result = subprocess.run(
+            [jpegtran, '-copy', 'all', '-optimize', '-progressive'],
+            input=data, capture_output=True, check=False,
+        )
+        if result.returncode == 0 and result.stdout:
+            data = result.stdout
+    return data
+
+def optimize_png(data):
+    """Recompress a PNG with the same pixels; None when it can't be redone faithfully"""
+    # Pillow reads 16-bit RGB/RGBA as 8 bits per channel, so saving would drop precision
+    if len(data) > PNG_BIT_DEPTH_OFFSET and data[PNG_BIT_DEPTH_OFFSET] == 16:
+        return None
+    with Image.open(io.BytesIO(data)) as img:
+        # Animated PNGs, and gamma without an ICC/sRGB profile, don't survive a Pillow round trip
+        if getattr(img, 'is_animated', False) or ('gamma' in img.info and 'icc_profile' not in img.info and 'srgb' not in img.info):
+            return None
+        options = {'optimize': True}
+        for key in ('icc_profile', 'transparency', 'dpi'):
+            if key in img.info:
+                options[key] = img.info[key]
+        exif = orientation_exif(EXIF_SIGNATURE + img.info['exif']) if img.info.get('exif') else None
+        if exif:
+            options['exif'] = exif
+        buffer = io.BytesIO()
+        img.save(buffer, 'PNG', **options)
+    return buffer.getvalue()
+
+def has_alpha(img):
+    """Check whether an image uses transparency"""
+    if 'transparency' in img.info:
+        return True
+    if img.mode in ('RGBA', 'LA', 'PA'):
+        return img.getchannel('A').getextrema()[0] < 255
+    return False
+
+def convert_png(data, jpegtran):
+    """Encode a PNG without alpha as an optimized progressive JPEG; None if it has alpha"""
+    with Image.open(io.BytesIO(data)) as img:
+        if getattr(img, 'is_animated', False) or has_alpha(img):
+            return None
+        options = {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True}
+        if 'icc_profile' in img.info:
+            options['icc_profile'] = img.info['icc_profile']
+        exif = orientation_exif(EXIF_SIGNATURE + img.info['exif']) if img.info.get('exif') else None
+        if exif:
+            options['exif'] = exif
+        buffer = io.BytesIO()
+        img.convert('L' if img.mode in ('L', 'I', 'I;16') else 'RGB').save(buffer, 'JPEG', **options)
+    return optimize_jpeg(buffer.getvalue(), jpegtran)
+
+def optimize_file(path, png_to_jpeg, jpegtran):
+    """Optimize one image in place; returns (bytes before, bytes after, new filename or None)"""
+    path = Path(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    before = len(data)
+
+    try:
+        if data.startswith(JPEG_MAGIC):
+            optimized = optimize_jpeg(data, jpegtran)
+        elif data.startswith(PNG_MAGIC):
+            if png_to_jpeg:
+                converted = convert_png(data, jpegtran)
+                target = path.with_suffix('.jpg')
+                if converted and len(converted) <= before * (1 - MIN_CONVERSION_SAVING) and not target.exists():
+                    write_atomic(target, converted)
+                    os.remove(path)
+                    return before, len(converted), target.name
+            optimized = optimize_png(data)
+        else:
+            optimized = None
+    except (OSError, ValueError, struct.error) as error:
+        print(f"  Skipping {path.name}: {error}")
+        optimized = None
+
+    if optimized is None or len(optimized) > before - MIN_SAVED_BYTES:
+        return before, before, None
+    write_atomic(path, optimized)
+    return before, len(optimized), None
+
+def write_atomic(path, data):
+    """Replace a file's content without leaving a half-written file behind"""
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def optimize_chunk(section_path, files, png_to_jpeg, jpegtran):
+    """Optimize a chunk of files from one section (runs in a worker process)"""
+    return [(file,) + optimize_file(Path(section_path) / file, png_to_jpeg, jpegtran) for file in files]
+
+def settings_digest(png_to_jpeg, jpegtran):
+    """Digest of the settings that shape an optimized file"""
+    return digest_values(MIN_SAVED_BYTES, MIN_CONVERSION_SAVING, JPEG_QUALITY, png_to_jpeg, bool(jpegtran))
+
+def optimize_images(images_path, sections=SECTIONS, jobs=None, manifest=None, png_to_jpeg=False):
+    """Optimize every original image of the given sections on a process pool
+
+    With a manifest, files already optimized with the same settings (whose
+    content hasn't changed since) are skipped. Returns
+    {section: (files, bytes before, bytes after)}.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required to optimize images (pip install Pillow)")
+
+    images_path = Path(images_path)
+    jpegtran = jpegtran_path()
+    settings = settings_digest(png_to_jpeg, jpegtran)
+
+    report = {section: [0, 0, 0] for section in sections}
+    tasks = []
+    for section in sections:
+        stale = []
+        for file in list_section_images(images_path / section):
+            path = images_path / section / file
+            if manifest is not None and is_up_to_date(manifest, f'optimize_images:{section}/{file}', digest_values(file_digest(manifest, path), settings)):
+                size = os.path.getsize(path)
+                report[section] = [report[section][0] + 1, report[section][1] + size, report[section][2] + size]
+                continue
+            if path.suffix.lower() in ('.jpg', '.jpeg', '.png'):
+                stale.append(file)
+        for start in range(0, len(stale), CHUNK_SIZE):
+            tasks.append((section, stale[start:start + CHUNK_SIZE]))
+
+    total_files = sum(len(files) for _, files in tasks)
+    print(f"Optimizing {total_files} images on {jobs or os.cpu_count()} workers ({'with' if jpegtran else 'without'} jpegtran)")
+
+    converted = {}
+    if tasks:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                executor.submit(optimize_chunk, images_path / section, files, png_to_jpeg, jpegtran): section
+                for section, files in tasks
+            }
+            for future in as_completed(futures):
+                section = futures[future]
+                for file, before, after, renamed in future.result():
+                    report[section] = [report[section][0] + 1, report[section][1] + before, report[section][2] + after]
+                    if renamed:
+                        converted[f'{section}/{file}'] = f'{section}/{renamed}'
+                    if manifest is not None:
+                        # Keyed by the optimized content, so the next run skips the file
+                        name = renamed or file
+                        digest = file_digest(manifest, images_path / section / name)
+                        record_outputs(manifest, f'optimize_images:{section}/{name}', digest_values(digest, settings), [])
+
+    if converted:
+        # Pages keep referencing the PNG names; the generators follow the aliases to the JPEGs
+        aliases = load_aliases(images_path)
+        aliases.update(converted)
+        save_aliases(images_path, aliases)
+        print(f"Converted {len(converted)} PNGs to JPEG (recorded in images/aliases.json)")
+
+    return {section: tuple(values) for section, values in report.items()}
+
+def main():
+    """Optimize the images next to this script and report the bytes saved per section"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--only', choices=SECTIONS, action='append', help='limit to a section (repeatable)')
+    parser.add_argument('--png-to-jpeg', action='store_true', help='replace PNGs without alpha by JPEGs when much smaller (lossy)')
+    args = parser.parse_args()
+
+    base_path = Path(__file__).parent
+    manifest = load_manifest(manifest_path(base_path))
+    report = optimize_images(base_path / 'images', args.only or SECTIONS, args.jobs, manifest, args.png_to_jpeg)
+    save_manifest(manifest)
+
+    print(f"{'Section':<14} {'Files':>6} {'Before':>10} {'After':>10} {'Saved':>8}")
+    for section, (files, before, after) in report.items():
+        saved = 1 - after / before if before else 0
+        print(f"{section:<14} {files:>6} {before / 1e6:>7.1f} MB {after / 1e6:>7.1f} MB {saved:>7.1%}")
+    total_before = sum(before for _, before, _ in report.values())
+    total_after = sum(after for _, _, after in report.values())
+    print(f"{'Total':<14} {'':>6} {total_before / 1e6:>7.1f} MB {total_after / 1e6:>7.1f} MB {(total_before - total_after) / 1e6:>5.1f} MB saved")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Precompress text assets so the host never compresses on the fly
+- Write .gz, .br and .zst siblings at maximum level for HTML/CSS/JS/JSON/SVG files
+- Skip encodings that don't save enough to be worth serving
+- Compress on a process pool, only files whose content changed since the last build
+- Remove siblings left behind by deleted files
+- Print a size report per file and per encoding
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import gzip
+import os
+from pathlib import Path
+
+from build_manifest import (
+    digest_values, file_digest, is_up_to_date, load_manifest, manifest_path,
+    record_outputs, recorded_outputs, save_manifest,
+)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_EXTENSIONS = ('.html', '.css', '.js', '.json', '.svg', '.xml', '.txt', '.webmanifest')
+SKIP_DIRS = {'.build', '.git', '__pycache__', 'images'}
+
+# Encodings in the order a server should prefer them: (sibling extension, settings)
+ENCODINGS = [
+    ('br', {'quality': 11}),
+    ('zst', {'level': 22}),
+    ('gz', {'level': 9}),
+]
+
+# Files below this size fit in one packet either way
+MIN_SIZE = 512
+
+# A sibling is only kept if it is at least this much smaller than the original
+MIN_SAVING = 0.1
+
+def available_encodings():
+    """Encodings whose compressor is installed (gzip always is)"""
+    missing = {'br': brotli is None, 'zst': zstandard is None}
+    return [(ext, settings) for ext, settings in ENCODINGS if not missing.get(ext)]
+
+def compress(data, ext, settings):
+    """Compress bytes with one encoding"""
+    if ext == 'gz':
+        # mtime=0 keeps the output identical for identical input
+        return gzip.compress(data, compresslevel=settings['level'], mtime=0)
+    if ext == 'br':
+        return brotli.compress(data, mode=brotli.MODE_TEXT, quality=settings['quality'])
+    if ext == 'zst':
+        return zstandard.ZstdCompressor(level=settings['level']).compress(data)
+    raise ValueError(f"Unknown encoding: {ext}")
+
+def compress_file(path, encodings):
+    """Write the worthwhile compressed siblings of one file, removing the rest
+
+    Returns {ext: compressed size} for the siblings kept.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    kept = {}
+    for ext, settings in ENCODINGS:
+        sibling = f'{path}.{ext}'
+        # Siblings of encodings that are no longer available would go stale, so they go too
+        usable = (ext, settings) in encodings and len(data) >= MIN_SIZE
+        compressed = compress(data, ext, settings) if usable else None
+        if compressed is None or len(compressed) > len(data) * (1 - MIN_SAVING):
+            if os.path.exists(sibling):
+                os.remove(sibling)
+            continue
+
+        tmp_path = sibling + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, sibling)
+        kept[ext] = len(compressed)
+    return kept
+
+def find_compressible(site_root):
+    """List the text assets under a site root, relative and sorted"""
+    found = []
+    for root, dirs, files in os.walk(site_root):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith('.'))
+        for name in files:
+            if name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                found.append(Path(root, name).relative_to(site_root).as_posix())
+    return sorted(found)
+
+def prune_orphans(site_root):
+    """Remove compressed siblings whose original was deleted"""
+    removed = 0
+    suffixes = tuple(f'.{ext}' for ext, _ in ENCODINGS)
+    for root, dirs, files in os.walk(site_root):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.startswith('.')]
+        for name in files:
+            base, ext = os.path.splitext(name)
+            if ext in suffixes and base.lower().endswith(COMPRESSIBLE_EXTENSIONS) and base not in files:
+                os.remove(os.path.join(root, name))
+                removed += 1
+    return removed
+
+def precompress_site(site_root, jobs=None, manifest=None):
+    """Precompress every text asset, skipping files unchanged since the last run
+
+    Returns {relative path: (original size, {ext: compressed size})}.
+    """
+    site_root = Path(site_root)
+    prune_orphans(site_root)
+    encodings = available_encodings()
+    settings = digest_values(encodings, MIN_SIZE, MIN_SAVING)
+
+    results = {}
+    stale = []
+    for relative in find_compressible(site_root):
+        path = site_root / relative
+        key = f'precompress:{relative}'
+        if manifest is not None:
+            if is_up_to_date(manifest, key, digest_values(file_digest(manifest, path), settings)):
+                siblings = recorded_outputs(manifest, key)
+                results[relative] = (os.path.getsize(path), {
+                    sibling.rsplit('.', 1)[1]: os.path.getsize(sibling) for sibling in siblings
+                })
+                continue
+        stale.append(relative)
+
+    print(f"Compressing {len(stale)} files ({len(results)} up to date) with {', '.join(ext for ext, _ in encodings)}")
+
+    if stale:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(compress_file, site_root / relative, encodings): relative for relative in stale}
+            for future in as_completed(futures):
+                relative = futures[future]
+                path = site_root / relative
+                kept = future.result()
+                results[relative] = (os.path.getsize(path), kept)
+                if manifest is not None:
+                    record_outputs(
+                        manifest,
+                        f'precompress:{relative}',
+                        digest_values(file_digest(manifest, path), settings),
+                        [f'{path}.{ext}' for ext in kept],
+                    )
+
+    return dict(sorted(results.items()))
+
+def main():
+    """Precompress the site's text assets and print a size report"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='ignore the build manifest and recompress everything')
+    args = parser.parse_args()
+
+    base_path = Path(__file__).parent
+    manifest = load_manifest(manifest_path(base_path))
+    if args.force:
+        manifest['entries'] = {key: entry for key, entry in manifest['entries'].items() if not key.startswith('precompress:')}
+
+    for ext, module in (('br', brotli), ('zst', zstandard)):
+        if module is None:
+            print(f"  Skipping .{ext}: install {'brotli' if ext == 'br' else 'zstandard'} to enable it")
+
+    try:
+        results = precompress_site(base_path, args.jobs, manifest)
+    finally:
+        save_manifest(manifest)
+
+    encodings = [ext for ext, _ in available_encodings()]
+    print(f"\n{'File':<50} {'Original':>10} " + ' '.join(f'{ext:>10}' for ext in encodings))
+    totals = {ext: 0 for ext in encodings}
+    total_original = 0
+    for relative, (size, kept) in results.items():
+        total_original += size
+        cells = []
+        for ext in encodings:
+            # Clients without a sibling get the original, so count it at full size
+            totals[ext] += kept.get(ext, size)
+            cells.append(f"{kept[ext] / 1024:>7.1f} KB" if ext in kept else f"{'-':>10}")
+        print(f"{relative:<50} {size / 1024:>7.1f} KB " + ' '.join(cells))
+
+    print(f"{'Total':<50} {total_original / 1024:>7.1f} KB " + ' '.join(f"{totals[ext] / 1024:>7.1f} KB" for ext in encodings))
+
+if __name__ == '__main__':
+    main()
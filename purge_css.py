@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Purge unused rules from the Squarespace stylesheets
+- Collect the tags, classes and ids used by the generated pages (plus words in js/)
+- Drop rules whose selectors can't match, recursing into @media/@supports
+- Keep @font-face and @keyframes only while a kept rule still references them
+- Write shared (or per-page) reduced bundles and point the pages at them
+"""
+
+import argparse
+import os
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+
+from build_manifest import load_manifest, manifest_path, refresh_output, save_manifest
+from fingerprint_assets import site_pages
+
+PAGES = ['index.html', 'projects.html', 'photoshoots.html', 'press.html', 'press-loans.html', '404.html']
+TARGET_STYLESHEETS = ['css/squarespace-site.css', 'css/squarespace-static.css']
+PURGED_SUFFIX = '.purged'
+
+# Names that only appear at runtime; entries wrapped in slashes are regexes
+DEFAULT_SAFELIST = ['active', '/^wf-/']
+
+# At-rules whose blocks contain ordinary rules and are purged recursively
+CONDITIONAL_AT_RULES = ('@media', '@supports', '@container', '@layer', '@document', '@-moz-document')
+
+TOKEN_PATTERN = re.compile(r'([.#]?)((?:\\.|[\w-])+)')
+PSEUDO_PATTERN = re.compile(r'::?[\w-]+')
+ATTRIBUTE_SELECTOR_PATTERN = re.compile(r'\[[^\]]*\]')
+FONT_FAMILY_PATTERN = re.compile(r'font-family\s*:\s*([^;]+)', re.I)
+KEYFRAMES_NAME_PATTERN = re.compile(r'^@(?:-[\w]+-)?keyframes\s+(.+)$', re.I)
+
+class UsageCollector(HTMLParser):
+    """Collect the tag names, classes and ids present in a page
+
+    With a limit, only the first `limit` elements of <body> are counted.
+    """
+
+    def __init__(self, limit=None):
+        super().__init__(convert_charrefs=True)
+        self.tags = set()
+        self.classes = set()
+        self.ids = set()
+        self.stylesheets = []
+        self.limit = limit
+        self.body_elements = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.body_elements is not None:
+            self.body_elements += 1
+            if self.limit is not None and self.body_elements > self.limit:
+                return
+        elif tag.lower() == 'body':
+            self.body_elements = 0
+
+        self.tags.add(tag.lower())
+        attrs = dict(attrs)
+        self.classes.update((attrs.get('class') or '').split())
+        if attrs.get('id'):
+            self.ids.add(attrs['id'])
+        if tag == 'link' and 'stylesheet' in (attrs.get('rel') or '').lower().split() and attrs.get('href'):
+            self.stylesheets.append(attrs['href'])
+
+def collect_usage(html, limit=None):
+    """Get the tags/classes/ids used by a page and the stylesheets it links"""
+    collector = UsageCollector(limit)
+    collector.feed(html)
+    collector.close()
+    return {
+        'tags': collector.tags,
+        'classes': collector.classes,
+        'ids': collector.ids,
+        'stylesheets': collector.stylesheets,
+    }
+
+def collect_script_words(site_root):
+    """Words in js/ files, so classes toggled by scripts count as used"""
+    words = set()
+    js_dir = Path(site_root) / 'js'
+    if js_dir.exists():
+        for path in sorted(js_dir.glob('*.js')):
+            with open(path, 'r', encoding='utf-8') as f:
+                words.update(re.findall(r'[\w-]+', f.read()))
+    return words
+
+def compile_safelist(entries):
+    """Turn safelist entries into predicates: '/regex/' or an exact name"""
+    exact = {entry for entry in entries if not (entry.startswith('/') and entry.endswith('/') and len(entry) > 1)}
+    patterns = [re.compile(entry[1:-1]) for entry in entries if entry not in exact]
+    return lambda name: name in exact or any(pattern.search(name) for pattern in patterns)
+
+def strip_comments(css):
+    """Remove /* */ comments, leaving string contents untouched"""
+    out = []
+    i = 0
+    quote = None
+    while i < len(css):
+        char = css[i]
+        if quote:
+            out.append(char)
+            if char == '\\':
+                out.append(css[i + 1:i + 2])
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+            out.append(char)
+        elif css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            i = len(css) if end == -1 else end + 2
+            continue
+        else:
+            out.append(char)
+        i += 1
+    return ''.join(out)
+
+def split_statements(css):
+    """Split comment-free CSS into top-level (prelude, block) pairs; block is None for ';' statements"""
+    statements = []
+    i = 0
+    start = 0
+    depth = 0
+    quote = None
+    block_start = None
+    paren = 0
+    while i < len(css):
+        char = css[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '(':
+            paren += 1
+        elif char == ')':
+            paren = max(0, paren - 1)
+        elif char == '{' and not paren:
+            if depth == 0:
+                block_start = i
+            depth += 1
+        elif char == '}' and not paren:
+            depth -= 1
+            if depth == 0:
+                statements.append((css[start:block_start].strip(), css[block_start + 1:i]))
+                start = i + 1
+            depth = max(depth, 0)
+        elif char == ';' and depth == 0 and not paren:
+            statements.append((css[start:i].strip(), None))
+            start = i + 1
+        i += 1
+
+    if css[start:].strip():
+        statements.append((css[start:].strip(), None))
+    return statements
+
+def split_selectors(prelude):
+    """Split a selector list on its top-level commas, not those inside :is(), [attr="a,b"] or strings"""
+    selectors = []
+    start = 0
+    depth = 0
+    quote = None
+    i = 0
+    while i < len(prelude):
+        char = prelude[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '\\':
+            i += 1
+        elif char in '([':
+            depth += 1
+        elif char in ')]':
+            depth = max(0, depth - 1)
+        elif char == ',' and not depth:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+        i += 1
+
+    selectors.append(prelude[start:].strip())
+    return [selector for selector in selectors if selector]
+
+def remove_parenthesized(selector):
+    """Drop the arguments of functional pseudo-classes like :not(...) and :nth-child(...)"""
+    out = []
+    depth = 0
+    for char in selector:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(0, depth - 1)
+        elif depth == 0:
+            out.append(char)
+    return ''.join(out)
+
+def selector_is_used(selector, usage, is_safe):
+    """Check that every class, id and tag named by a selector exists on the pages"""
+    simplified = ATTRIBUTE_SELECTOR_PATTERN.sub('', selector)
+    simplified = PSEUDO_PATTERN.sub('', remove_parenthesized(simplified))
+
+    for prefix, name in TOKEN_PATTERN.findall(simplified):
+        name = re.sub(r'\\(.)', r'\1', name)
+        if is_safe(name):
+            continue
+        if prefix == '.':
+            if name not in usage['classes']:
+                return False
+        elif prefix == '#':
+            if name not in usage['ids']:
+                return False
+        elif not name[0].isdigit() and name.lower() not in usage['tags']:
+            return False
+    return True
+
+def purge_statements(statements, usage, is_safe):
+    """Purge a list of statements, returning the kept CSS text pieces
+
+    @font-face and @keyframes are deferred: they are resolved by the caller
+    once every kept rule is known.
+    """
+    kept = []
+    for prelude, block in statements:
+        if block is None:
+            kept.append(('raw', f'{prelude};'))
+            continue
+
+        lowered = prelude.lower()
+        if lowered.startswith(CONDITIONAL_AT_RULES):
+            children = purge_statements(split_statements(block), usage, is_safe)
+            if children:
+                kept.append(('group', prelude, children))
+        elif KEYFRAMES_NAME_PATTERN.match(prelude):
+            kept.append(('keyframes', prelude, block))
+        elif lowered.startswith('@font-face'):
+            kept.append(('font-face', prelude, block))
+        elif lowered.startswith('@'):
+            kept.append(('raw', f'{prelude}{{{block}}}'))
+        else:
+            selectors = split_selectors(prelude)
+            used = [s for s in selectors if selector_is_used(s, usage, is_safe)]
+            if used:
+                kept.append(('rule', ','.join(used), block))
+    return kept
+
+def collect_rule_bodies(nodes):
+    """Concatenate the declaration blocks of every kept rule"""
+    bodies = []
+    for node in nodes:
+        if node[0] == 'rule':
+            bodies.append(node[2])
+        elif node[0] == 'group':
+            bodies.append(collect_rule_bodies(node[2]))
+    return '\n'.join(bodies)
+
+def serialize(nodes, referenced_text):
+    """Write kept nodes back to CSS, dropping unreferenced fonts/keyframes and empty groups"""
+    out = []
+    for node in nodes:
+        kind = node[0]
+        if kind == 'raw':
+            out.append(node[1])
+        elif kind == 'rule':
+            out.append(f'{node[1]}{{{node[2]}}}')
+        elif kind == 'group':
+            inner = serialize(node[2], referenced_text)
+            if inner:
+                out.append(f'{node[1]}{{{inner}}}')
+        elif kind == 'keyframes':
+            name = KEYFRAMES_NAME_PATTERN.match(node[1]).group(1).strip().strip('"\'')
+            if re.search(r'(?<![\w-])' + re.escape(name) + r'(?![\w-])', referenced_text):
+                out.append(f'{node[1]}{{{node[2]}}}')
+        elif kind == 'font-face':
+            family = FONT_FAMILY_PATTERN.search(node[2])
+            name = family.group(1).strip().strip('"\'').lower() if family else ''
+            if not name or name in referenced_text.lower():
+                out.append(f'{node[1]}{{{node[2]}}}')
+    return ''.join(out)
+
+def purge_css(css, usage, is_safe):
+    """Purge a stylesheet against the given usage"""
+    nodes = purge_statements(split_statements(strip_comments(css)), usage, is_safe)
+    return serialize(nodes, collect_rule_bodies(nodes))
+
+def merge_usage(usages):
+    """Union several pages' usage sets"""
+    merged = {'tags': set(), 'classes': set(), 'ids': set()}
+    for usage in usages:
+        for key in merged:
+            merged[key] |= usage[key]
+    return merged
+
+def resolve_href(href, page_path, site_root):
+    """Map a stylesheet href on a page to a path relative to the site root"""
+    path = href.split('?', 1)[0].split('#', 1)[0]
+    if '://' in path or path.startswith('//'):
+        return None
+    target = Path(site_root) / path.lstrip('/') if path.startswith('/') else page_path.parent / path
+    try:
+        return Path(os.path.normpath(target)).relative_to(Path(site_root).resolve()).as_posix()
+    except ValueError:
+        return None
+
+def purged_name(stylesheet, page=None):
+    """squarespace-site.css -> squarespace-site.purged.css (or .<page>.purged.css per page)"""
+    stem, ext = os.path.splitext(stylesheet)
+    page_part = f'.{Path(page).stem}' if page else ''
+    return f'{stem}{page_part}{PURGED_SUFFIX}{ext}'
+
+def relink_href(href, filename):
+    """Swap the file name at the end of an href, keeping its directory and query"""
+    path, sep, rest = href.partition('?')
+    return path.rsplit('/', 1)[0] + '/' + filename + sep + rest if '/' in path else filename + sep + rest
+
+def purge_site(site_root, pages=PAGES, targets=TARGET_STYLESHEETS, safelist=DEFAULT_SAFELIST, per_page=False, manifest=None):
+    """Purge the target stylesheets against the pages that link them and relink the pages
+
+    Returns [(output, bytes before, bytes after)].
+    """
+    site_root = Path(site_root).resolve()
+    pages = site_pages(site_root, pages)
+    script_words = collect_script_words(site_root)
+    is_safe = compile_safelist(list(safelist))
+
+    # Pages relinked by an earlier run still count as using the original stylesheet
+    previous_bundles = {purged_name(target, page): target for target in targets for page in [None] + list(pages)}
+
+    page_usage = {}
+    page_html = {}
+    for page in pages:
+        page_path = site_root / page
+        if not page_path.exists():
+            continue
+        with open(page_path, 'r', encoding='utf-8') as f:
+            page_html[page] = f.read()
+        usage = collect_usage(page_html[page])
+        usage['classes'] |= script_words
+        usage['ids'] |= script_words
+        usage['links'] = {
+            previous_bundles.get(path, path): href
+            for href in usage['stylesheets']
+            for path in [resolve_href(href, page_path, site_root)]
+        }
+        page_usage[page] = usage
+
+    # Work out which bundle each page should link for each target
+    bundles = {}
+    for target in targets:
+        users = [page for page, usage in page_usage.items() if target in usage['links']]
+        if not users:
+            continue
+        if per_page:
+            for page in users:
+                bundles[(target, page)] = [page]
+        else:
+            for page in users:
+                bundles[(target, page)] = users
+
+    results = []
+    written = {}
+    for (target, page), users in sorted(bundles.items()):
+        output = purged_name(target, page if per_page else None)
+        if output not in written:
+            with open(site_root / target, 'r', encoding='utf-8') as f:
+                css = f.read()
+            purged = purge_css(css, merge_usage(page_usage[user] for user in users), is_safe)
+            with open(site_root / output, 'w', encoding='utf-8') as f:
+                f.write(purged)
+            written[output] = True
+            results.append((output, len(css.encode('utf-8')), len(purged.encode('utf-8'))))
+
+        # Point the page at the bundle, keeping the href's relative/absolute style
+        href = page_usage[page]['links'][target]
+        new_href = relink_href(href, os.path.basename(output))
+        page_html[page] = page_html[page].replace(f'href="{href}"', f'href="{new_href}"')
+
+    for page, html in page_html.items():
+        page_path = site_root / page
+        with open(page_path, 'r', encoding='utf-8') as f:
+            current = f.read()
+        if current != html:
+            with open(page_path, 'w', encoding='utf-8') as f:
+                f.write(html)
+            if manifest is not None:
+                refresh_output(manifest, page_path)
+
+    return results
+
+def main():
+    """Purge the Squarespace stylesheets for every page"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--per-page', action='store_true', help='write one bundle per page instead of a shared one')
+    parser.add_argument('--safelist', action='append', default=[], help="extra name or /regex/ to always keep (repeatable)")
+    parser.add_argument('--target', action='append', help='stylesheet to purge, relative to the site root (repeatable)')
+    args = parser.parse_args()
+
+    base_path = Path(__file__).parent
+    manifest = load_manifest(manifest_path(base_path))
+
+    results = purge_site(
+        base_path,
+        PAGES,
+        args.target or TARGET_STYLESHEETS,
+        DEFAULT_SAFELIST + args.safelist,
+        args.per_page,
+        manifest,
+    )
+    save_manifest(manifest)
+
+    for output, before, after in results:
+        print(f"{output}: {before / 1024:.0f} KB -> {after / 1024:.0f} KB ({100 - after * 100 / before:.0f}% removed)")
+    if not results:
+        print("No pages link the target stylesheets")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Static server for the built site, for local testing and load tests
+- Serve many keep-alive connections at once on asyncio, sending file bodies with sendfile
+- ETag/Last-Modified validators with 304 responses, and single byte ranges (206/416, If-Range)
+- Serve the .br/.zst/.gz siblings written by precompress.py to clients that accept them
+- Fingerprinted assets are served immutable, pages revalidated, missing paths get 404.html
+- /img/<section>/<file>?w=&fmt= resizes images on demand through image_resize.py's disk cache
+"""
+
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+import argparse
+import asyncio
+import mimetypes
+import os
+import posixpath
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from fingerprint_assets import DEFAULT_CACHE_CONTROL, HTML_CACHE_CONTROL, IMMUTABLE_CACHE_CONTROL, is_fingerprinted
+from image_pipeline import SECTIONS
+from image_resize import DEFAULT_CACHE_BYTES, FORMATS, close_resize_cache, get_variant, open_resize_cache, parse_variant
+from precompress import COMPRESSIBLE_EXTENSIONS, ENCODINGS
+from service_worker import SERVICE_WORKER_NAME
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+SERVER_NAME = 'maria-static'
+
+# Content-Encoding token of each precompressed sibling extension
+CONTENT_ENCODINGS = {'br': 'br', 'zst': 'zstd', 'gz': 'gzip'}
+
+# Never served: build caches and tooling, which live next to the site in the repo root
+HIDDEN_DIRS = {'.build', '.git', '__pycache__', 'benchmarks', 'tests'}
+HIDDEN_EXTENSIONS = ('.py', '.pyc', '.jsonl')
+
+NOT_FOUND_PAGE = '404.html'
+RESIZE_PREFIX = '/img/'
+MAX_HEADER_SIZE = 1 << 16
+KEEP_ALIVE_TIMEOUT = 15
+BACKLOG = 1024
+
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/avif', '.avif')
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+mimetypes.add_type('text/javascript', '.js')
+
+def content_type(path):
+    """Content-Type of a file, with a charset for text"""
+    kind = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+    if kind.startswith('text/') or kind in ('application/json', 'application/manifest+json', 'image/svg+xml'):
+        kind += '; charset=utf-8'
+    return kind
+
+def cache_control(path):
+    """Cache-Control for a file: hashed names never change, pages always revalidate"""
+    if is_fingerprinted(path.name):
+        return IMMUTABLE_CACHE_CONTROL
+    if path.suffix == '.html' or path.name == SERVICE_WORKER_NAME:
+        return HTML_CACHE_CONTROL
+    return DEFAULT_CACHE_CONTROL
+
+def resolve_path(site_root, target):
+    """Map a request target to a file under the site root, or None"""
+    path = posixpath.normpath(unquote(urlsplit(target).path))
+    parts = [part for part in path.split('/') if part]
+    if '\x00' in path or any(part.startswith('.') or part in HIDDEN_DIRS for part in parts):
+        return None
+
+    if parts and parts[-1].lower().endswith(HIDDEN_EXTENSIONS):
+        return None
+
+    file = site_root.joinpath(*parts)
+    if file.is_dir():
+        file = file / 'index.html'
+    return file if file.is_file() else None
+
+def accepted_encodings(header):
+    """Parse Accept-Encoding into {token: q}"""
+    accepted = {}
+    for item in header.split(','):
+        token, _, params = item.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[token] = q
+    return accepted
+
+def choose_variant(file, headers):
+    """Pick the best precompressed sibling the client accepts: (path, stat, encoding or None)"""
+    if file.suffix.lower() in COMPRESSIBLE_EXTENSIONS and 'accept-encoding' in headers:
+        accepted = accepted_encodings(headers['accept-encoding'])
+        for ext, _ in ENCODINGS:
+            encoding = CONTENT_ENCODINGS[ext]
+            if accepted.get(encoding, accepted.get('*', 0)) <= 0:
+                continue
+            sibling = file.with_name(f'{file.name}.{ext}')
+            try:
+                return sibling, sibling.stat(), encoding
+            except OSError:
+                continue
+    return file, file.stat(), None
+
+def entity_tag(stat, encoding):
+    """Validator of one representation: changes with the file and differs per encoding"""
+    suffix = f'-{encoding}' if encoding else ''
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{suffix}"'
+
+def is_not_modified(headers, etag, mtime):
+    """Check the client's cached copy against the validators (If-None-Match wins)"""
+    if 'if-none-match' in headers:
+        tags = [tag.strip() for tag in headers['if-none-match'].split(',')]
+        return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
+    if 'if-modified-since' in headers:
+        try:
+            return int(mtime) <= parsedate_to_datetime(headers['if-modified-since']).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def parse_range(header, size):
+    """Parse a Range header: (start, end) inclusive, None to send everything, or False if unsatisfiable
+
+    Only a single byte range is supported; anything else gets the whole file.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return False
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+def range_applies(headers, etag, mtime):
+    """Check If-Range: a range only applies to the representation the client already has"""
+    if 'if-range' not in headers:
+        return True
+    validator = headers['if-range'].strip()
+    if validator.startswith('"') or validator.startswith('W/'):
+        return validator == etag
+    try:
+        return int(mtime) == parsedate_to_datetime(validator).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+async def read_request(reader):
+    """Read a request head: (method, target, version, headers), or None when the client is done"""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise ValueError("Request head too large")
+
+    lines = head.decode('latin-1').split('\r\n')
+    parts = lines[0].split()
+    if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+        raise ValueError(f"Malformed request line: {lines[0]!r}")
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return parts[0], parts[1], parts[2], headers
+
+def response_head(status, headers):
+    """Status line and headers of a response"""
+    lines = [f'HTTP/1.1 {status.value} {status.phrase}', f'Server: {SERVER_NAME}', f'Date: {formatdate(usegmt=True)}']
+    lines += [f'{name}: {value}' for name, value in headers.items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+async def send_error(writer, status, keep_alive, extra=None):
+    """Send a short plain-text error response"""
+    body = f'{status.value} {status.phrase}\n'.encode()
+    headers = {'Content-Type': 'text/plain; charset=utf-8', 'Content-Length': len(body)}
+    headers.update(extra or {})
+    if not keep_alive:
+        headers['Connection'] = 'close'
+    writer.write(response_head(status, headers) + body)
+    await writer.drain()
+    return status, len(body)
+
+async def send_file(writer, status, headers, path, offset, count, head_only):
+    """Send a response whose body is a slice of a file, zero-copy where the platform allows"""
+    if head_only or not count:
+        writer.write(response_head(status, headers))
+        await writer.drain()
+        return status, 0
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        # Removed since it was looked up (a resized variant evicted by the cache); the next request rebuilds it
+        return await send_error(writer, HTTPStatus.SERVICE_UNAVAILABLE, 'Connection' not in headers, {'Retry-After': 1})
+    with f:
+        writer.write(response_head(status, headers))
+        await writer.drain()
+        await asyncio.get_running_loop().sendfile(writer.transport, f, offset, count)
+    return status, count
+
+async def serve_file(writer, site_root, method, target, headers, keep_alive):
+    """Answer one GET or HEAD request"""
+    file = resolve_path(site_root, target)
+    status = HTTPStatus.OK
+    if file is None:
+        file = site_root / NOT_FOUND_PAGE
+        if not file.is_file():
+            return await send_error(writer, HTTPStatus.NOT_FOUND, keep_alive)
+        status = HTTPStatus.NOT_FOUND
+
+    path, stat, encoding = choose_variant(file, headers)
+    etag = entity_tag(stat, encoding)
+    response = {
+        'Content-Type': content_type(file),
+        'Cache-Control': cache_control(file) if status == HTTPStatus.OK else HTML_CACHE_CONTROL,
+        'Last-Modified': formatdate(stat.st_mtime, usegmt=True),
+        'ETag': etag,
+        'Accept-Ranges': 'bytes',
+    }
+    if file.suffix.lower() in COMPRESSIBLE_EXTENSIONS:
+        response['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if not keep_alive:
+        response['Connection'] = 'close'
+
+    size = stat.st_size
+    if status == HTTPStatus.OK:
+        if is_not_modified(headers, etag, stat.st_mtime):
+            del response['Content-Type']
+            return await send_file(writer, HTTPStatus.NOT_MODIFIED, response, path, 0, 0, True)
+
+        if 'range' in headers and range_applies(headers, etag, stat.st_mtime):
+            byte_range = parse_range(headers['range'], size)
+            if byte_range is False:
+                return await send_error(writer, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, keep_alive, {'Content-Range': f'bytes */{size}'})
+            if byte_range is not None:
+                start, end = byte_range
+                response['Content-Range'] = f'bytes {start}-{end}/{size}'
+                response['Content-Length'] = end - start + 1
+                return await send_file(writer, HTTPStatus.PARTIAL_CONTENT, response, path, start, end - start + 1, method == 'HEAD')
+
+    response['Content-Length'] = size
+    return await send_file(writer, status, response, path, 0, size, method == 'HEAD')
+
+async def serve_resized(writer, site_root, resize_cache, method, target, headers, keep_alive):
+    """Answer a GET or HEAD for /img/<section>/<file>?w=&fmt= with a cached variant"""
+    url = urlsplit(target)
+    parts = unquote(url.path)[len(RESIZE_PREFIX):].split('/')
+    if len(parts) != 2 or parts[0] not in SECTIONS or not parts[1] or parts[1].startswith('.'):
+        return await send_error(writer, HTTPStatus.NOT_FOUND, keep_alive)
+    source = site_root / 'images' / parts[0] / parts[1]
+    if not source.is_file():
+        return await send_error(writer, HTTPStatus.NOT_FOUND, keep_alive)
+    variant = parse_variant(parse_qs(url.query), source.name)
+    if variant is None:
+        return await send_error(writer, HTTPStatus.BAD_REQUEST, keep_alive)
+    if resize_cache is None or resize_cache['pool'] is None:
+        # Resizing is off or Pillow isn't installed
+        return await send_error(writer, HTTPStatus.NOT_IMPLEMENTED, keep_alive)
+
+    width, fmt = variant
+    try:
+        path = await get_variant(resize_cache, source, width, fmt)
+    except OSError:
+        return await send_error(writer, HTTPStatus.INTERNAL_SERVER_ERROR, keep_alive)
+    kind = FORMATS[fmt][1]
+    if path is None:
+        # Not resizable (animated): the original stands in for every variant
+        path, kind = source, content_type(source)
+
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        # Evicted between lookup and send; the next request rebuilds it
+        return await send_error(writer, HTTPStatus.SERVICE_UNAVAILABLE, keep_alive, {'Retry-After': 1})
+    # Cached variants are named by content (their mtime tracks use), so validate on the name and the source
+    mtime = source.stat().st_mtime
+    etag = f'"{Path(path).stem}"' if path != source else entity_tag(source.stat(), None)
+    response = {
+        'Content-Type': kind,
+        'Cache-Control': DEFAULT_CACHE_CONTROL,
+        'Last-Modified': formatdate(mtime, usegmt=True),
+        'ETag': etag,
+    }
+    if not keep_alive:
+        response['Connection'] = 'close'
+    if is_not_modified(headers, etag, mtime):
+        del response['Content-Type']
+        return await send_file(writer, HTTPStatus.NOT_MODIFIED, response, path, 0, 0, True)
+    response['Content-Length'] = size
+    return await send_file(writer, HTTPStatus.OK, response, path, 0, size, method == 'HEAD')
+
+async def handle_connection(reader, writer, site_root, quiet, resize_cache=None):
+    """Serve requests on one connection until the client or the server closes it"""
+    peer = writer.get_extra_info('peername')
+    client = peer[0] if peer else '-'
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except ValueError:
+                await send_error(writer, HTTPStatus.BAD_REQUEST, False)
+                break
+            if request is None:
+                break
+
+            method, target, version, headers = request
+            connection = headers.get('connection', '').lower()
+            keep_alive = 'close' not in connection if version == 'HTTP/1.1' else 'keep-alive' in connection
+
+            if method in ('GET', 'HEAD') and target.startswith(RESIZE_PREFIX):
+                status, sent = await serve_resized(writer, site_root, resize_cache, method, target, headers, keep_alive)
+            elif method in ('GET', 'HEAD'):
+                status, sent = await serve_file(writer, site_root, method, target, headers, keep_alive)
+            else:
+                status, sent = await send_error(writer, HTTPStatus.METHOD_NOT_ALLOWED, keep_alive, {'Allow': 'GET, HEAD'})
+            if not quiet:
+                print(f'{client} "{method} {target} {version}" {status.value} {sent}')
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+async def start_server(site_root, host=DEFAULT_HOST, port=DEFAULT_PORT, quiet=False, resize_cache=None):
+    """Start serving a site root; returns the asyncio server"""
+    site_root = Path(site_root).resolve()
+
+    async def handle(reader, writer):
+        await handle_connection(reader, writer, site_root, quiet, resize_cache)
+
+    return await asyncio.start_server(handle, host, port, limit=MAX_HEADER_SIZE, backlog=BACKLOG)
+
+async def serve(site_root, host, port, quiet, resize_cache):
+    """Serve a site root until interrupted"""
+    server = await start_server(site_root, host, port, quiet, resize_cache)
+    address = server.sockets[0].getsockname()
+    print(f"Serving {Path(site_root).resolve()} at http://{address[0]}:{address[1]}/ (Ctrl+C to stop)")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    """Serve the built site"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--root', default=str(Path(__file__).parent), help='site root to serve (default: %(default)s)')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on (default: %(default)s)')
+    parser.add_argument('--quiet', action='store_true', help='do not log requests (for load tests)')
+    parser.add_argument('--no-resize', action='store_true', help='turn off the /img/ resizing route')
+    parser.add_argument('--resize-cache-mb', type=int, default=DEFAULT_CACHE_BYTES >> 20, help='size limit of the resized image cache (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, default=None, help='resize worker processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    resize_cache = None if args.no_resize else open_resize_cache(args.root, args.resize_cache_mb << 20, args.jobs)
+    try:
+        asyncio.run(serve(args.root, args.host, args.port, args.quiet, resize_cache))
+    except KeyboardInterrupt:
+        print("\nStopped")
+    finally:
+        if resize_cache is not None:
+            close_resize_cache(resize_cache)
+
+if __name__ == '__main__':
+    main()
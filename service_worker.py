@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Generate the site's service worker (sw.js) from the built pages
+- Precache the pages and the CSS/JS they load, each with its content digest as revision,
+  so a new build refetches only the entries whose content changed
+- Serve precached files cache-first, and images stale-while-revalidate from a runtime
+  cache capped at a number of entries with least-recently-used eviction
+- Registered from js/navigation.js; runs after fingerprinting and minification
+"""
+
+import json
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from build_manifest import digest_values, file_digest, is_up_to_date, load_manifest, manifest_path, record_outputs, save_manifest
+from fingerprint_assets import ATTRIBUTE_PATTERN, HASH_LENGTH, HEADERS_NAME, HTML_CACHE_CONTROL, PAGES, SERVICE_WORKER_NAME, site_pages
+
+PRECACHE_EXTENSIONS = ('.css', '.js')
+
+# Runtime image cache: entries kept before the least recently used are evicted
+MAX_IMAGE_ENTRIES = 200
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.svg')
+
+SERVICE_WORKER_TEMPLATE = '''// Generated by service_worker.py - do not edit
+const PRECACHE = __PRECACHE__;
+const PRECACHE_NAME = 'precache';
+const IMAGE_CACHE_NAME = 'images';
+const MAX_IMAGE_ENTRIES = __MAX_IMAGES__;
+const IMAGE_PATTERN = __IMAGE_PATTERN__;
+const HASHED_PATTERN = /\\.[0-9a-f]{__HASH_LENGTH__}\\.[a-z0-9]+$/i;
+
+// Precached files are stored under url?__rev=<revision>, so an unchanged file keeps its entry across builds
+const scope = new URL(self.registration.scope);
+const precacheKeys = new Map(PRECACHE.map(([url, revision]) => {
+  const absolute = new URL(url, scope).href;
+  return [absolute, absolute + '?__rev=' + revision];
+}));
+
+self.addEventListener('install', event => {
+  event.waitUntil(caches.open(PRECACHE_NAME).then(cache => Promise.all(
+    Array.from(precacheKeys, ([url, key]) => cache.match(key).then(cached => {
+      if (cached) {
+        return;
+      }
+      return fetch(url, { cache: 'reload' }).then(response => {
+        if (!response.ok) {
+          throw new Error('Precache failed for ' + url);
+        }
+        return cache.put(key, response);
+      });
+    }))
+  )).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+  const current = new Set(precacheKeys.values());
+  event.waitUntil(caches.open(PRECACHE_NAME)
+    .then(cache => cache.keys().then(requests => Promise.all(
+      requests.filter(request => !current.has(request.url)).map(request => cache.delete(request))
+    )))
+    .then(() => caches.keys())
+    .then(names => Promise.all(
+      names.filter(name => name !== PRECACHE_NAME && name !== IMAGE_CACHE_NAME).map(name => caches.delete(name))
+    ))
+    .then(() => self.clients.claim()));
+});
+
+function precacheKey(request) {
+  const url = new URL(request.url);
+  url.search = '';
+  url.hash = '';
+  if (request.mode === 'navigate' && url.pathname.endsWith('/')) {
+    url.pathname += 'index.html';
+  }
+  return precacheKeys.get(url.href);
+}
+
+function trimImages(cache) {
+  return cache.keys().then(requests => Promise.all(
+    requests.slice(0, Math.max(0, requests.length - MAX_IMAGE_ENTRIES)).map(request => cache.delete(request))
+  ));
+}
+
+// Re-inserting an entry moves it to the end of the cache's key order, which keeps the order least recently used first
+function storeImage(cache, request, response) {
+  return cache.delete(request)
+    .then(() => cache.put(request, response))
+    .then(() => trimImages(cache));
+}
+
+function serveImage(event) {
+  const request = event.request;
+  event.respondWith(caches.open(IMAGE_CACHE_NAME).then(cache => cache.match(request).then(cached => {
+    const update = fetch(request).then(response => {
+      if (response.ok) {
+        event.waitUntil(storeImage(cache, request, response.clone()));
+      }
+      return response;
+    });
+    if (!cached) {
+      return update;
+    }
+    if (HASHED_PATTERN.test(new URL(request.url).pathname)) {
+      // Hashed names never change: only refresh the entry's place in the LRU order
+      event.waitUntil(storeImage(cache, request, cached.clone()));
+    } else {
+      event.waitUntil(update.catch(() => undefined));
+    }
+    return cached;
+  })));
+}
+
+self.addEventListener('fetch', event => {
+  const request = event.request;
+  if (request.method !== 'GET' || new URL(request.url).origin !== scope.origin) {
+    return;
+  }
+
+  const key = precacheKey(request);
+  if (key) {
+    event.respondWith(caches.open(PRECACHE_NAME)
+      .then(cache => cache.match(key))
+      .then(cached => cached || fetch(request)));
+  } else if (request.destination === 'image' || IMAGE_PATTERN.test(new URL(request.url).pathname)) {
+    serveImage(event);
+  }
+});
+'''
+
+def page_assets(site_root, page_path):
+    """Local CSS/JS files a page loads, as site-relative paths"""
+    with open(page_path, 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    assets = []
+    for match in ATTRIBUTE_PATTERN.finditer(html):
+        parts = urlsplit(match.group(2))
+        if parts.scheme or parts.netloc or not parts.path.lower().endswith(PRECACHE_EXTENSIONS):
+            continue
+        path = unquote(parts.path)
+        target = (site_root / path.lstrip('/')) if path.startswith('/') else (page_path.parent / path)
+        target = target.resolve()
+        if target.is_file() and target.is_relative_to(site_root):
+            assets.append(target.relative_to(site_root).as_posix())
+    return assets
+
+def precache_entries(site_root, pages, manifest):
+    """[url, revision] for every page and the assets they load, in a stable order"""
+    files = []
+    for page in pages:
+        page_path = site_root / page
+        if not page_path.exists():
+            continue
+        files.append(page)
+        files.extend(page_assets(site_root, page_path))
+
+    entries = []
+    for file in sorted(set(files)):
+        entries.append([f'./{file}', file_digest(manifest, site_root / file)[:HASH_LENGTH]])
+    return entries
+
+def render_service_worker(entries):
+    """Fill the service worker template"""
+    image_pattern = '/\\.(' + '|'.join(ext[1:] for ext in IMAGE_EXTENSIONS) + ')$/i'
+    return (SERVICE_WORKER_TEMPLATE
+            .replace('__PRECACHE__', json.dumps(entries, separators=(',', ':')))
+            .replace('__MAX_IMAGES__', str(MAX_IMAGE_ENTRIES))
+            .replace('__IMAGE_PATTERN__', image_pattern)
+            .replace('__HASH_LENGTH__', str(HASH_LENGTH)))
+
+def add_header_rule(site_root):
+    """Make hosts that read _headers revalidate the service worker on every check"""
+    headers_path = site_root / HEADERS_NAME
+    rule = f'/{SERVICE_WORKER_NAME}\n  Cache-Control: {HTML_CACHE_CONTROL}\n'
+    text = headers_path.read_text(encoding='utf-8') if headers_path.exists() else ''
+    if f'/{SERVICE_WORKER_NAME}\n' not in text:
+        with open(headers_path, 'a', encoding='utf-8') as f:
+            f.write(rule)
+
+def build_service_worker(site_root, pages=PAGES, manifest=None):
+    """Write sw.js for the built pages; returns the precache entries"""
+    site_root = Path(site_root).resolve()
+    manifest = manifest if manifest is not None else load_manifest(manifest_path(site_root))
+    entries = precache_entries(site_root, site_pages(site_root, pages), manifest)
+    output_path = site_root / SERVICE_WORKER_NAME
+
+    key = f'service_worker:{SERVICE_WORKER_NAME}'
+    inputs = digest_values(file_digest(manifest, __file__), entries)
+    if not is_up_to_date(manifest, key, inputs):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(render_service_worker(entries))
+        record_outputs(manifest, key, inputs, [output_path])
+    add_header_rule(site_root)
+    return entries
+
+def main():
+    """Generate sw.js for the site next to this script"""
+    base_path = Path(__file__).parent
+    manifest = load_manifest(manifest_path(base_path))
+    entries = build_service_worker(base_path, manifest=manifest)
+    save_manifest(manifest)
+
+    print(f"Wrote {SERVICE_WORKER_NAME} precaching {len(entries)} files:")
+    for url, revision in entries:
+        print(f"  {url} ({revision})")
+
+if __name__ == '__main__':
+    main()
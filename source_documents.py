@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Shared loader for the Squarespace source pages (MARIA_DATA/<section>/index.html)
+- Stream the text blocks and image URLs the generators need out of each page,
+  without building a tree (or parse once with lxml/html.parser in tree mode)
+- Cache those records in .build/documents/<sha256>.pickle so unchanged pages aren't parsed again
+- Hand the parsed tree to cleanup_squarespace, the one pass that edits it
+"""
+
+from html.parser import HTMLParser
+import argparse
+import hashlib
+import os
+import pickle
+import time
+
+from bs4 import BeautifulSoup
+
+from build_manifest import BUILD_DIR, file_digest
+
+try:
+    import lxml  # noqa: F401
+    PARSER = 'lxml'
+except ImportError:
+    PARSER = 'html.parser'
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BUILD_DIR, 'documents')
+RECORDS_VERSION = 3
+TEXT_TAGS = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p']
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+STREAM_CHUNK_SIZE = 1 << 16
+
+# Starting one of these closes an open <p>, as in the HTML parsing rules
+CLOSES_PARAGRAPH = {
+    'address', 'article', 'aside', 'blockquote', 'div', 'dl', 'fieldset', 'figure', 'footer', 'form',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'main', 'nav', 'ol', 'p', 'pre', 'section',
+    'table', 'ul',
+}
+
+# Trees parsed this run, keyed by content digest, until a caller takes one to edit
+_trees = {}
+
+def source_digest(path, manifest=None):
+    """SHA-256 of a source page, through the build manifest when there is one"""
+    if manifest is not None:
+        return file_digest(manifest, path)
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def parse_html(html):
+    """Parse markup with the fastest available parser"""
+    return BeautifulSoup(html, PARSER)
+
+def parse_tree(path, digest):
+    """Parse a source page, reusing a tree already parsed this run"""
+    if digest not in _trees:
+        with open(path, 'r', encoding='utf-8') as f:
+            _trees[digest] = parse_html(f.read())
+    return _trees[digest]
+
+def extract_records(soup):
+    """Pull the text blocks and image URLs out of a parsed page
+
+    Text blocks are {'tag', 'text'} in document order with the text stripped;
+    images are the raw src (or data-src) values of every <img>. Each image's
+    anchor is [index of the nearest preceding heading block (None before the
+    first), number of text blocks before it].
+    """
+    text = []
+    images = []
+    anchors = []
+    heading = None
+    for element in soup.find_all(TEXT_TAGS + ['img']):
+        if element.name != 'img':
+            if element.name in HEADING_TAGS:
+                heading = len(text)
+            text.append({'tag': element.name, 'text': element.get_text(strip=True)})
+            continue
+        src = element.get('src', '') or element.get('data-src', '')
+        if src:
+            images.append(src)
+            anchors.append([heading, len(text)])
+
+    return {'text': text, 'images': images, 'anchors': anchors}
+
+class RecordParser(HTMLParser):
+    """Event-driven extraction of text blocks and image URLs
+
+    Only the open text blocks are held in memory. Blocks are released once
+    the outermost one closes, in start-tag order, matching extract_records.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.open_blocks = []
+        self.pending = []
+        self.ready = []
+        self.skip_depth = 0
+        self.started = 0
+        self.heading = None
+        # A text run can arrive in several handle_data calls (one per fed chunk it spans)
+        self.data = []
+
+    def handle_starttag(self, tag, attrs):
+        self.end_text()
+        if tag in ('script', 'style'):
+            self.skip_depth += 1
+            return
+        if tag in CLOSES_PARAGRAPH and any(block['tag'] == 'p' for block in self.open_blocks):
+            self.close_block('p')
+
+        if tag in TEXT_TAGS:
+            block = {'tag': tag, 'text': []}
+            self.open_blocks.append(block)
+            self.pending.append(block)
+            # Blocks are numbered in start-tag order, the order they are released in
+            if tag in HEADING_TAGS:
+                self.heading = self.started
+            self.started += 1
+        elif tag == 'img':
+            attrs = dict(attrs)
+            src = attrs.get('src') or attrs.get('data-src') or ''
+            if src:
+                self.ready.append(('image', (src, [self.heading, self.started])))
+
+    def handle_startendtag(self, tag, attrs):
+        if tag == 'img':
+            self.handle_starttag(tag, attrs)
+        else:
+            self.end_text()
+
+    def handle_endtag(self, tag):
+        self.end_text()
+        if tag in ('script', 'style'):
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in TEXT_TAGS:
+            self.close_block(tag)
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_comment(self, data):
+        # Comments split text runs in the tree too
+        self.end_text()
+
+    def end_text(self):
+        """Add the text run read since the last tag, stripped, to the open blocks"""
+        text = ''.join(self.data).strip()
+        self.data = []
+        if text and not self.skip_depth:
+            for block in self.open_blocks:
+                block['text'].append(text)
+
+    def close_block(self, tag):
+        """Close the innermost open block with this tag and any blocks opened inside it"""
+        for index in range(len(self.open_blocks) - 1, -1, -1):
+            if self.open_blocks[index]['tag'] == tag:
+                del self.open_blocks[index:]
+                break
+        if not self.open_blocks:
+            self.flush()
+
+    def flush(self):
+        """Release finished blocks in document order"""
+        for block in self.pending:
+            self.ready.append(('text', {'tag': block['tag'], 'text': ''.join(block['text'])}))
+        self.pending = []
+
+    def close(self):
+        super().close()
+        self.end_text()
+        self.open_blocks = []
+        self.flush()
+
+    def drain(self):
+        """Take the records completed so far"""
+        ready, self.ready = self.ready, []
+        return ready
+
+def iter_records(path, chunk_size=STREAM_CHUNK_SIZE):
+    """Stream ('text', {'tag', 'text'}) and ('image', (src, anchor)) records out of a page
+
+    The page is read in chunks, so memory stays flat however large it is.
+    """
+    parser = RecordParser()
+    with open(path, 'r', encoding='utf-8') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ''):
+            parser.feed(chunk)
+            yield from parser.drain()
+    parser.close()
+    yield from parser.drain()
+
+def stream_records(path):
+    """Collect streamed records into the same shape as extract_records"""
+    records = {'text': [], 'images': [], 'anchors': []}
+    for kind, value in iter_records(path):
+        if kind == 'text':
+            records['text'].append(value)
+        else:
+            records['images'].append(value[0])
+            records['anchors'].append(value[1])
+    return records
+
+def records_path(base_path, digest):
+    """Cache location for a page's records"""
+    return os.path.join(base_path, CACHE_DIR, f'{digest}.pickle')
+
+def load_records(path, manifest=None, base_path=SCRIPT_DIR, streaming=True, read_only=False):
+    """Get a source page's records, parsing the page only if they aren't cached
+
+    Streaming mode never builds a tree; tree mode parses the page once and
+    keeps the tree for a later take_tree in the same run. read_only uses
+    the cache without adding to it (for dry runs).
+    """
+    digest = source_digest(path, manifest)
+    parser = 'stream' if streaming else PARSER
+    cache_file = records_path(base_path, digest)
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('version') == RECORDS_VERSION and cached.get('parser') == parser:
+                return cached['records']
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            pass
+
+    records = stream_records(path) if streaming else extract_records(parse_tree(path, digest))
+    if read_only:
+        return records
+
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_path = cache_file + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': RECORDS_VERSION, 'parser': parser, 'records': records}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_file)
+    return records
+
+def take_tree(path, manifest=None):
+    """Get a source page's tree for editing
+
+    The tree is removed from the shared cache, so a later reader parses a
+    clean copy instead of seeing the caller's edits.
+    """
+    digest = source_digest(path, manifest)
+    soup = parse_tree(path, digest)
+    del _trees[digest]
+    return soup
+
+def main():
+    """Compare streaming and tree extraction on the pages given as arguments"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages', nargs='+', help='source pages to extract')
+    args = parser.parse_args()
+
+    for page in args.pages:
+        start = time.perf_counter()
+        streamed = stream_records(page)
+        stream_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(page, 'r', encoding='utf-8') as f:
+            parsed = extract_records(parse_html(f.read()))
+        tree_time = time.perf_counter() - start
+
+        same = 'same records' if streamed == parsed else 'records differ'
+        print(f"{page}: {len(streamed['text'])} text blocks, {len(streamed['images'])} images")
+        print(f"  stream {stream_time * 1000:.0f} ms, {PARSER} tree {tree_time * 1000:.0f} ms ({same})")
+
+if __name__ == '__main__':
+    main()
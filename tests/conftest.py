@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+# The build scripts are top-level modules in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SOURCE_PAGE = """<html><body>
+<h2>Look One</h2>
+<h3>2024</h3>
+<img src="https://images.squarespace-cdn.com/content/v1/site/1700000000000-AB/look.jpg?format=1500w">
+</body></html>
+"""
+
+@pytest.fixture
+def clean_site(tmp_path):
+    """An export with one projects image and a site root holding its local copy and derivatives"""
+    from PIL import Image
+
+    from build_manifest import load_manifest, manifest_path, save_manifest
+    from image_pipeline import build_images
+    from image_placeholders import load_placeholder_index, save_placeholder_index
+
+    export = tmp_path / 'export'
+    site = tmp_path / 'site'
+    (export / 'projects').mkdir(parents=True)
+    (export / 'projects' / 'index.html').write_text(SOURCE_PAGE, encoding='utf-8')
+    (site / 'images' / 'projects').mkdir(parents=True)
+    Image.new('RGB', (1200, 800), (180, 120, 90)).save(site / 'images' / 'projects' / 'projects_look.jpg', quality=90)
+
+    manifest = load_manifest(manifest_path(site))
+    placeholders = load_placeholder_index(site)
+    build_images(site / 'images', ['projects'], 1, manifest, placeholders)
+    save_manifest(manifest)
+    save_placeholder_index(placeholders)
+
+    return site
@@ -0,0 +1,69 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import build
+from build import POST_STAGES
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD_SCRIPT = os.path.join(REPO_ROOT, 'build.py')
+
+def snapshot(root):
+    """Every file under root with its content"""
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+def test_dry_run_writes_nothing(clean_site):
+    root = clean_site.parent
+    before = snapshot(root)
+    for generator in ('clean', 'grid', 'squarespace'):
+        result = subprocess.run(
+            [sys.executable, BUILD_SCRIPT, '--input', str(root / 'export'), '--output', str(clean_site),
+             '--generator', generator, '--only', 'projects', '--dry-run'],
+            capture_output=True, text=True, check=False,
+        )
+        assert result.returncode == 0, result.stderr
+        assert snapshot(root) == before, generator
+
+def test_second_build_from_clean_changes_nothing(clean_site):
+    root = clean_site.parent
+    for generator in ('clean', 'grid', 'squarespace'):
+        site = root / f'site-{generator}'
+        shutil.copytree(clean_site, site)
+        for assets in ('css', 'js'):
+            shutil.copytree(os.path.join(REPO_ROOT, assets), site / assets)
+        shutil.copy(os.path.join(REPO_ROOT, 'styles.css'), site)
+        command = [sys.executable, BUILD_SCRIPT, '--input', str(root / 'export'), '--output', str(site), '--generator', generator, '--only', 'projects']
+        subprocess.run(command, capture_output=True, text=True, check=True)
+        first = snapshot(site)
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        second = snapshot(site)
+        # The second build only records in the manifest that the post stages had nothing to do
+        changed = sorted(path for path in first.keys() | second.keys() if first.get(path) != second.get(path))
+        assert changed in ([], ['.build/manifest.json']), (generator, result.stdout)
+
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        assert snapshot(site) == second, generator
+        for stage in POST_STAGES:
+            assert f'{stage}: up to date' in result.stdout.splitlines(), (generator, stage, result.stdout)
+
+        with open(site / 'styles.css', 'a', encoding='utf-8') as f:
+            f.write('\nh1 { letter-spacing: 0.1em; }\n')
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        assert 'purge: up to date' not in result.stdout.splitlines(), (generator, result.stdout)
+
+def test_noop_graph_starts_no_workers(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError('worker pool started')
+
+    monkeypatch.setattr(build, 'ProcessPoolExecutor', no_pool)
+    ran = []
+    nodes = {'a': ([], lambda state: ran.append('a')), 'b': (['a'], lambda state: ran.append('b'))}
+    build.run_graph(nodes, {'jobs': 1})
+    assert ran == ['a', 'b']
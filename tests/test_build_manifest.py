@@ -0,0 +1,16 @@
+from build_manifest import load_json_cache, save_json_cache
+
+def test_json_cache_round_trip(tmp_path):
+    cache = load_json_cache(tmp_path, 'sizes.json')
+    assert cache['entries'] == {}
+    cache['entries']['a.jpg'] = [1200, 800]
+    cache['dirty'] = True
+    save_json_cache(cache)
+
+    assert load_json_cache(tmp_path, 'sizes.json')['entries'] == {'a.jpg': [1200, 800]}
+    assert [path.name for path in (tmp_path / '.build').iterdir()] == ['sizes.json']
+
+def test_unreadable_json_cache_starts_empty(tmp_path):
+    (tmp_path / '.build').mkdir()
+    (tmp_path / '.build' / 'sizes.json').write_text('{"a.jpg": [12', encoding='utf-8')
+    assert load_json_cache(tmp_path, 'sizes.json')['entries'] == {}
@@ -0,0 +1,30 @@
+import json
+import pickle
+import subprocess
+import sys
+
+import build_profile
+from test_build import BUILD_SCRIPT
+
+def test_span_args_are_scalars(monkeypatch):
+    monkeypatch.setitem(build_profile._state, 'enabled', True)
+    monkeypatch.setitem(build_profile._state, 'events', [])
+    with build_profile.span('work', page='projects', tag=object(), count=2):
+        pass
+    events = build_profile.drain_events()
+    assert events[0]['args']['page'] == 'projects'
+    assert events[0]['args']['count'] == 2
+    assert isinstance(events[0]['args']['tag'], str)
+    pickle.dumps(events)
+
+def test_profiled_build_of_each_generator(clean_site):
+    root = clean_site.parent
+    for generator in ('clean', 'grid', 'squarespace'):
+        result = subprocess.run(
+            [sys.executable, BUILD_SCRIPT, '--input', str(root / 'export'), '--output', str(clean_site),
+             '--generator', generator, '--only', 'projects', '--profile', 'trace.json'],
+            capture_output=True, text=True, check=False,
+        )
+        assert result.returncode == 0, result.stderr
+        with open(clean_site / 'trace.json', encoding='utf-8') as f:
+            assert json.load(f)['traceEvents'], generator
@@ -0,0 +1,27 @@
+import cleanup_squarespace
+
+PAGE = """<html>
+<head>
+  <title>Projects</title>
+  <style>.intro { color: black; }</style>
+</head>
+<body>
+  <!-- page content -->
+  <div class="intro">
+    <p>Look One</p>
+  </div>
+</body>
+</html>
+"""
+
+def clean(tmp_path, style):
+    source = tmp_path / 'index.html'
+    source.write_text(PAGE, encoding='utf-8')
+    output = tmp_path / f'projects-{style}.html'
+    cleanup_squarespace.cleanup_html(str(source), str(output), 'projects', images_root=str(tmp_path / 'images'), style=style)
+    return output.read_text(encoding='utf-8')
+
+def test_output_styles_differ(tmp_path):
+    compact = clean(tmp_path, 'compact')
+    assert clean(tmp_path, 'minify') != compact
+    assert clean(tmp_path, 'prettify') != compact
@@ -0,0 +1,37 @@
+from build_manifest import load_manifest, manifest_path
+from critical_css import inline_site
+from fingerprint_assets import fingerprint_site
+from minify_html import minify_site
+
+PAGE = """<!DOCTYPE html>
+<html><head><title>Home</title><link rel="stylesheet" href="css/layout.css"></head>
+<body><header class="hero"><h1>Maria Goundry</h1></header><footer class="main-footer">Contact</footer></body></html>
+"""
+
+def post_process(site, manifest):
+    """The page-rewriting post stages, in build order"""
+    fingerprint_site(site, ['index.html'], manifest)
+    report = inline_site(site, ['index.html'], manifest=manifest)
+    minify_site(site, ['index.html'], manifest)
+    return report
+
+def test_bundle_is_hashed_once_and_rebuilds_are_stable(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'layout.css').write_text(
+        '.hero { color: #111; background: url(../img/bg.png); }\n.main-footer { color: #999; }\n', encoding='utf-8',
+    )
+    (tmp_path / 'img').mkdir()
+    (tmp_path / 'img' / 'bg.png').write_bytes(b'png bytes')
+    (tmp_path / 'index.html').write_text(PAGE, encoding='utf-8')
+
+    manifest = load_manifest(manifest_path(tmp_path))
+    bundle = post_process(tmp_path, manifest)['index.html']['bundle']
+    html = (tmp_path / 'index.html').read_text(encoding='utf-8')
+    assert bundle.count('.') == 1
+    assert [path.name for path in (tmp_path / 'css').glob('bundle-*')] == [bundle.split('/')[-1]]
+    assert 'bg.' in (tmp_path / bundle).read_text(encoding='utf-8') and 'bg.png' not in (tmp_path / bundle).read_text(encoding='utf-8')
+
+    mtime = (tmp_path / 'index.html').stat().st_mtime_ns
+    assert post_process(tmp_path, manifest)['index.html']['bundle'] == bundle
+    assert (tmp_path / 'index.html').read_text(encoding='utf-8') == html
+    assert (tmp_path / 'index.html').stat().st_mtime_ns == mtime
@@ -0,0 +1,56 @@
+import json
+
+from PIL import Image
+
+from dedupe_images import (
+    ALIASES_NAME,
+    DEFAULT_THRESHOLD,
+    collapse_duplicates,
+    difference_hash,
+    find_duplicates,
+    hamming,
+    load_aliases,
+    resolve_alias,
+)
+
+def gradient(size, reverse=False):
+    """A horizontal grayscale ramp, the same picture at any size"""
+    width, height = size
+    img = Image.new('L', size)
+    img.putdata([(255 - x * 255 // width) if reverse else x * 255 // width for y in range(height) for x in range(width)])
+    return img.convert('RGB')
+
+def test_resized_copy_hashes_close_and_different_photo_far(tmp_path):
+    gradient((400, 300)).save(tmp_path / 'a.jpg', quality=95)
+    gradient((200, 150)).save(tmp_path / 'b.jpg', quality=60)
+    gradient((400, 300), reverse=True).save(tmp_path / 'c.jpg')
+    a, b, c = (difference_hash(tmp_path / name) for name in ('a.jpg', 'b.jpg', 'c.jpg'))
+    assert hamming(a, b) <= DEFAULT_THRESHOLD
+    assert hamming(a, c) > DEFAULT_THRESHOLD
+
+def test_find_duplicates_respects_the_threshold():
+    hashes = {
+        'projects/a.jpg': 0,
+        'press/a.jpg': (1 << DEFAULT_THRESHOLD) - 1,
+        'press/b.jpg': (1 << (DEFAULT_THRESHOLD + 1)) - 1 << 32,
+    }
+    assert find_duplicates(hashes) == [['press/a.jpg', 'projects/a.jpg']]
+    assert find_duplicates(hashes, threshold=DEFAULT_THRESHOLD - 1) == []
+
+def test_collapse_moves_duplicates_and_records_aliases(tmp_path):
+    images = tmp_path / 'images'
+    backup = tmp_path / '.build' / 'duplicates'
+    for item in ('projects/a.jpg', 'press/a.jpg', 'press/b.jpg'):
+        (images / item).parent.mkdir(parents=True, exist_ok=True)
+        (images / item).write_bytes(item.encode())
+    (images / ALIASES_NAME).write_text(json.dumps({'projects/old.png': 'press/a.jpg'}), encoding='utf-8')
+
+    report = [{'canonical': 'projects/a.jpg', 'duplicates': ['press/a.jpg']}]
+    aliases = collapse_duplicates(images, report, backup)
+
+    assert not (images / 'press' / 'a.jpg').exists()
+    assert (backup / 'press' / 'a.jpg').read_bytes() == b'press/a.jpg'
+    assert (images / 'projects' / 'a.jpg').exists()
+    assert (images / 'press' / 'b.jpg').exists()
+    assert load_aliases(images) == aliases == {'projects/old.png': 'press/a.jpg', 'press/a.jpg': 'projects/a.jpg'}
+    assert resolve_alias(aliases, 'projects/old.png') == 'projects/a.jpg'
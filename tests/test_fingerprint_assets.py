@@ -0,0 +1,50 @@
+import json
+
+from fingerprint_assets import (
+    DEFAULT_CACHE_CONTROL, HTML_CACHE_CONTROL, IMMUTABLE_CACHE_CONTROL, fingerprint_site, is_fingerprinted,
+)
+
+def test_gallery_manifests_use_hashed_names(tmp_path):
+    (tmp_path / 'images' / 'press').mkdir(parents=True)
+    (tmp_path / 'images' / 'press' / 'press_look.jpg').write_bytes(b'jpeg bytes')
+    (tmp_path / 'images' / 'press' / 'press_look-480w.jpg').write_bytes(b'small jpeg bytes')
+    (tmp_path / 'data').mkdir()
+    gallery = {'alt': 'Press', 'pageSize': 12, 'items': [{
+        'src': './images/press/press_look.jpg',
+        'srcset': './images/press/press_look-480w.jpg 480w',
+        'sources': [['image/webp', './images/press/press_look-480w.jpg 480w']],
+    }]}
+    (tmp_path / 'data' / 'gallery-press.json').write_text(json.dumps(gallery), encoding='utf-8')
+    (tmp_path / 'press.html').write_text('<div class="image-grid" data-gallery="data/gallery-press.json"></div>', encoding='utf-8')
+
+    fingerprint_site(tmp_path, ['press.html'])
+    item = json.loads((tmp_path / 'data' / 'gallery-press.json').read_text(encoding='utf-8'))['items'][0]
+    urls = [item['src'], item['srcset'].split()[0], item['sources'][0][1].split()[0]]
+    for url in urls:
+        assert is_fingerprinted(url.rsplit('/', 1)[1]), url
+        assert (tmp_path / url).exists()
+
+def read_headers(path):
+    """_headers as {rule: Cache-Control}"""
+    lines = path.read_text(encoding='utf-8').splitlines()
+    return {rule: value.split(': ', 1)[1] for rule, value in zip(lines[::2], lines[1::2])}
+
+def test_headers_mark_only_hashed_names_immutable(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'layout.css').write_text('body { margin: 0; }', encoding='utf-8')
+    (tmp_path / 'styles.css').write_text('p { color: #222; }', encoding='utf-8')
+    (tmp_path / 'index.html').write_text(
+        '<link rel="stylesheet" href="css/layout.css"><link rel="stylesheet" href="styles.css">',
+        encoding='utf-8',
+    )
+
+    assets, _ = fingerprint_site(tmp_path, ['index.html'])
+    assert read_headers(tmp_path / '_headers') == {
+        '/' + assets['css/layout.css']: IMMUTABLE_CACHE_CONTROL,
+        '/' + assets['styles.css']: IMMUTABLE_CACHE_CONTROL,
+        '/css/layout.css': DEFAULT_CACHE_CONTROL,
+        '/styles.css': DEFAULT_CACHE_CONTROL,
+        '/*.html': HTML_CACHE_CONTROL,
+        '/': HTML_CACHE_CONTROL,
+        '/sw.js': HTML_CACHE_CONTROL,
+    }
@@ -0,0 +1,36 @@
+import generate_clean_html
+
+TEXT = [{'tag': 'h2', 'text': 'Look One', 'block': 0}, {'tag': 'h3', 'text': '2024', 'block': 1}]
+
+def site_config(site):
+    return generate_clean_html.load_config(str(site.parent / 'export'), str(site))
+
+def render_projects(site):
+    generate_clean_html.render_page(site_config(site), 'projects', TEXT)
+    return (site / 'projects.html').read_text(encoding='utf-8')
+
+def test_cdn_urls_resolve_to_prefixed_local_files(clean_site):
+    images = generate_clean_html.extract_images_from_html(
+        site_config(clean_site), str(clean_site.parent / 'export' / 'projects' / 'index.html'), 'projects',
+    )
+    assert [image['src'] for image in images] == ['./images/projects/projects_look.jpg']
+
+def test_gallery_images_render_as_picture(clean_site):
+    html = render_projects(clean_site)
+    assert '<picture>' in html
+    assert 'srcset="./images/derived/projects/projects_look-480w.jpg 480w' in html
+
+def test_gallery_images_carry_intrinsic_size(clean_site):
+    html = render_projects(clean_site)
+    assert 'width="1200" height="800"' in html
+
+def test_gallery_images_carry_placeholder(clean_site):
+    html = render_projects(clean_site)
+    assert 'style="background: url(data:image/' in html
+
+def test_configs_for_different_sites_do_not_share_state(clean_site, tmp_path):
+    other = generate_clean_html.load_config(str(tmp_path / 'elsewhere'), str(tmp_path / 'elsewhere'))
+    config = site_config(clean_site)
+    assert generate_clean_html.section_derivatives(other, 'projects') == {}
+    assert generate_clean_html.section_derivatives(config, 'projects')
+    assert other['image_index'] is None and config['image_index'] is None
@@ -0,0 +1,21 @@
+import generate_pages
+from image_pipeline import picture_html
+
+DERIVATIVES = {'look': {'jpg': {480: 'look-480w.jpg', 960: 'look-960w.jpg'}, 'webp': {480: 'look-480w.webp'}}}
+
+def test_entry_html_uses_shared_picture_markup():
+    entry = generate_pages.gallery_entry(1, 'look.jpg', 'projects', DERIVATIVES, {'look.jpg': (960, 640)}, {}, {})
+    html = generate_pages.entry_html(entry, 'Alt', indent='')
+
+    picture = picture_html(
+        './images/projects/look.jpg', 'Alt', './images/derived/projects', DERIVATIVES,
+        entry['sizes'], '  ', ' width="960" height="640" loading="lazy"',
+    )
+    assert html == f'<div class="grid-item {entry["class"]}">\n{picture}\n</div>'
+    assert entry['sources'] == [['image/webp', './images/derived/projects/look-480w.webp 480w']]
+
+def test_entry_html_without_derivatives_is_a_bare_img():
+    entry = generate_pages.gallery_entry(1, 'look.jpg', 'projects', {}, {}, {}, {})
+    html = generate_pages.entry_html(entry, 'Alt', indent='')
+    assert '<picture>' not in html
+    assert '<img src="./images/projects/look.jpg" alt="Alt" loading="lazy">' in html
@@ -0,0 +1,17 @@
+from PIL import Image
+
+from image_dimensions import read_dimensions
+
+def test_reads_jpeg_header(tmp_path):
+    path = tmp_path / 'look.jpg'
+    Image.new('RGB', (640, 480)).save(path)
+    assert read_dimensions(path) == (640, 480)
+
+def test_truncated_jpeg_is_skipped_not_raised(tmp_path):
+    path = tmp_path / 'look.jpg'
+    Image.new('RGB', (640, 480)).save(path)
+    data = path.read_bytes()
+    # Cut inside the start-of-frame segment, after its marker and length
+    sof = data.index(b'\xff\xc0')
+    path.write_bytes(data[:sof + 5])
+    assert read_dimensions(path) is None
@@ -0,0 +1,17 @@
+from PIL import Image, ImageChops
+
+import image_pipeline
+
+def test_modern_siblings_are_encoded_from_the_resized_original(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_pipeline, 'MODERN_FORMATS', [('webp', 'image/webp', {'lossless': True})])
+    monkeypatch.setattr(image_pipeline, 'MIN_SAVING', -100)
+    original = Image.effect_noise((1000, 600), 64).convert('RGB')
+    original.save(tmp_path / 'look.jpg', quality=90)
+
+    derivatives, modern = image_pipeline.generate_derivatives(tmp_path / 'look.jpg', tmp_path / 'derived')
+
+    assert derivatives == ['look-1000w.jpg', 'look-960w.jpg', 'look-480w.jpg']
+    assert modern == ['look-1000w.webp', 'look-960w.webp', 'look-480w.webp']
+    with Image.open(tmp_path / 'look.jpg') as img, Image.open(tmp_path / 'derived' / 'look-480w.webp') as webp:
+        expected = img.convert('RGB').resize((960, 576), Image.LANCZOS).resize((480, 288), Image.LANCZOS)
+        assert ImageChops.difference(webp.convert('RGB'), expected).getbbox() is None
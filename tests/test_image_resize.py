@@ -0,0 +1,88 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+import image_resize
+
+def open_cache(tmp_path, max_bytes=image_resize.DEFAULT_CACHE_BYTES):
+    cache = image_resize.open_resize_cache(tmp_path, max_bytes, 1)
+    cache['pool'].shutdown()
+    cache['pool'] = ThreadPoolExecutor(max_workers=4)
+    return cache
+
+def make_image(path, width=1200, height=800):
+    Image.new('RGB', (width, height), (120, 80, 40)).save(path, quality=90)
+    return path
+
+def test_widths_snap_up_to_the_ladder_and_formats_are_checked():
+    assert image_resize.parse_variant({'w': ['300']}, 'look.jpg') == (320, 'jpeg')
+    assert image_resize.parse_variant({'w': ['99999'], 'fmt': ['webp']}, 'look.jpg') == (image_resize.RESIZE_WIDTHS[-1], 'webp')
+    assert image_resize.parse_variant({'fmt': ['jpg']}, 'look.png') == (None, 'jpeg')
+    assert image_resize.parse_variant({'w': ['0']}, 'look.jpg') is None
+    assert image_resize.parse_variant({'fmt': ['tiff']}, 'look.jpg') is None
+
+def test_concurrent_requests_share_one_resize(tmp_path, monkeypatch):
+    source = make_image(tmp_path / 'look.jpg')
+    cache = open_cache(tmp_path)
+    calls = []
+    resize = image_resize.resize_variant
+    started = threading.Event()
+
+    def counting_resize(*args):
+        calls.append(args)
+        started.wait(1)
+        return resize(*args)
+    monkeypatch.setattr(image_resize, 'resize_variant', counting_resize)
+
+    async def run():
+        requests = [asyncio.ensure_future(image_resize.get_variant(cache, source, 480, 'jpeg')) for _ in range(8)]
+        await asyncio.sleep(0.05)
+        started.set()
+        return await asyncio.gather(*requests)
+
+    try:
+        paths = asyncio.run(run())
+    finally:
+        image_resize.close_resize_cache(cache)
+    assert len(calls) == 1
+    assert len(set(paths)) == 1
+    with Image.open(paths[0]) as img:
+        assert img.size == (480, 320)
+
+def test_least_recently_used_variants_are_evicted(tmp_path):
+    source = make_image(tmp_path / 'look.jpg')
+    cache = open_cache(tmp_path)
+
+    async def variants(*widths):
+        return [await image_resize.get_variant(cache, source, width, 'jpeg') for width in widths]
+
+    try:
+        small, medium, large = asyncio.run(variants(160, 320, 480))
+        # Using the smallest again leaves the medium one least recently used
+        asyncio.run(variants(160))
+        cache['max_bytes'] = cache['size'] - os.path.getsize(medium)
+        image_resize.evict(cache)
+    finally:
+        image_resize.close_resize_cache(cache)
+
+    assert [os.path.exists(path) for path in (small, medium, large)] == [True, False, True]
+    assert list(cache['entries']) == [os.path.basename(large), os.path.basename(small)]
+    assert cache['size'] == os.path.getsize(small) + os.path.getsize(large)
+
+def test_cache_order_survives_a_restart(tmp_path):
+    source = make_image(tmp_path / 'look.jpg')
+    cache = open_cache(tmp_path)
+    try:
+        first = asyncio.run(image_resize.get_variant(cache, source, 160, 'jpeg'))
+        second = asyncio.run(image_resize.get_variant(cache, source, 320, 'jpeg'))
+        os.utime(second, ns=(1, 1))
+    finally:
+        image_resize.close_resize_cache(cache)
+
+    reopened = image_resize.open_resize_cache(tmp_path, os.path.getsize(first), 1)
+    image_resize.close_resize_cache(reopened)
+    assert list(reopened['entries']) == [os.path.basename(first)]
+    assert not os.path.exists(second)
@@ -0,0 +1,58 @@
+from build_manifest import load_manifest, manifest_path
+from minify_html import CHUNK_SIZE, minify_css, minify_file, minify_site
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+  <!-- generated -->
+  <!--[if IE]><link rel="stylesheet" href="ie.css"><![endif]-->
+  <style>
+    body {  margin : 0 ;  }
+  </style>
+</head>
+<body>
+  <p>Look   <em>one</em>   and two</p>
+  <pre>  keep
+    this  </pre>
+  <script>if (a  <  b) {  run();  }</script>
+</body>
+</html>
+"""
+
+def minify(tmp_path, html, chunk_size=CHUNK_SIZE):
+    source = tmp_path / 'page.html'
+    target = tmp_path / 'page.min.html'
+    source.write_text(html, encoding='utf-8')
+    minify_file(source, target, chunk_size)
+    return target.read_text(encoding='utf-8')
+
+def test_comments_and_whitespace_between_tags_are_removed(tmp_path):
+    html = minify(tmp_path, PAGE)
+    assert '<!-- generated -->' not in html
+    assert '<!--[if IE]>' in html
+    assert '</head><body>' in html
+    assert '<p>Look <em>one</em> and two</p>' in html
+
+def test_pre_and_script_are_kept_verbatim(tmp_path):
+    html = minify(tmp_path, PAGE)
+    assert '<pre>  keep\n    this  </pre>' in html
+    assert '<script>if (a  <  b) {  run();  }</script>' in html
+
+def test_inline_style_is_minified(tmp_path):
+    assert f'<style>{minify_css("body {  margin : 0 ;  }")}</style>' in minify(tmp_path, PAGE)
+    assert len(minify_css('body {  margin : 0 ;  }')) < len('body {  margin : 0 ;  }')
+
+def test_small_chunks_give_the_same_output(tmp_path):
+    expected = minify(tmp_path, PAGE)
+    for chunk_size in (1, 7, 64):
+        assert minify(tmp_path, PAGE, chunk_size) == expected
+
+def test_minified_pages_are_skipped_until_they_change(tmp_path):
+    (tmp_path / 'index.html').write_text(PAGE, encoding='utf-8')
+    manifest = load_manifest(manifest_path(tmp_path))
+    before, after = minify_site(tmp_path, ['index.html'], manifest)['index.html']
+    assert after < before
+
+    mtime = (tmp_path / 'index.html').stat().st_mtime_ns
+    assert minify_site(tmp_path, ['index.html'], manifest)['index.html'] == (after, after)
+    assert (tmp_path / 'index.html').stat().st_mtime_ns == mtime
@@ -0,0 +1,47 @@
+import io
+import struct
+import zlib
+
+from PIL import Image
+
+from optimize_images import ORIENTATION_TAG, optimize_png, strip_jpeg_metadata
+
+MAKE_TAG = 0x010F
+
+def png_chunk(kind, payload):
+    return struct.pack('>I', len(payload)) + kind + payload + struct.pack('>I', zlib.crc32(kind + payload))
+
+def rgb16_png(width=4, height=4):
+    """A 16-bit-per-channel RGB PNG, which Pillow can read but not write"""
+    rows = b''.join(b'\x00' + bytes(range(width * 6)) for _ in range(height))
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 16, 2, 0, 0, 0))
+        + png_chunk(b'IDAT', zlib.compress(rows))
+        + png_chunk(b'IEND', b'')
+    )
+
+def test_16_bit_png_is_left_alone():
+    assert optimize_png(rgb16_png()) is None
+
+def test_8_bit_png_keeps_its_pixels():
+    img = Image.new('RGB', (8, 8), (10, 20, 30))
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG')
+    with Image.open(io.BytesIO(optimize_png(buffer.getvalue()))) as result:
+        assert result.mode == 'RGB'
+        assert result.tobytes() == img.tobytes()
+
+def test_strip_jpeg_metadata_keeps_orientation():
+    exif = Image.Exif()
+    exif[ORIENTATION_TAG] = 6
+    exif[MAKE_TAG] = 'Camera'
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 4)).save(buffer, 'JPEG', exif=exif.tobytes(), comment=b'note')
+
+    stripped = strip_jpeg_metadata(buffer.getvalue())
+    assert len(stripped) < len(buffer.getvalue())
+    with Image.open(io.BytesIO(stripped)) as img:
+        assert img.getexif()[ORIENTATION_TAG] == 6
+        assert MAKE_TAG not in img.getexif()
+        assert 'comment' not in img.info
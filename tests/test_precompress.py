@@ -0,0 +1,40 @@
+import gzip
+import os
+
+from build_manifest import load_manifest, manifest_path
+from precompress import MIN_SIZE, available_encodings, precompress_site
+
+def make_site(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'main.css').write_text('.grid-item { margin: 0; }\n' * 100, encoding='utf-8')
+    (tmp_path / 'tiny.js').write_text('run();', encoding='utf-8')
+    (tmp_path / 'images').mkdir()
+    (tmp_path / 'images' / 'notes.txt').write_text('skip me\n' * 200, encoding='utf-8')
+    return tmp_path
+
+def test_text_assets_get_every_available_sibling(tmp_path):
+    site = make_site(tmp_path)
+    results = precompress_site(site, jobs=1)
+
+    original = (site / 'css' / 'main.css').read_bytes()
+    assert sorted(results['css/main.css'][1]) == sorted(ext for ext, _ in available_encodings())
+    assert gzip.decompress((site / 'css' / 'main.css.gz').read_bytes()) == original
+    assert 'images/notes.txt' not in results
+
+def test_small_files_are_left_uncompressed(tmp_path):
+    site = make_site(tmp_path)
+    assert os.path.getsize(site / 'tiny.js') < MIN_SIZE
+    assert precompress_site(site, jobs=1)['tiny.js'][1] == {}
+    assert not (site / 'tiny.js.gz').exists()
+
+def test_unchanged_files_are_not_recompressed_and_orphans_go(tmp_path):
+    site = make_site(tmp_path)
+    manifest = load_manifest(manifest_path(site))
+    precompress_site(site, jobs=1, manifest=manifest)
+    mtime = (site / 'css' / 'main.css.gz').stat().st_mtime_ns
+
+    (site / 'old.css.gz').write_bytes(b'stale')
+    results = precompress_site(site, jobs=1, manifest=manifest)
+    assert (site / 'css' / 'main.css.gz').stat().st_mtime_ns == mtime
+    assert 'gz' in results['css/main.css'][1]
+    assert not (site / 'old.css.gz').exists()
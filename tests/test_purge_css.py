@@ -0,0 +1,24 @@
+from purge_css import compile_safelist, purge_css, split_selectors
+
+USAGE = {'tags': {'a', 'p', 'div'}, 'classes': {'x', 'nav'}, 'ids': set(), 'stylesheets': []}
+IS_SAFE = compile_safelist([])
+
+def purge(css):
+    return purge_css(css, USAGE, IS_SAFE)
+
+def test_split_selectors_keeps_nested_commas_together():
+    assert split_selectors(':is(a, b) p, .x') == [':is(a, b) p', '.x']
+    assert split_selectors('div:not(.x, .y),p') == ['div:not(.x, .y)', 'p']
+    assert split_selectors('[data-x="a,b"], a') == ['[data-x="a,b"]', 'a']
+
+def test_functional_pseudo_class_selectors_are_kept_whole():
+    assert purge(':is(a, b) .nav{color:red}') == ':is(a, b) .nav{color:red}'
+    assert purge('div:not(.x, .y){color:red}') == 'div:not(.x, .y){color:red}'
+
+def test_attribute_selector_with_comma_is_kept_whole():
+    assert purge('[data-x="a,b"]{color:red}') == '[data-x="a,b"]{color:red}'
+    assert purge('.unused[data-x="a,b"], p{color:red}') == 'p{color:red}'
+
+def test_unused_selectors_are_dropped_inside_media():
+    css = '@media (forced-colors:active){.gone, :is([aria-current="page"], a).nav{color:red}}'
+    assert purge(css) == '@media (forced-colors:active){:is([aria-current="page"], a).nav{color:red}}'
@@ -0,0 +1,85 @@
+import asyncio
+import gzip
+from http import HTTPStatus
+
+import serve
+
+def fetch(site_root, path, headers=None, method='GET'):
+    """Send one request to a server on the site root: (status, headers, body)"""
+    async def run():
+        server = await serve.start_server(site_root, port=0, quiet=True)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        lines = [f'{method} {path} HTTP/1.1', 'Host: localhost', 'Connection: close']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        response = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response
+
+    head, _, body = asyncio.run(run()).partition(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    response_headers = dict(line.split(': ', 1) for line in header_lines)
+    return int(status_line.split()[1]), response_headers, body
+
+def make_site(tmp_path):
+    (tmp_path / 'index.html').write_text('<p>home</p>', encoding='utf-8')
+    (tmp_path / '404.html').write_text('<p>missing</p>', encoding='utf-8')
+    (tmp_path / 'build.py').write_text('print("tooling")', encoding='utf-8')
+    (tmp_path / 'requests.jsonl').write_text('{}', encoding='utf-8')
+    (tmp_path / 'styles.css').write_text('body { margin: 0; }' * 20, encoding='utf-8')
+    (tmp_path / 'styles.css.gz').write_bytes(gzip.compress((tmp_path / 'styles.css').read_bytes()))
+    return tmp_path
+
+def test_tooling_files_are_not_served(tmp_path):
+    site = make_site(tmp_path)
+    for path in ('/build.py', '/requests.jsonl'):
+        status, _, body = fetch(site, path)
+        assert status == 404
+        assert body == b'<p>missing</p>'
+
+def test_conditional_request_gets_304(tmp_path):
+    site = make_site(tmp_path)
+    status, headers, _ = fetch(site, '/index.html')
+    assert status == 200
+    status, _, body = fetch(site, '/index.html', {'If-None-Match': headers['ETag']})
+    assert status == 304
+    assert body == b''
+
+def test_byte_range(tmp_path):
+    site = make_site(tmp_path)
+    status, headers, body = fetch(site, '/index.html', {'Range': 'bytes=3-6'})
+    assert status == 206
+    assert headers['Content-Range'] == 'bytes 3-6/11'
+    assert body == b'home'
+    status, headers, _ = fetch(site, '/index.html', {'Range': 'bytes=50-'})
+    assert status == 416
+
+def test_precompressed_sibling_for_accepting_clients(tmp_path):
+    site = make_site(tmp_path)
+    status, headers, body = fetch(site, '/styles.css', {'Accept-Encoding': 'gzip'})
+    assert status == 200
+    assert headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(body) == (site / 'styles.css').read_bytes()
+    status, headers, body = fetch(site, '/styles.css', {'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in headers
+    assert body == (site / 'styles.css').read_bytes()
+
+class RecordingWriter:
+    def __init__(self):
+        self.data = b''
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+def test_file_removed_before_sending_gets_503(tmp_path):
+    writer = RecordingWriter()
+    status, _ = asyncio.run(serve.send_file(writer, HTTPStatus.OK, {'Content-Length': 10}, tmp_path / 'gone.jpg', 0, 10, False))
+    assert status == HTTPStatus.SERVICE_UNAVAILABLE
+    assert writer.data.startswith(b'HTTP/1.1 503 ')
+    assert b'Retry-After: 1' in writer.data
@@ -0,0 +1,45 @@
+import json
+
+from build_manifest import load_manifest, manifest_path
+from fingerprint_assets import HEADERS_NAME
+from service_worker import SERVICE_WORKER_NAME, build_service_worker
+
+def make_site(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'main.css').write_text('body { margin: 0; }', encoding='utf-8')
+    (tmp_path / 'js').mkdir()
+    (tmp_path / 'js' / 'gallery.js').write_text('console.log(1);', encoding='utf-8')
+    (tmp_path / 'index.html').write_text(
+        '<link rel="stylesheet" href="css/main.css"><script src="js/gallery.js"></script>'
+        '<img src="images/look.jpg"><script src="https://cdn.example.com/lib.js"></script>',
+        encoding='utf-8',
+    )
+    return tmp_path
+
+def precache(site):
+    text = (site / SERVICE_WORKER_NAME).read_text(encoding='utf-8')
+    return dict(json.loads(text.split('const PRECACHE = ', 1)[1].split(';\n', 1)[0]))
+
+def test_pages_and_their_local_css_and_js_are_precached(tmp_path):
+    site = make_site(tmp_path)
+    build_service_worker(site, ['index.html', 'missing.html'])
+    assert sorted(precache(site)) == ['./css/main.css', './index.html', './js/gallery.js']
+
+def test_revision_changes_only_for_changed_files(tmp_path):
+    site = make_site(tmp_path)
+    manifest = load_manifest(manifest_path(site))
+    build_service_worker(site, ['index.html'], manifest)
+    before = precache(site)
+
+    (site / 'css' / 'main.css').write_text('body { margin: 1px; }', encoding='utf-8')
+    build_service_worker(site, ['index.html'], manifest)
+    after = precache(site)
+    assert after['./css/main.css'] != before['./css/main.css']
+    assert after['./js/gallery.js'] == before['./js/gallery.js']
+    assert after['./index.html'] == before['./index.html']
+
+def test_service_worker_is_revalidated_once(tmp_path):
+    site = make_site(tmp_path)
+    build_service_worker(site, ['index.html'])
+    build_service_worker(site, ['index.html'])
+    assert (site / HEADERS_NAME).read_text(encoding='utf-8').count(f'/{SERVICE_WORKER_NAME}\n') == 1
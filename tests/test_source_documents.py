@@ -0,0 +1,41 @@
+from source_documents import extract_records, iter_records, parse_html
+
+PAGE = """<!DOCTYPE html>
+<html><head><title>Portfolio</title><style>p { color: red; }</style></head>
+<body>
+<h1>Maria Goundry</h1>
+<p>Welcome to my digital portfolio. Styling &amp; creative direction for <b>editorial</b> shoots.</p>
+<img src="https://images.squarespace-cdn.com/content/v1/abc/1600000000000-XYZ/look-one.jpg">
+<h2>Projects</h2>
+<p>A long paragraph that spans many chunks <!-- note --> and keeps   every word in place.</p>
+<div><img data-src="https://images.squarespace-cdn.com/content/v1/abc/1600000000001-ABC/look-two.jpg"></div>
+<p>Last words</p>
+<script>var text = "<p>not a block</p>";</script>
+</body></html>
+"""
+
+def records_from(path, chunk_size):
+    """Collect iter_records output into the extract_records shape"""
+    records = {'text': [], 'images': [], 'anchors': []}
+    for kind, value in iter_records(path, chunk_size=chunk_size):
+        if kind == 'text':
+            records['text'].append(value)
+        else:
+            records['images'].append(value[0])
+            records['anchors'].append(value[1])
+    return records
+
+def test_chunk_boundaries_do_not_change_records(tmp_path):
+    path = tmp_path / 'index.html'
+    path.write_text(PAGE, encoding='utf-8')
+
+    single = records_from(path, len(PAGE) + 1)
+    assert single['text'][1]['text'].startswith('Welcome to my digital portfolio.')
+    for chunk_size in (1, 2, 3, 7, 13, 64):
+        assert records_from(path, chunk_size) == single, chunk_size
+
+def test_streaming_matches_tree_mode(tmp_path):
+    path = tmp_path / 'index.html'
+    path.write_text(PAGE, encoding='utf-8')
+
+    assert records_from(path, 7) == extract_records(parse_html(PAGE))
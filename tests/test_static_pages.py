@@ -0,0 +1,42 @@
+from critical_css import inline_site
+from minify_html import minify_site
+from service_worker import build_service_worker
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+  <link rel="stylesheet" href="css/main.css">
+</head>
+<body>
+  <!-- gallery -->
+  <div class="intro">
+    <p>Look</p>
+  </div>
+</body>
+</html>
+"""
+
+def make_site(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'main.css').write_text('.intro { color: black; }\n.unused { color: red; }\n', encoding='utf-8')
+    for page in ('projects.html', 'projects-page-2.html'):
+        (tmp_path / page).write_text(PAGE, encoding='utf-8')
+    return tmp_path
+
+def test_static_pages_get_critical_css(tmp_path):
+    site = make_site(tmp_path)
+    report = inline_site(site)
+    assert set(report) == {'projects.html', 'projects-page-2.html'}
+    assert '<style data-critical>' in (site / 'projects-page-2.html').read_text(encoding='utf-8')
+
+def test_static_pages_are_minified(tmp_path):
+    site = make_site(tmp_path)
+    report = minify_site(site)
+    assert 'projects-page-2.html' in report
+    assert '<!-- gallery -->' not in (site / 'projects-page-2.html').read_text(encoding='utf-8')
+
+def test_static_pages_are_precached(tmp_path):
+    site = make_site(tmp_path)
+    urls = [url for url, revision in build_service_worker(site)]
+    assert './projects-page-2.html' in urls
+    assert './css/main.css' in urls